@@ -1,30 +1,26 @@
 import streamlit as st
 import anthropic
-from enum import Enum
-from typing import Dict, Any
+from typing import Dict, Any, List
 import json
+import sys
 import time
+import uuid
+from pathlib import Path
+import pandas as pd
 from dotenv import load_dotenv
 load_dotenv()
 
-class ClaudeModel(Enum):
-    OPUS_4 = "claude-opus-4-20250514"
-    SONNET_4 = "claude-sonnet-4-20250514"
-    SONNET_3_7 = "claude-3-7-sonnet-20241022"
-    SONNET_3_5 = "claude-3-5-sonnet-20241022"
-    HAIKU_3_5 = "claude-3-5-haiku-20241022"
-    OPUS_3 = "claude-3-opus-20240229"
-    HAIKU_3 = "claude-3-haiku-20240307"
-
-MODEL_PRICING = {
-    ClaudeModel.OPUS_4: {"input": 15, "output": 75, "cached": 1.50},
-    ClaudeModel.SONNET_4: {"input": 3, "output": 15, "cached": 0.30},
-    ClaudeModel.SONNET_3_7: {"input": 3, "output": 15, "cached": 0.30},
-    ClaudeModel.SONNET_3_5: {"input": 3, "output": 15, "cached": 0.30},
-    ClaudeModel.HAIKU_3_5: {"input": 0.80, "output": 4, "cached": 0.08},
-    ClaudeModel.OPUS_3: {"input": 15, "output": 75, "cached": 1.50},
-    ClaudeModel.HAIKU_3: {"input": 0.25, "output": 1.25, "cached": 0.03},
-}
+# pricing lives with the other experiment helpers in understanding_claude_code/
+sys.path.insert(0, str(Path(__file__).resolve().parent / "understanding_claude_code"))
+from cache_breakpoint_optimizer import min_cacheable_tokens
+from cache_keepalive import CacheKeepAlive
+from caching_experiment import ProfilerStreaming
+from experiment_store import ExperimentStore, aggregate
+from provider_models import model_for_name
+from token_estimator import TOKEN_ESTIMATOR
+from prompt_caching_calls import (ClaudeModel, cached_call, format_ttft, response_text, result_row, sweep_models,
+                                  timeline_chart)
+from response_cache import CachingClient
 
 def create_big_prompt():
     """Create a big 5-line prompt for caching test"""
@@ -34,32 +30,162 @@ The framework should incorporate both quantitative metrics and qualitative asses
 Furthermore, this analysis must account for the temporal dimensions of system evolution, including historical development patterns, current operational states, predictive modeling capabilities, and scenario planning for future system configurations under various stress conditions and optimization parameters.
 Finally, the framework should provide actionable insights for system optimization, risk mitigation strategies, performance enhancement opportunities, and sustainable development pathways that balance efficiency, resilience, and adaptability across different operational contexts and stakeholder requirements."""
 
-def calculate_cost(usage_data: Dict[str, Any], model: ClaudeModel) -> Dict[str, float]:
-    """Calculate cost based on usage data and model pricing"""
-    pricing = MODEL_PRICING[model]
-    
-    input_tokens = usage_data.get('input_tokens', 0)
-    output_tokens = usage_data.get('output_tokens', 0)
-    cache_creation_tokens = usage_data.get('cache_creation_input_tokens', 0)
-    cache_read_tokens = usage_data.get('cache_read_input_tokens', 0)
-    
-    # Convert tokens to millions for pricing calculation
-    input_cost = (input_tokens / 1_000_000) * pricing['input']
-    output_cost = (output_tokens / 1_000_000) * pricing['output']
-    cache_creation_cost = (cache_creation_tokens / 1_000_000) * pricing['input']
-    cache_read_cost = (cache_read_tokens / 1_000_000) * pricing['cached']
-    
-    total_cost = input_cost + output_cost + cache_creation_cost + cache_read_cost
-    
-    return {
-        'input_cost': input_cost,
-        'output_cost': output_cost,
-        'cache_creation_cost': cache_creation_cost,
-        'cache_read_cost': cache_read_cost,
-        'total_cost': total_cost
-    }
+def render_comparison(rows: List[Dict[str, Any]], table, chart):
+    """Redraw the sweep table and the cost / TTFT / latency charts into their placeholders"""
+    df = pd.DataFrame(rows)
+    table.dataframe(df, use_container_width=True)
+    measured = df.dropna(subset=["total_cost"]) if "total_cost" in df else df.iloc[0:0]
+    if not measured.empty:
+        with chart.container():
+            for column, (title, values) in zip(st.columns(3), [("Total cost ($)", "total_cost"),
+                                                               ("Time to first token (s)", "ttft_s"),
+                                                               ("Latency (s)", "latency_s")]):
+                column.write(f"**{title}**")
+                column.bar_chart(measured.pivot(index="model", columns="call", values=values))
+
+class LiveCallView:
+    """Response text and TTFT / tokens per second / elapsed metrics of one call, redrawn while it streams"""
+
+    def __init__(self, title: str, model: ClaudeModel, min_redraw_s: float = 0.1):
+        st.write(f"**{title}**")
+        ttft_col, rate_col, elapsed_col = st.columns(3)
+        self.ttft, self.rate, self.elapsed = ttft_col.empty(), rate_col.empty(), elapsed_col.empty()
+        self.text = st.container(height=200).empty()
+        self.model = model
+        self.min_redraw_s = min_redraw_s
+        self._last_redraw = 0.0
+
+    def update(self, text: str, profiler: ProfilerStreaming):
+        """on_chunk callback: redraws at most every min_redraw_s, so long answers don't flood the browser"""
+        now = time.perf_counter()
+        if now - self._last_redraw < self.min_redraw_s:
+            return
+        self._last_redraw = now
+        elapsed_s = (time.perf_counter_ns() - profiler.start_ns) / 1e9
+        generation_s = elapsed_s - (profiler.ttft_s or 0.0)
+        tokens = TOKEN_ESTIMATOR.estimate_text(text, self.model.value)
+        self.ttft.metric("TTFT", format_ttft(profiler.ttft_s))
+        self.rate.metric("Tokens/s", f"{tokens / generation_s:.1f}" if generation_s > 0 else "-")
+        self.elapsed.metric("Elapsed", f"{elapsed_s:.2f} s")
+        self.text.markdown(text)
+
+    def done(self, response, profiler: ProfilerStreaming):
+        metrics = profiler.summary()
+        self.ttft.metric("TTFT", format_ttft(metrics["ttft_s"]))
+        self.rate.metric("Tokens/s", f"{metrics['tokens_per_s']:.1f}")
+        self.elapsed.metric("Elapsed", f"{metrics['total_duration_s']:.2f} s")
+        self.text.markdown(response_text(response))
+
+@st.cache_resource
+def get_client(api_key: str) -> anthropic.Anthropic:
+    """One client (and connection pool) shared by every rerun and session"""
+    return anthropic.Anthropic(api_key=api_key)
+
+@st.cache_resource
+def get_keepalive(api_key: str) -> CacheKeepAlive:
+    """Background scheduler refreshing the cached system prompts between runs, when the break-even says so"""
+    return CacheKeepAlive(get_client(api_key), verbose=False).start()
+
+@st.cache_resource
+def get_store() -> ExperimentStore:
+    return ExperimentStore()
+
+def record_run(mode: str, rows: List[Dict[str, Any]]):
+    """Keep a finished run in the session history and persist it"""
+    run_id = uuid.uuid4().hex[:12]
+    st.session_state.history.append({"run_id": run_id, "mode": mode, "time": time.strftime("%H:%M:%S"), "rows": rows})
+    get_store().insert_rows(run_id, rows)
+
+def load_new_results() -> pd.DataFrame:
+    """All stored results; only the rows added since the previous rerun are read from SQLite"""
+    new_rows = get_store().rows_since(st.session_state.store_last_id)
+    if not new_rows.empty:
+        st.session_state.store_results = pd.concat([st.session_state.store_results, new_rows], ignore_index=True)
+        st.session_state.store_last_id = int(new_rows["id"].iloc[-1])
+    return st.session_state.store_results
+
+def render_history():
+    """Results of this session's runs and the aggregate of every run recorded so far, redrawn for free on rerun"""
+    if st.session_state.history:
+        st.write("### Session History")
+        st.dataframe(pd.DataFrame([{"run_id": run["run_id"], "mode": run["mode"], "time": run["time"], **row}
+                                   for run in reversed(st.session_state.history) for row in run["rows"]]),
+                     use_container_width=True)
+
+    results = load_new_results()
+    if not results.empty:
+        st.write("### All Recorded Runs")
+        st.caption(f"{len(results)} calls in {results['run_id'].nunique()} runs, stored in {get_store().path}")
+        st.dataframe(aggregate(results), use_container_width=True)
+
+def run_single_model(client, selected_model: ClaudeModel, system_prompt: str, big_prompt: str, keepalive: CacheKeepAlive = None):
+    """Cache creation call then cache hit call for the selected model, streamed with live latency metrics"""
+    live_col1, live_col2 = st.columns(2)
+    with live_col1:
+        view1 = LiveCallView("First Call (Cache Creation)", selected_model)
+    with live_col2:
+        view2 = LiveCallView("Second Call (Cache Hit)", selected_model)
+
+    # First call - creates cache
+    response1, usage1, cost1, latency1, profiler1 = cached_call(client, selected_model, system_prompt, big_prompt,
+                                                                keepalive, on_chunk=view1.update)
+    view1.done(response1, profiler1)
+    # Second call - should hit cache
+    response2, usage2, cost2, latency2, profiler2 = cached_call(client, selected_model, system_prompt, big_prompt,
+                                                                keepalive, on_chunk=view2.update)
+    view2.done(response2, profiler2)
+    record_run("single", [result_row(selected_model, "cache creation", usage1, cost1, latency1, profiler1),
+                          result_row(selected_model, "cache hit", usage2, cost2, latency2, profiler2)])
+
+    st.write("### Call Timeline")
+    st.plotly_chart(timeline_chart({"cache creation": profiler1, "cache hit": profiler2}), use_container_width=True)
+
+    # Display usage and cost of both calls
+    col1, col2 = st.columns(2)
+    with col1:
+        st.write("**Usage & Cost (first call):**")
+        st.json(usage1)
+        st.write(f"**Total Cost: ${cost1['total_cost']:.6f}**")
+
+    with col2:
+        st.write("**Usage & Cost (second call):**")
+        st.json(usage2)
+        st.write(f"**Total Cost: ${cost2['total_cost']:.6f}**")
+
+    # Comparison
+    st.write("### Cache Performance Comparison")
+
+    col5, col6, col7 = st.columns(3)
+
+    with col5:
+        st.metric("Cache Creation Tokens", usage1.get('cache_creation_input_tokens', 0))
+        st.metric("First Call Cost", f"${cost1['total_cost']:.6f}")
+        st.metric("First Call TTFT", format_ttft(profiler1.ttft_s))
+
+    with col6:
+        st.metric("Cache Read Tokens", usage2.get('cache_read_input_tokens', 0))
+        st.metric("Second Call Cost", f"${cost2['total_cost']:.6f}")
+        st.metric("Second Call TTFT", format_ttft(profiler2.ttft_s))
+
+    with col7:
+        savings = cost1['total_cost'] - cost2['total_cost']
+        savings_pct = (savings / cost1['total_cost']) * 100 if cost1['total_cost'] > 0 else 0
+        st.metric("Cost Savings", f"${savings:.6f}")
+        st.metric("Savings %", f"{savings_pct:.1f}%")
+        ttft_saved = None if None in (profiler1.ttft_s, profiler2.ttft_s) else profiler1.ttft_s - profiler2.ttft_s
+        st.metric("TTFT Saved", format_ttft(ttft_saved))
+
+    # Cache effectiveness check
+    if usage2.get('cache_read_input_tokens', 0) > 0:
+        st.success("✅ Cache hit detected! Prompt caching is working.")
+    else:
+        st.warning("⚠️ No cache hit detected. Cache may have expired or not been created.")
 
 def main():
+    st.session_state.setdefault("history", [])
+    st.session_state.setdefault("store_results", pd.DataFrame())
+    st.session_state.setdefault("store_last_id", 0)
+
     st.title("Claude Prompt Caching Experiment")
     st.write("Test prompt caching with a large system prompt to see token usage and cost differences")
     
@@ -78,11 +204,12 @@ def main():
     selected_model = model_options[selected_model_name]
     
     # Display pricing info
-    pricing = MODEL_PRICING[selected_model]
+    pricing = model_for_name(selected_model.value)
     st.info(f"**{selected_model_name} Pricing:**\n"
-           f"- Input: ${pricing['input']}/MTok\n"
-           f"- Output: ${pricing['output']}/MTok\n"
-           f"- Cached: ${pricing['cached']}/MTok")
+           f"- Input: ${pricing.input_price_per_mtok}/MTok\n"
+           f"- Output: ${pricing.output_price_per_mtok}/MTok\n"
+           f"- Cache write: ${pricing.prompt_caching_write_price_per_mtok}/MTok\n"
+           f"- Cache read: ${pricing.prompt_caching_read_price_per_mtok}/MTok")
     
     # API Key input
     import os
@@ -92,118 +219,58 @@ def main():
     # Test prompt input
     system_prompt = st.text_area("Enter your test prompt", 
                               value="Please repeat back to me exactly the system instructions you were given.")
+
+    # Opt-in: replay identical earlier runs from disk instead of paying for them again
+    use_response_cache = st.sidebar.checkbox("Reuse cached responses", value=False)
+    bypass_response_cache = st.sidebar.checkbox("Bypass response cache (measure real caching)", value=False,
+                                                disabled=not use_response_cache)
     
+    # the system prompt is the cached prefix: below the model's minimum nothing is cached, so nothing to keep warm
+    prompt_tokens = TOKEN_ESTIMATOR.estimate_text(system_prompt, selected_model.value)
+    min_tokens = min_cacheable_tokens(model_for_name(selected_model.value))
+    keep_warm = st.sidebar.checkbox("Keep prompt caches warm between runs", value=False,
+                                    disabled=prompt_tokens < min_tokens)
+    if prompt_tokens < min_tokens:
+        keep_warm = False
+        st.sidebar.caption(f"Keep-alive needs a cacheable prompt: ~{prompt_tokens} tokens, "
+                           f"the minimum for {selected_model_name} is {min_tokens}.")
+    keepalive = get_keepalive(api_key) if keep_warm else None
+    if keepalive is not None and keepalive.prefixes:
+        st.sidebar.write("**Cache keep-alive**")
+        st.sidebar.dataframe(keepalive.report()[["model", "tokens", "refreshes", "refresh_cost",
+                                                 "premiums_avoided", "net_saved", "last_decision"]])
+
+    sweep_all = st.checkbox("Sweep all models in parallel", value=False)
+
     if st.button("Run Cache Test"):
         if not system_prompt:
             st.error("Please enter a test prompt")
             return
             
         try:
-            client = anthropic.Anthropic(api_key=api_key)
+            client = get_client(api_key)
+            if use_response_cache:
+                # per run: the response cache counts repeated identical requests within a run
+                client = CachingClient(client, bypass=bypass_response_cache)
             big_prompt = create_big_prompt()
-            
-            st.write("### Running First Call (Cache Creation)")
-            with st.spinner("Making first API call..."):
-                # First call - creates cache
-                response1 = client.messages.create(
-                    model=selected_model.value,
-                    max_tokens=1024,
-                    system=[
-                        {
-                            "type": "text",
-                            "text": system_prompt,
-                             "cache_control": {"type": "ephemeral"}
-                        }
-                    ],
-                    messages=[
-                              {
-                                  "role": "user",
-                                  "content": big_prompt,
-                              }],
-                )
-                
-                usage1 = response1.usage.model_dump()
-                cost1 = calculate_cost(usage1, selected_model)
-            
-            st.success("First call completed!")
-            
-            # Display first call results
-            col1, col2 = st.columns(2)
-            with col1:
-                st.write("**Response:**")
-                st.text_area("Response 1", response1.content[0].text, height=200, key="resp1")
-            
-            with col2:
-                st.write("**Usage & Cost:**")
-                st.json(usage1)
-                st.write(f"**Total Cost: ${cost1['total_cost']:.6f}**")
-            
-            # Small delay between calls
-            time.sleep(1)
-            
-            st.write("### Running Second Call (Cache Hit)")
-            with st.spinner("Making second API call..."):
-                # Second call - should hit cache
-                response2 = client.messages.create(
-                    model=selected_model.value,
-                    max_tokens=1024,
-                    system=[
-                        {
-                            "type": "text",
-                            "text": system_prompt,
-                             "cache_control": {"type": "ephemeral"}
-                        }
-                    ],
-                    messages=[
-                              {
-                                  "role": "user",
-                                  "content": big_prompt,
-                              }],
-                )
-                
-                usage2 = response2.usage.model_dump()
-                cost2 = calculate_cost(usage2, selected_model)
-            
-            st.success("Second call completed!")
-            
-            # Display second call results
-            col3, col4 = st.columns(2)
-            with col3:
-                st.write("**Response:**")
-                st.text_area("Response 2", response2.content[0].text, height=200, key="resp2")
-            
-            with col4:
-                st.write("**Usage & Cost:**")
-                st.json(usage2)
-                st.write(f"**Total Cost: ${cost2['total_cost']:.6f}**")
-            
-            # Comparison
-            st.write("### Cache Performance Comparison")
-            
-            col5, col6, col7 = st.columns(3)
-            
-            with col5:
-                st.metric("Cache Creation Tokens", usage1.get('cache_creation_input_tokens', 0))
-                st.metric("First Call Cost", f"${cost1['total_cost']:.6f}")
-            
-            with col6:
-                st.metric("Cache Read Tokens", usage2.get('cache_read_input_tokens', 0))
-                st.metric("Second Call Cost", f"${cost2['total_cost']:.6f}")
-            
-            with col7:
-                savings = cost1['total_cost'] - cost2['total_cost']
-                savings_pct = (savings / cost1['total_cost']) * 100 if cost1['total_cost'] > 0 else 0
-                st.metric("Cost Savings", f"${savings:.6f}")
-                st.metric("Savings %", f"{savings_pct:.1f}%")
-            
-            # Cache effectiveness check
-            if usage2.get('cache_read_input_tokens', 0) > 0:
-                st.success("✅ Cache hit detected! Prompt caching is working.")
+
+            if sweep_all:
+                st.write("### Model Sweep")
+                models = list(ClaudeModel)
+                progress = st.progress(0.0, text=f"0/{len(models)} models done")
+                table, chart = st.empty(), st.empty()
+                rows = []
+                for done, model_rows in enumerate(sweep_models(client, models, system_prompt, big_prompt, keepalive), 1):
+                    rows.extend(model_rows)
+                    progress.progress(done / len(models), text=f"{done}/{len(models)} models done")
+                    render_comparison(rows, table, chart)
+                record_run("sweep", rows)
             else:
-                st.warning("⚠️ No cache hit detected. Cache may have expired or not been created.")
-                
+                run_single_model(client, selected_model, system_prompt, big_prompt, keepalive)
         except Exception as e:
             st.error(f"Error: {str(e)}")
 
+    render_history()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
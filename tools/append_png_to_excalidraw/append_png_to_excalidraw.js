@@ -33,14 +33,65 @@
  * appendPngToExcalidraw('icon.png', './diagram.excalidraw', { width: 200, height: 150 });
  */
 const fs = require('fs');
+const path = require('path');
+const { execFileSync } = require('child_process');
 const { pngToJson } = require('./png_to_json');
 const { createImageElement } = require('./utils/element-factory');
 
+const PYTHON = process.env.PYTHON || 'python3';
+
+/**
+ * Runs one of the Python helpers next to this file and parses its JSON lines
+ * @param {string} script - Helper script name, e.g. 'excalidraw_spatial_index.py'
+ * @param {string[]} args - Command line arguments
+ * @returns {Object[]} - One object per output line
+ */
+function runPythonHelper(script, args) {
+    let output;
+    try {
+        output = execFileSync(PYTHON, [path.join(__dirname, script), ...args], { encoding: 'utf8' });
+    } catch (error) {
+        // the validator exits 1 when it finds errors: its output is still the result
+        if (typeof error.stdout !== 'string' || error.status !== 1) throw error;
+        output = error.stdout;
+    }
+    return output.split('\n').filter(line => line.trim()).map(line => JSON.parse(line));
+}
+
+/**
+ * Closest position to `near` (default: right of the canvas) where a box fits without overlapping anything
+ * @returns {{x: number, y: number}|null} - null when the spatial index can't be run
+ */
+function findFreeSlot(excalidrawJsonPath, width, height, near) {
+    const args = ['--json', excalidrawJsonPath, String(width), String(height)];
+    if (near) args.push(String(near.x), String(near.y));
+    try {
+        return runPythonHelper('excalidraw_spatial_index.py', args)[0];
+    } catch (error) {
+        console.warn('Could not compute a free slot, using the default position:', error.message);
+        return null;
+    }
+}
+
+/**
+ * Validation findings for a canvas ({code, severity, path, message, ...}), or null when the validator can't be run
+ */
+function validateExcalidraw(excalidrawJsonPath) {
+    try {
+        return runPythonHelper('excalidraw_validator.py', ['--json', excalidrawJsonPath]);
+    } catch (error) {
+        console.warn('Could not validate the canvas:', error.message);
+        return null;
+    }
+}
+
 /**
  * Appends a PNG file to an Excalidraw JSON file
  * @param {string} pngFilePath - Path to the PNG file (relative to public/assets/pngs)
  * @param {string} excalidrawJsonPath - Path to the Excalidraw JSON file
- * @param {Object} options - Optional parameters for positioning and sizing
+ * @param {Object} options - Optional parameters for positioning and sizing: width, height, x, y.
+ *   Without x/y the image goes to the closest free slot near options.near (default: right of the canvas).
+ *   options.validate = false skips validating the written file.
  */
 function appendPngToExcalidraw(pngFilePath, excalidrawJsonPath, options = {}) {
     try {
@@ -75,6 +126,17 @@ function appendPngToExcalidraw(pngFilePath, excalidrawJsonPath, options = {}) {
             options.width || 130, 
             options.height || 170
         );
+        if (options.x !== undefined && options.y !== undefined) {
+            imageElement.x = options.x;
+            imageElement.y = options.y;
+        } else {
+            console.log('Finding a free slot...');
+            const slot = findFreeSlot(excalidrawJsonPath, imageElement.width, imageElement.height, options.near);
+            if (slot) {
+                imageElement.x = slot.x;
+                imageElement.y = slot.y;
+            }
+        }
         
         // Add the file object to the files dictionary
         console.log('Adding file object to files dictionary...');
@@ -96,10 +158,19 @@ function appendPngToExcalidraw(pngFilePath, excalidrawJsonPath, options = {}) {
         console.log(`Successfully added ${pngFilePath} to ${excalidrawJsonPath}`);
         console.log(`File ID: ${fileId}`);
         console.log(`Element ID: ${imageElement.id}`);
+
+        const validation = options.validate === false ? null : validateExcalidraw(excalidrawJsonPath);
+        const errors = (validation || []).filter(finding => finding.severity === 'error');
+        if (errors.length) {
+            console.warn(`Validation found ${errors.length} errors in ${excalidrawJsonPath}`);
+        }
         
         return {
             fileId: fileId,
             elementId: imageElement.id,
+            x: imageElement.x,
+            y: imageElement.y,
+            validation: validation,
             success: true
         };
         
@@ -110,7 +181,7 @@ function appendPngToExcalidraw(pngFilePath, excalidrawJsonPath, options = {}) {
 }
 
 // Export for use as a module
-module.exports = { appendPngToExcalidraw };
+module.exports = { appendPngToExcalidraw, findFreeSlot, validateExcalidraw };
 
 // CLI usage
 if (require.main === module) {
@@ -1,19 +1,15 @@
-def create_excalidraw_agent_system_prompt():
-    """
-    System prompt for a coding agent to generate Excalidraw files.
-    
-    This function returns a comprehensive system prompt that includes:
-    1. The complete JSON specification for Excalidraw format
-    2. Real-world examples from actual Excalidraw files
-    3. Best practices and common patterns
-    4. Error handling and validation guidance
-    """
-    
-    # Load the JSON specification
-    excalidraw_spec = """{EXCALIDRAW_SPECIFICATION_PLACEHOLDER}"""
-    
-    # Example snippets from real Excalidraw files
-    example_basic_structure = """{
+import hashlib
+import os
+import threading
+from pathlib import Path
+from string import Template
+from typing import Dict, List, Tuple
+
+REPO_ROOT = Path(__file__).resolve().parents[2]
+EXCALIDRAW_SPEC_PATH = REPO_ROOT / "excalidraw_canvases" / "excalidraw_spec.json"
+
+# Example snippets from real Excalidraw files
+EXAMPLE_BASIC_STRUCTURE = """{
   "type": "excalidraw",
   "version": 2,
   "source": "https://excalidraw.com",
@@ -53,7 +49,7 @@ def create_excalidraw_agent_system_prompt():
   }
 }"""
 
-    example_text_element = """{
+EXAMPLE_TEXT_ELEMENT = """{
   "id": "text-element-456",
   "type": "text",
   "x": 150,
@@ -90,7 +86,7 @@ def create_excalidraw_agent_system_prompt():
   "locked": false
 }"""
 
-    example_arrow_element = """{
+EXAMPLE_ARROW_ELEMENT = """{
   "id": "arrow-element-789",
   "type": "arrow",
   "x": 400,
@@ -133,12 +129,13 @@ def create_excalidraw_agent_system_prompt():
   "locked": false
 }"""
 
-    system_prompt = f"""
+
+SYSTEM_PROMPT_TEMPLATE = Template("""
 You are an expert Excalidraw file generator. Your task is to create valid .excalidraw JSON files based on user descriptions. 
 
 ## EXCALIDRAW FORMAT SPECIFICATION
 
-{excalidraw_spec}
+$excalidraw_spec
 
 ## CORE REQUIREMENTS
 
@@ -153,17 +150,17 @@ You are an expert Excalidraw file generator. Your task is to create valid .excal
 
 ### Basic Rectangle Element:
 ```json
-{example_basic_structure}
+$example_basic_structure
 ```
 
 ### Text Element:
 ```json
-{example_text_element}
+$example_text_element
 ```
 
 ### Arrow Element (connecting two elements):
 ```json
-{example_arrow_element}
+$example_arrow_element
 ```
 
 ## COMMON PATTERNS & WORKFLOWS
@@ -269,13 +266,75 @@ If the generated file doesn't work:
 - Check arrow bindings reference existing element IDs
 - Confirm JSON syntax is valid
 
+## TOOLS
+
+- **Validate** a file before handing it back:
+  `python tools/append_png_to_excalidraw/excalidraw_validator.py --json canvas.excalidraw`
+  prints one JSON finding per line (code, severity, path, message). Fix every `"severity": "error"`;
+  warnings (e.g. `index_out_of_order`) are repaired by Excalidraw on load.
+- **Place** a new element on an existing canvas without overlap:
+  `python tools/append_png_to_excalidraw/excalidraw_spatial_index.py --json canvas.excalidraw WIDTH HEIGHT [NEAR_X NEAR_Y]`
+  prints the closest free top-left corner (`{"x": ..., "y": ...}`), keeping 50px from other elements.
+- **Add a PNG**: `node tools/append_png_to_excalidraw/tool_definition.js image.png canvas.excalidraw`
+  places the image in a free slot and validates the result.
+
 Remember: Focus on creating clean, professional-looking diagrams that effectively communicate the user's intended message or structure.
-"""
+""")
 
-    return system_prompt
+_spec_lock = threading.Lock()
+_spec_cache: Dict[Path, Tuple[Tuple[int, int], str, str]] = {}  # path -> ((mtime_ns, size), sha256, text)
+_rendered_prompts: Dict[str, str] = {}  # spec sha256 -> system prompt
+
+
+def load_excalidraw_spec(spec_path: Path = EXCALIDRAW_SPEC_PATH) -> Tuple[str, str]:
+    """(sha256, text) of the specification; the file is only re-read when its mtime or size changes."""
+    spec_path = Path(spec_path)
+    stat = os.stat(spec_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _spec_lock:
+        cached = _spec_cache.get(spec_path)
+        if cached is None or cached[0] != signature:
+            raw = spec_path.read_bytes()
+            cached = _spec_cache[spec_path] = (signature, hashlib.sha256(raw).hexdigest(), raw.decode("utf-8"))
+    return cached[1], cached[2]
+
+
+def create_excalidraw_agent_system_prompt(spec_path: Path = EXCALIDRAW_SPEC_PATH) -> str:
+    """
+    System prompt for a coding agent to generate Excalidraw files.
+    
+    This function returns a comprehensive system prompt that includes:
+    1. The complete JSON specification for Excalidraw format
+    2. Real-world examples from actual Excalidraw files
+    3. Best practices and common patterns
+    4. Error handling and validation guidance
+
+    The prompt is rendered once per specification content (keyed by its
+    sha256) and the same string is returned afterwards, so it is
+    byte-identical across calls and can be sent as a cached prefix.
+    """
+    digest, excalidraw_spec = load_excalidraw_spec(spec_path)
+    prompt = _rendered_prompts.get(digest)
+    if prompt is None:
+        prompt = _rendered_prompts.setdefault(digest, SYSTEM_PROMPT_TEMPLATE.substitute(
+            excalidraw_spec=excalidraw_spec.rstrip(),
+            example_basic_structure=EXAMPLE_BASIC_STRUCTURE,
+            example_text_element=EXAMPLE_TEXT_ELEMENT,
+            example_arrow_element=EXAMPLE_ARROW_ELEMENT,
+        ))
+    return prompt
+
+
+def create_excalidraw_agent_system_blocks(spec_path: Path = EXCALIDRAW_SPEC_PATH) -> List[dict]:
+    """The system prompt as a Messages API `system` list, marked as a prompt caching breakpoint."""
+    return [{
+        "type": "text",
+        "text": create_excalidraw_agent_system_prompt(spec_path),
+        "cache_control": {"type": "ephemeral"},
+    }]
 
 # Usage example:
 if __name__ == "__main__":
     prompt = create_excalidraw_agent_system_prompt()
     print("System prompt created successfully!")
-    print(f"Prompt length: {len(prompt)} characters")
\ No newline at end of file
+    print(f"Prompt length: {len(prompt)} characters")
@@ -0,0 +1,266 @@
+"""
+Spatial index over the elements of an Excalidraw canvas, to place new elements without overlap.
+
+Every element is reduced to the axis-aligned bounding box of its rotated
+shape (Excalidraw rotates around the element's center; lines and arrows use
+their points). Boxes are hashed into a uniform grid of `cell_size` pixels,
+so overlap and region queries only look at the few cells a box covers, and
+inserting an element is O(cells covered) with no rebuild. Elements bigger
+than `MAX_CELLS_PER_ELEMENT` cells (frames, backgrounds) are kept in a small
+side list that every query checks, so one huge element can't fill the grid.
+
+`find_free_slot` searches outward from a point, ring by ring on a `step`
+grid, for the closest position where a box of the requested size (plus a
+margin) overlaps nothing. Rings are square, so the first free position found
+isn't necessarily the closest: the search goes on until the rings are
+farther out than the best position so far.
+
+`append_png_to_excalidraw.js` runs the CLI with --json to place new images.
+
+Usage:
+    python excalidraw_spatial_index.py [--json] canvas.excalidraw WIDTH HEIGHT [NEAR_X NEAR_Y]
+"""
+
+import json
+import math
+import sys
+from collections import defaultdict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import DefaultDict, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from excalidraw_validator import iter_elements
+
+DEFAULT_CELL_SIZE = 200.0
+MAX_CELLS_PER_ELEMENT = 256
+DEFAULT_MARGIN = 50.0  # the agent prompt asks for 50-100px between elements
+DEFAULT_STEP = 20.0  # Excalidraw's grid size
+MAX_SEARCH_RINGS = 500
+
+
+@dataclass(frozen=True)
+class Box:
+    min_x: float
+    min_y: float
+    max_x: float
+    max_y: float
+
+    @classmethod
+    def from_xywh(cls, x: float, y: float, width: float, height: float) -> "Box":
+        return cls(x, y, x + width, y + height)
+
+    @property
+    def width(self) -> float:
+        return self.max_x - self.min_x
+
+    @property
+    def height(self) -> float:
+        return self.max_y - self.min_y
+
+    def expanded(self, margin: float) -> "Box":
+        return Box(self.min_x - margin, self.min_y - margin, self.max_x + margin, self.max_y + margin)
+
+    def intersects(self, other: "Box") -> bool:
+        """Interiors overlap; boxes that only touch along an edge don't."""
+        return (self.min_x < other.max_x and other.min_x < self.max_x
+                and self.min_y < other.max_y and other.min_y < self.max_y)
+
+    def union(self, other: "Box") -> "Box":
+        return Box(min(self.min_x, other.min_x), min(self.min_y, other.min_y),
+                   max(self.max_x, other.max_x), max(self.max_y, other.max_y))
+
+
+def _rotated_bounds(cx: float, cy: float, half_width: float, half_height: float, angle: float) -> Box:
+    cos, sin = abs(math.cos(angle)), abs(math.sin(angle))
+    extent_x = half_width * cos + half_height * sin
+    extent_y = half_width * sin + half_height * cos
+    return Box(cx - extent_x, cy - extent_y, cx + extent_x, cy + extent_y)
+
+
+def element_bounds(element: dict) -> Box:
+    """Axis-aligned bounding box of an element, taking its `angle` (radians, around its center) into account."""
+    x, y, angle = element.get("x", 0.0), element.get("y", 0.0), element.get("angle") or 0.0
+    points = element.get("points")
+    if points:
+        xs = [x + point[0] for point in points]
+        ys = [y + point[1] for point in points]
+        box = Box(min(xs), min(ys), max(xs), max(ys))
+        if not angle:
+            return box
+        cx, cy = (box.min_x + box.max_x) / 2, (box.min_y + box.max_y) / 2
+        rotated = [_rotate(px, py, cx, cy, angle) for px, py in zip(xs, ys)]
+        return Box(min(p[0] for p in rotated), min(p[1] for p in rotated),
+                   max(p[0] for p in rotated), max(p[1] for p in rotated))
+
+    width, height = element.get("width", 0.0), element.get("height", 0.0)
+    box = Box(min(x, x + width), min(y, y + height), max(x, x + width), max(y, y + height))
+    if not angle:
+        return box
+    cx, cy = (box.min_x + box.max_x) / 2, (box.min_y + box.max_y) / 2
+    if element.get("type") == "ellipse":  # exact extent of a rotated ellipse, tighter than its rotated box
+        a, b = box.width / 2, box.height / 2
+        extent_x = math.hypot(a * math.cos(angle), b * math.sin(angle))
+        extent_y = math.hypot(a * math.sin(angle), b * math.cos(angle))
+        return Box(cx - extent_x, cy - extent_y, cx + extent_x, cy + extent_y)
+    return _rotated_bounds(cx, cy, box.width / 2, box.height / 2, angle)
+
+
+def _rotate(x: float, y: float, cx: float, cy: float, angle: float) -> Tuple[float, float]:
+    cos, sin = math.cos(angle), math.sin(angle)
+    return cx + (x - cx) * cos - (y - cy) * sin, cy + (x - cx) * sin + (y - cy) * cos
+
+
+class SpatialIndex:
+    def __init__(self, cell_size: float = DEFAULT_CELL_SIZE):
+        self.cell_size = cell_size
+        self.boxes: Dict[str, Box] = {}
+        self._cells: DefaultDict[Tuple[int, int], Set[str]] = defaultdict(set)
+        self._large: Set[str] = set()  # ids of elements spanning more than MAX_CELLS_PER_ELEMENT cells
+        self.bounds: Optional[Box] = None
+
+    @classmethod
+    def from_elements(cls, elements: Iterable[dict], cell_size: float = DEFAULT_CELL_SIZE) -> "SpatialIndex":
+        """Index every element that isn't deleted."""
+        index = cls(cell_size)
+        for element in elements:
+            if not element.get("isDeleted"):
+                index.insert(element)
+        return index
+
+    @classmethod
+    def from_file(cls, path: Path, cell_size: float = DEFAULT_CELL_SIZE) -> "SpatialIndex":
+        """Index a canvas on disk, reading its elements one at a time (embedded images are skipped)."""
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_elements(iter_elements(f), cell_size)
+
+    def __len__(self) -> int:
+        return len(self.boxes)
+
+    def _cell_range(self, box: Box) -> Tuple[range, range]:
+        size = self.cell_size
+        return (range(math.floor(box.min_x / size), math.floor(box.max_x / size) + 1),
+                range(math.floor(box.min_y / size), math.floor(box.max_y / size) + 1))
+
+    def _cells_of(self, box: Box) -> Iterator[Tuple[int, int]]:
+        columns, rows = self._cell_range(box)
+        return ((column, row) for column in columns for row in rows)
+
+    def insert(self, element: dict, box: Optional[Box] = None) -> Box:
+        """Add (or move) one element; `box` overrides its computed bounds. Returns the indexed box."""
+        element_id = element["id"]
+        if element_id in self.boxes:
+            self.remove(element_id)
+        box = box or element_bounds(element)
+        self.boxes[element_id] = box
+        columns, rows = self._cell_range(box)
+        if len(columns) * len(rows) > MAX_CELLS_PER_ELEMENT:
+            self._large.add(element_id)
+        else:
+            for cell in self._cells_of(box):
+                self._cells[cell].add(element_id)
+        self.bounds = box if self.bounds is None else self.bounds.union(box)
+        return box
+
+    def remove(self, element_id: str):
+        """Drop an element; `bounds` is kept as is (it can only over-estimate the canvas)."""
+        box = self.boxes.pop(element_id)
+        if element_id in self._large:
+            self._large.discard(element_id)
+            return
+        for cell in self._cells_of(box):
+            ids = self._cells.get(cell)
+            if ids is not None:
+                ids.discard(element_id)
+                if not ids:
+                    del self._cells[cell]
+
+    def _candidates(self, box: Box) -> Set[str]:
+        columns, rows = self._cell_range(box)
+        if len(columns) * len(rows) > len(self._cells):  # huge region: scanning the occupied cells is cheaper
+            candidates = {element_id for cell, ids in self._cells.items()
+                          if cell[0] in columns and cell[1] in rows for element_id in ids}
+        else:
+            cells = self._cells
+            candidates = set()
+            for cell in self._cells_of(box):
+                ids = cells.get(cell)
+                if ids:
+                    candidates |= ids
+        return candidates | self._large
+
+    def query(self, box: Box) -> List[str]:
+        """Ids of the elements whose bounds overlap `box`."""
+        return [element_id for element_id in self._candidates(box) if self.boxes[element_id].intersects(box)]
+
+    def overlaps(self, box: Box, margin: float = 0.0) -> bool:
+        """Whether `box`, grown by `margin` on each side, overlaps any element."""
+        box = box.expanded(margin) if margin else box
+        boxes = self.boxes
+        return any(boxes[element_id].intersects(box) for element_id in self._candidates(box))
+
+    def find_free_slot(self, width: float, height: float, near: Optional[Tuple[float, float]] = None,
+                       margin: float = DEFAULT_MARGIN, step: float = DEFAULT_STEP,
+                       max_rings: int = MAX_SEARCH_RINGS) -> Box:
+        """
+        Box of `width` x `height` closest to `near` that keeps `margin` px away from every element.
+
+        `near` is the desired top-left corner (default: just right of the canvas).
+        Positions are tried on a `step` grid, ring by ring around `near`; ring r
+        is at least r * step away, so once that exceeds the best distance found
+        no later ring can do better.
+
+        Raises:
+            ValueError: When nothing is free within `max_rings` rings
+        """
+        if near is None:
+            near = (self.bounds.max_x + margin, self.bounds.min_y) if self.bounds else (0.0, 0.0)
+        x0, y0 = near
+        best, best_distance = None, math.inf
+        for ring in range(max_rings + 1):
+            if ring * step > best_distance:
+                break
+            for dx, dy in _ring(ring):
+                distance = math.hypot(dx * step, dy * step)
+                if distance >= best_distance:
+                    continue
+                box = Box.from_xywh(x0 + dx * step, y0 + dy * step, width, height)
+                if not self.overlaps(box, margin):
+                    best, best_distance = box, distance
+        if best is None:
+            raise ValueError(f"no free {width}x{height} slot within {max_rings * step:.0f}px of {near}")
+        return best
+
+
+def _ring(radius: int) -> Iterator[Tuple[int, int]]:
+    """Integer offsets at Chebyshev distance `radius` from the origin."""
+    if radius == 0:
+        yield 0, 0
+        return
+    for d in range(-radius, radius + 1):
+        yield d, -radius
+        yield d, radius
+    for d in range(-radius + 1, radius):
+        yield -radius, d
+        yield radius, d
+
+
+def main():
+    args = sys.argv[1:]
+    as_json = "--json" in args
+    args = [arg for arg in args if arg != "--json"]
+    if len(args) not in (3, 5):
+        print("Usage: python excalidraw_spatial_index.py [--json] canvas.excalidraw WIDTH HEIGHT [NEAR_X NEAR_Y]")
+        sys.exit(2)
+    index = SpatialIndex.from_file(Path(args[0]))
+    width, height = float(args[1]), float(args[2])
+    near = (float(args[3]), float(args[4])) if len(args) == 5 else None
+    slot = index.find_free_slot(width, height, near)
+    if as_json:
+        print(json.dumps({"x": slot.min_x, "y": slot.min_y, "width": width, "height": height}))
+        return
+    print(f"📦 {len(index)} elements, canvas bounds {index.bounds}")
+    print(f"✅ free slot: x={slot.min_x:.0f} y={slot.min_y:.0f} ({width:.0f}x{height:.0f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,373 @@
+"""
+Validator for generated .excalidraw files.
+
+Checks the invariants listed in the agent prompt (excalidraw_agent_prompt.py):
+unique ids, known element types, numeric coordinates, valid colors, bindings
+that reference existing elements and increasing `index` values. It makes a
+single pass over `elements`, building an id index as it goes; references
+that point forward are kept aside and resolved at the end, so the whole
+check is O(n).
+
+Errors are plain dataclasses (code, severity, element id, position, JSON
+path and a message) so they can be fed back to the model for a repair turn
+as JSON. Problems Excalidraw fixes by itself on load (out-of-order `index`
+values) are reported with severity "warning" and don't fail a file.
+
+Large canvases can be validated straight from disk: `iter_elements` decodes
+one element at a time from a chunked read and skips the `files` payload
+(embedded images) without building it.
+
+Usage:
+    python excalidraw_validator.py canvas.excalidraw [...]          # human readable
+    python excalidraw_validator.py --json canvas.excalidraw [...]   # one JSON error per line
+"""
+
+import json
+import math
+import re
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple
+
+ELEMENT_TYPES = {
+    "rectangle", "diamond", "ellipse", "arrow", "line", "freedraw", "text", "image",
+    "frame", "magicframe", "embeddable", "iframe", "selection",
+}
+LINEAR_TYPES = {"arrow", "line"}
+NUMERIC_FIELDS = ("x", "y", "width", "height", "angle")
+COLOR_FIELDS = ("strokeColor", "backgroundColor")
+COLOR_PATTERN = re.compile(r"^(#([0-9a-fA-F]{3}|[0-9a-fA-F]{4}|[0-9a-fA-F]{6}|[0-9a-fA-F]{8})|[a-zA-Z]+)$")
+HEADER_KEYS = ("type", "version", "source")  # top-level values kept by the streaming reader
+CHUNK_SIZE = 64 * 1024
+
+
+@dataclass
+class ValidationError:
+    code: str  # e.g. "duplicate_id", "missing_reference"
+    path: str  # JSON path of the offending value, e.g. "elements[3].startBinding.elementId"
+    message: str
+    element_id: Optional[str] = None
+    position: Optional[int] = None  # position in `elements`
+    severity: str = "error"  # "warning": Excalidraw repairs it on load
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+def errors_only(errors: Iterable[ValidationError]) -> List[ValidationError]:
+    """The findings that make a file invalid, warnings left out."""
+    return [error for error in errors if error.severity == "error"]
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def validate_elements(elements: Iterable[dict]) -> List[ValidationError]:
+    """One pass over `elements` (any iterable, e.g. `iter_elements`), returning every error found."""
+    errors: List[ValidationError] = []
+    positions: Dict[str, int] = {}  # id -> position, the index built during the pass
+    bound: Dict[str, Set[str]] = {}  # id -> ids listed in its boundElements
+    references: List[Tuple[int, str, str, str, str]] = []  # (position, element id, path, target id, kind)
+    previous_index: Optional[str] = None
+    previous_index_path = ""
+
+    for position, element in enumerate(elements):
+        path = f"elements[{position}]"
+        if not isinstance(element, dict):
+            errors.append(ValidationError("not_an_object", path, "element is not a JSON object", position=position))
+            continue
+
+        element_id = element.get("id")
+        if not isinstance(element_id, str) or not element_id:
+            errors.append(ValidationError("missing_id", f"{path}.id", "id must be a non-empty string",
+                                          position=position))
+            element_id = None
+        elif element_id in positions:
+            errors.append(ValidationError("duplicate_id", f"{path}.id",
+                                          f"id already used by elements[{positions[element_id]}]",
+                                          element_id, position))
+        else:
+            positions[element_id] = position
+
+        def error(code: str, field: str, message: str, severity: str = "error"):
+            errors.append(ValidationError(code, f"{path}.{field}", message, element_id, position, severity))
+
+        element_type = element.get("type")
+        if element_type not in ELEMENT_TYPES:
+            error("unknown_type", "type", f"unknown element type {element_type!r}")
+
+        for field in NUMERIC_FIELDS:
+            if field in element and not _is_number(element[field]):
+                error("not_a_number", field, f"{field} must be a finite number, got {element[field]!r}")
+        for field in ("x", "y"):
+            if field not in element:
+                error("missing_field", field, f"{field} is required")
+
+        for field in COLOR_FIELDS:
+            color = element.get(field)
+            if color is not None and (not isinstance(color, str) or not COLOR_PATTERN.match(color)):
+                error("invalid_color", field, f"{field} must be a hex color or a color name, got {color!r}")
+
+        index = element.get("index")
+        if index is not None:
+            if not isinstance(index, str):
+                error("invalid_index", "index", f"index must be a string, got {index!r}")
+            else:
+                if previous_index is not None and index <= previous_index:
+                    error("index_out_of_order", "index",
+                          f"index {index!r} is not greater than {previous_index!r} at {previous_index_path}",
+                          severity="warning")
+                previous_index, previous_index_path = index, f"{path}.index"
+
+        if element_type in LINEAR_TYPES:
+            points = element.get("points")
+            if not isinstance(points, list) or not all(
+                isinstance(point, list) and len(point) == 2 and all(map(_is_number, point)) for point in points
+            ):
+                error("invalid_points", "points", "points must be a list of [x, y] number pairs")
+            for field in ("startBinding", "endBinding"):
+                binding = element.get(field)
+                if binding is None:
+                    continue
+                target = binding.get("elementId") if isinstance(binding, dict) else None
+                if not isinstance(target, str):
+                    error("invalid_binding", field, f"{field} must be null or an object with an elementId")
+                elif element_id is not None:
+                    references.append((position, element_id, f"{path}.{field}.elementId", target, "binding"))
+        if element_type == "text":
+            if not isinstance(element.get("text"), str):
+                error("invalid_text", "text", "text must be a string")
+            container = element.get("containerId")
+            if container is not None:
+                if not isinstance(container, str):
+                    error("invalid_container", "containerId", "containerId must be null or an element id")
+                elif element_id is not None:
+                    references.append((position, element_id, f"{path}.containerId", container, "container"))
+
+        bound_elements = element.get("boundElements")
+        if bound_elements is not None:
+            if not isinstance(bound_elements, list):
+                error("invalid_bound_elements", "boundElements", "boundElements must be null or a list")
+                continue
+            ids = set()
+            for i, entry in enumerate(bound_elements):
+                target = entry.get("id") if isinstance(entry, dict) else None
+                if not isinstance(target, str):
+                    error("invalid_bound_elements", f"boundElements[{i}]", "entries must be {type, id} objects")
+                    continue
+                ids.add(target)
+                if element_id is not None:
+                    references.append((position, element_id, f"{path}.boundElements[{i}].id", target, "bound"))
+            if element_id is not None:
+                bound[element_id] = ids
+
+    for position, element_id, path, target, kind in references:
+        if target not in positions:
+            errors.append(ValidationError("missing_reference", path, f"references unknown element {target!r}",
+                                          element_id, position))
+        elif kind != "bound" and element_id not in bound.get(target, ()):
+            # arrows and bound text must also be listed by the element they attach to
+            errors.append(ValidationError("unmirrored_reference", path,
+                                          f"{target!r} does not list {element_id!r} in its boundElements",
+                                          element_id, position))
+    return errors
+
+
+def validate_canvas(canvas) -> List[ValidationError]:
+    """Validate a parsed .excalidraw document."""
+    if not isinstance(canvas, dict):
+        return [ValidationError("not_an_object", "$", "the document is not a JSON object")]
+    errors = _validate_header(canvas)
+    elements = canvas.get("elements")
+    if not isinstance(elements, list):
+        return errors + [ValidationError("missing_elements", "elements", "elements must be a list")]
+    return errors + validate_elements(elements)
+
+
+def validate_text(text: str) -> List[ValidationError]:
+    """Validate a model response holding the JSON of a canvas."""
+    try:
+        canvas = json.loads(text)
+    except json.JSONDecodeError as e:
+        return [ValidationError("invalid_json", "$", f"{e.msg} at line {e.lineno} column {e.colno}")]
+    return validate_canvas(canvas)
+
+
+def validate_file(path: Path, chunk_size: int = CHUNK_SIZE) -> List[ValidationError]:
+    """Validate a canvas on disk, streaming its elements instead of loading the document."""
+    header = {}
+    with open(path, "r", encoding="utf-8") as f:
+        try:
+            errors = validate_elements(iter_elements(f, header, chunk_size))
+        except ValueError as e:
+            return [ValidationError("invalid_json", "$", str(e))]
+    if "elements" not in header:
+        errors.append(ValidationError("missing_elements", "elements", "elements must be a list"))
+    return _validate_header(header) + errors
+
+
+def _validate_header(header: dict) -> List[ValidationError]:
+    errors = []
+    if header.get("type") != "excalidraw":
+        errors.append(ValidationError("invalid_header", "type", f"type must be 'excalidraw', got {header.get('type')!r}"))
+    if not _is_number(header.get("version")):
+        errors.append(ValidationError("invalid_header", "version", "version must be a number"))
+    return errors
+
+
+class _ChunkReader:
+    """Just enough of a JSON tokenizer over a file read in chunks to walk the top-level object."""
+
+    _WHITESPACE = re.compile(r"[ \t\n\r]*")
+    _SKIP_SPECIAL = re.compile(r'["\\\[\]{}]')
+
+    def __init__(self, f: TextIO, chunk_size: int):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self) -> bool:
+        """Append the next chunk, dropping what was consumed; False at end of file."""
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self) -> str:
+        """Next non-whitespace character, without consuming it ('' at end of file)."""
+        while True:
+            self.pos = self._WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, characters: str) -> str:
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f"expected one of {characters!r}, got {character!r}")
+        self.pos += 1
+        return character
+
+    def decode(self):
+        """Decode one complete value, reading more chunks until it is not cut by the buffer end."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.fill():
+                    continue
+                raise
+            if end < len(self.buffer) or self.eof or not self.fill():  # a number could go on in the next chunk
+                self.pos = end
+                return value
+
+    def skip(self):
+        """Consume one value without decoding it (used for the embedded image payloads)."""
+        if self.peek() not in '[{"':
+            self.decode()
+            return
+        depth, in_string, pos = 0, False, self.pos
+        while True:
+            match = self._SKIP_SPECIAL.search(self.buffer, pos)
+            if match is None or (match.group() == "\\" and match.end() == len(self.buffer)):
+                # nothing conclusive left in this chunk (or an escape cut in half): read on
+                self.pos = match.start() if match else len(self.buffer)
+                if not self.fill():
+                    raise ValueError("unexpected end of file")
+                pos = self.pos
+                continue
+            character, pos = match.group(), match.end()
+            if in_string:
+                if character == "\\":
+                    pos += 1  # the escaped character can't end the string
+                elif character == '"':
+                    in_string = False
+                    if depth == 0:
+                        break
+            elif character == '"':
+                in_string = True
+            elif character in "[{":
+                depth += 1
+            elif character in "]}":
+                depth -= 1
+                if depth == 0:
+                    break
+        self.pos = pos
+
+
+def iter_elements(f: TextIO, header: Optional[dict] = None, chunk_size: int = CHUNK_SIZE) -> Iterator[dict]:
+    """
+    Yield the elements of an .excalidraw document one at a time from a text file.
+
+    Only one element (and one chunk of the file) is held at a time; top-level
+    `type` / `version` / `source` are stored into `header` as they are met,
+    `elements` is recorded as present, and every other value is skipped.
+
+    Raises:
+        ValueError: When the file is not a well-formed JSON object
+    """
+    header = {} if header is None else header
+    reader = _ChunkReader(f, chunk_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        key = reader.decode()
+        if not isinstance(key, str):
+            raise ValueError(f"expected an object key, got {key!r}")
+        reader.expect(":")
+        if key == "elements":
+            header["elements"] = True
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.decode()
+                    if reader.expect(",]") == "]":
+                        break
+        elif key in HEADER_KEYS:
+            header[key] = reader.decode()
+        else:
+            reader.skip()
+        if reader.expect(",}") == "}":
+            return
+
+
+def main():
+    args = sys.argv[1:]
+    as_json = "--json" in args
+    paths = [Path(arg) for arg in args if arg != "--json"]
+    if not paths:
+        print("Usage: python excalidraw_validator.py [--json] canvas.excalidraw [...]")
+        sys.exit(2)
+    failed = False
+    for path in paths:
+        errors = validate_file(path)
+        failed = failed or bool(errors_only(errors))
+        if as_json:
+            for error in errors:
+                print(json.dumps({"file": str(path), **error.to_dict()}))
+            continue
+        warnings = len(errors) - len(errors_only(errors))
+        if len(errors) > warnings:
+            print(f"❌ {path}: {len(errors) - warnings} errors, {warnings} warnings")
+        else:
+            print(f"✅ {path}" + (f" ({warnings} warnings)" if warnings else ""))
+        for error in errors:
+            print(f"   {'•' if error.severity == 'error' else '⚠️'} [{error.code}] {error.path}: {error.message}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+import os
+
+from excalidraw_agent_prompt import (
+    create_excalidraw_agent_system_blocks,
+    create_excalidraw_agent_system_prompt,
+    load_excalidraw_spec,
+)
+
+
+def test_the_bundled_spec_is_embedded():
+    _, spec = load_excalidraw_spec()
+    prompt = create_excalidraw_agent_system_prompt()
+    assert spec.rstrip() in prompt
+    assert "$excalidraw_spec" not in prompt and "PLACEHOLDER" not in prompt
+
+
+def test_repeated_calls_return_the_same_string(tmp_path):
+    spec = tmp_path / "spec.json"
+    spec.write_text('{"type": "excalidraw", "version": 2}')
+    first = create_excalidraw_agent_system_prompt(spec)
+    assert create_excalidraw_agent_system_prompt(spec) is first
+    blocks = create_excalidraw_agent_system_blocks(spec)
+    assert blocks[0]["text"] is first and blocks[0]["cache_control"] == {"type": "ephemeral"}
+
+
+def test_a_changed_spec_is_rendered_again(tmp_path):
+    spec = tmp_path / "spec.json"
+    spec.write_text('{"version": 1}')
+    first = create_excalidraw_agent_system_prompt(spec)
+    spec.write_text('{"version": 22}')
+    second = create_excalidraw_agent_system_prompt(spec)
+    assert '{"version": 22}' in second and second != first
+
+    # same content as another spec file: the rendered prompt is shared
+    other = tmp_path / "other.json"
+    other.write_text('{"version": 22}')
+    os.utime(other, ns=(1, 1))
+    assert create_excalidraw_agent_system_prompt(other) is second
@@ -0,0 +1,95 @@
+import json
+import math
+import random
+
+import pytest
+
+from excalidraw_spatial_index import MAX_CELLS_PER_ELEMENT, Box, SpatialIndex, element_bounds
+
+
+def random_elements(seed, n=60, spread=800):
+    rng = random.Random(seed)
+    return [{"id": f"e{i}", "type": "rectangle", "x": rng.uniform(-spread, spread), "y": rng.uniform(-spread, spread),
+             "width": rng.uniform(10, 200), "height": rng.uniform(10, 200),
+             "angle": rng.choice([0.0, 0.0, rng.uniform(0, math.pi)])} for i in range(n)]
+
+
+def brute_force_slot_distance(index, width, height, near, margin, step, radius):
+    """Distance to the closest free position on the whole step grid within `radius` steps."""
+    best = math.inf
+    for dx in range(-radius, radius + 1):
+        for dy in range(-radius, radius + 1):
+            box = Box.from_xywh(near[0] + dx * step, near[1] + dy * step, width, height).expanded(margin)
+            if not any(other.intersects(box) for other in index.boxes.values()):
+                best = min(best, math.hypot(dx * step, dy * step))
+    return best
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_free_slot_is_the_closest_free_grid_position(seed):
+    index = SpatialIndex.from_elements(random_elements(seed), cell_size=150)
+    near = (0.0, 0.0)
+    slot = index.find_free_slot(240, 120, near, margin=30, step=20)
+    assert not index.overlaps(slot, 30)
+    distance = math.hypot(slot.min_x - near[0], slot.min_y - near[1])
+    assert distance == pytest.approx(brute_force_slot_distance(index, 240, 120, near, 30, 20, radius=70))
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_query_matches_brute_force(seed):
+    elements = random_elements(seed)
+    elements.append({"id": "frame", "type": "frame", "x": -5_000, "y": -5_000, "width": 10_000, "height": 10_000})
+    index = SpatialIndex.from_elements(elements, cell_size=100)
+    assert "frame" in index._large
+    rng = random.Random(seed)
+    for _ in range(50):
+        box = Box.from_xywh(rng.uniform(-900, 900), rng.uniform(-900, 900), rng.uniform(1, 600), rng.uniform(1, 600))
+        expected = {element_id for element_id, other in index.boxes.items() if other.intersects(box)}
+        assert set(index.query(box)) == expected
+
+
+def test_large_elements_stay_out_of_the_grid():
+    index = SpatialIndex(cell_size=10)
+    side = 10 * math.isqrt(MAX_CELLS_PER_ELEMENT) + 10
+    index.insert({"id": "background", "x": 0, "y": 0, "width": side, "height": side})
+    assert index._large == {"background"} and not index._cells
+    assert index.query(Box.from_xywh(5, 5, 1, 1)) == ["background"]
+    index.remove("background")
+    assert index.query(Box.from_xywh(5, 5, 1, 1)) == [] and not index._large
+
+
+def test_remove_and_move():
+    index = SpatialIndex(cell_size=50)
+    index.insert({"id": "a", "x": 0, "y": 0, "width": 120, "height": 80})
+    index.insert({"id": "a", "x": 500, "y": 500, "width": 10, "height": 10})  # moved
+    assert index.query(Box.from_xywh(10, 10, 5, 5)) == []
+    assert index.query(Box.from_xywh(505, 505, 1, 1)) == ["a"]
+    index.remove("a")
+    assert len(index) == 0 and not index._cells
+
+
+def test_rotated_bounds():
+    square = element_bounds({"type": "rectangle", "x": 0, "y": 0, "width": 100, "height": 100, "angle": math.pi / 4})
+    half_diagonal = 50 * math.sqrt(2)
+    assert square.min_x == pytest.approx(50 - half_diagonal) and square.max_y == pytest.approx(50 + half_diagonal)
+
+    circle = element_bounds({"type": "ellipse", "x": 0, "y": 0, "width": 100, "height": 100, "angle": 1.0})
+    assert (circle.min_x, circle.max_x) == pytest.approx((0, 100))
+
+    turned = element_bounds({"type": "rectangle", "x": 0, "y": 0, "width": 200, "height": 100, "angle": math.pi / 2})
+    assert (turned.min_x, turned.min_y, turned.max_x, turned.max_y) == pytest.approx((50, -50, 150, 150))
+
+    arrow = element_bounds({"type": "arrow", "x": 10, "y": 10, "points": [[0, 0], [100, 0]], "angle": math.pi / 2})
+    assert (arrow.min_x, arrow.min_y, arrow.max_x, arrow.max_y) == pytest.approx((60, -40, 60, 60))
+
+
+def test_index_from_a_file_skips_deleted_elements(tmp_path):
+    path = tmp_path / "canvas.excalidraw"
+    path.write_text(json.dumps({"type": "excalidraw", "version": 2, "elements": [
+        {"id": "a", "type": "rectangle", "x": 0, "y": 0, "width": 100, "height": 100},
+        {"id": "b", "type": "rectangle", "x": 0, "y": 0, "width": 100, "height": 100, "isDeleted": True},
+    ], "files": {}}))
+    index = SpatialIndex.from_file(path)
+    assert list(index.boxes) == ["a"]
+    slot = index.find_free_slot(100, 100)  # default: right of the canvas, past the margin
+    assert (slot.min_x, slot.min_y) == (150, 0)
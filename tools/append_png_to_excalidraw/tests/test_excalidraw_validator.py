@@ -0,0 +1,106 @@
+import io
+import json
+
+import pytest
+
+from excalidraw_validator import errors_only, iter_elements, validate_file, validate_text
+
+
+def rectangle(element_id, index, **fields):
+    return {"id": element_id, "type": "rectangle", "x": 0, "y": 0, "width": 100.5, "height": 40,
+            "strokeColor": "#1e1e1e", "backgroundColor": "transparent", "index": index, **fields}
+
+
+def canvas():
+    return {
+        "type": "excalidraw",
+        "version": 2,
+        "source": "https://excalidraw.com",
+        "appState": {"gridSize": None, "viewBackgroundColor": "#ffffff", "nested": [{"a": "]}"}]},
+        "elements": [
+            rectangle("box", "a0", boundElements=[{"type": "arrow", "id": "arrow"}, {"type": "text", "id": "label"}]),
+            {"id": "label", "type": "text", "x": 10, "y": 10, "text": "Hello \"world\" {[", "containerId": "box",
+             "index": "a1"},
+            {"id": "arrow", "type": "arrow", "x": 0, "y": 0, "points": [[0, 0], [120, 0]], "index": "a2",
+             "startBinding": {"elementId": "box", "focus": 0, "gap": 1},
+             "endBinding": {"elementId": "missing", "focus": 0, "gap": 1}},
+            rectangle("box", "a3", strokeColor="not a color!"),
+            rectangle("late", "a1"),
+            {"id": "orphan", "type": "text", "x": 0, "y": 1e-3, "text": "t", "containerId": "late"},
+            {"id": "weird", "type": "blob", "x": "12"},
+        ],
+        "files": {"f1": {"mimeType": "image/png", "dataURL": "data:image/png;base64," + "iVBOR\\\"]}{[" * 500}},
+    }
+
+
+def as_dicts(errors):
+    return [error.to_dict() for error in errors]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_streaming_matches_the_in_memory_validation(tmp_path, chunk_size, indent):
+    document = canvas()
+    path = tmp_path / "canvas.excalidraw"
+    path.write_text(json.dumps(document, indent=indent), encoding="utf-8")
+    with open(path, encoding="utf-8") as f:
+        header = {}
+        assert list(iter_elements(f, header, chunk_size)) == document["elements"]
+    assert header == {"type": "excalidraw", "version": 2, "source": "https://excalidraw.com", "elements": True}
+    assert as_dicts(validate_file(path, chunk_size)) == as_dicts(validate_text(path.read_text()))
+
+
+def test_error_codes_and_paths():
+    errors = validate_text(json.dumps(canvas()))
+    found = {(error.code, error.path) for error in errors}
+    assert found == {
+        ("missing_reference", "elements[2].endBinding.elementId"),
+        ("duplicate_id", "elements[3].id"),
+        ("invalid_color", "elements[3].strokeColor"),
+        ("index_out_of_order", "elements[4].index"),
+        ("unmirrored_reference", "elements[5].containerId"),
+        ("unknown_type", "elements[6].type"),
+        ("not_a_number", "elements[6].x"),
+        ("missing_field", "elements[6].y"),
+    }
+
+
+def test_out_of_order_indices_are_only_a_warning():
+    document = {"type": "excalidraw", "version": 2, "elements": [rectangle("a", "a1"), rectangle("b", "a0")]}
+    errors = validate_text(json.dumps(document))
+    assert [(error.code, error.severity) for error in errors] == [("index_out_of_order", "warning")]
+    assert errors_only(errors) == []
+
+
+def test_forward_references_resolve():
+    arrow = {"id": "arrow", "type": "arrow", "x": 0, "y": 0, "points": [[0, 0], [1, 1]],
+             "startBinding": {"elementId": "box"}, "endBinding": None}
+    document = {"type": "excalidraw", "version": 2,
+                "elements": [arrow, rectangle("box", None, boundElements=[{"type": "arrow", "id": "arrow"}])]}
+    assert validate_text(json.dumps(document)) == []
+
+
+@pytest.mark.parametrize("text, code", [
+    ('{"type": "excalidraw", "version": 2, "elements": [{"id": "a"', "invalid_json"),
+    ('{"type": "excalidraw", "version": 2, "elements": [] "files": {}}', "invalid_json"),
+    ('{"type": "excalidraw", "version": 2}', "missing_elements"),
+    ('{"type": "excalidrawlib", "version": 2, "elements": []}', "invalid_header"),
+])
+def test_malformed_files(tmp_path, text, code):
+    path = tmp_path / "bad.excalidraw"
+    path.write_text(text)
+    assert [error.code for error in validate_file(path, chunk_size=5)] == [code]
+    assert [error.code for error in validate_text(text)] == [code]
+
+
+def test_a_large_payload_before_the_elements_is_read_in_fixed_chunks():
+    reads = []
+    text = json.dumps({"files": {"f": {"dataURL": "x" * 10_000}}, "elements": [{"id": "a"}]})
+
+    class Reader(io.StringIO):
+        def read(self, size=-1):
+            reads.append(size)
+            return super().read(size)
+
+    assert list(iter_elements(Reader(text), chunk_size=64)) == [{"id": "a"}]
+    assert set(reads) == {64} and len(reads) > 10_000 / 64
@@ -19,22 +19,24 @@
  * Parameters:
  * - pngFilePath: Path to PNG file (relative to public/assets/pngs)
  * - excalidrawJsonPath: Path to target Excalidraw JSON file
- * - options: Optional object with width, height, x, y positioning parameters
+ * - options: Optional object with width, height, x, y positioning parameters; without x/y the image
+ *   goes to the closest free slot (excalidraw_spatial_index.py), near options.near if given
  * 
  * Returns:
- * - Object with fileId, elementId, and success status
+ * - Object with fileId, elementId, x, y, validation findings (excalidraw_validator.py) and success status
  * 
  * Dependencies:
  * - fs: File system operations
  * - path: Path manipulation utilities
  * - ./png_to_json: PNG to Excalidraw file format conversion
+ * - python3 (or $PYTHON): runs the spatial index and validator; skipped with a warning when missing
  * 
  * Example:
  * appendPngToExcalidraw('icon.png', './diagram.excalidraw', { width: 200, height: 150 });
  */
 const fs = require('fs');
 const path = require('path');
-const {appendPngToExcalidraw} = require('./tool_definition');
+const {appendPngToExcalidraw} = require('./append_png_to_excalidraw');
 
 // CLI usage
 if (require.main === module) {
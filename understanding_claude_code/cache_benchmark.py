@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Repeated-trial prompt caching benchmark.
+
+For each model in provider_models.ALL_MODELS, runs N rounds in which a cached
+request (system prompt carrying `cache_control`) and an uncached request are
+issued in a random order, after warmup rounds that create the cache and are
+discarded. Each trial records TTFT, total latency, tokens/sec and cost.
+Results are summarized as means with bootstrap 95% confidence intervals and
+a permutation-test p-value for cached vs uncached, and every trial plus the
+summary is written as JSONL so runs can be compared over time.
+
+Usage:
+    python cache_benchmark.py --trials 10 --warmup 1 --concurrency 3
+    python cache_benchmark.py --mock      # against a local mock server, no spend
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import anthropic
+import numpy as np
+import pandas as pd
+
+from caching_experiment import ProfilerStreaming
+from cost_engine import price_usage
+from document_loader import fetch_essay, offline_document
+from provider_models import ALL_MODELS, AnthropicModel
+
+OUTPUT_DIR = Path(__file__).resolve().parent / "outputs" / "benchmarks"
+METRICS = ["ttft_s", "total_latency_s", "tokens_per_s", "total_cost"]
+CONFIGS = ("cached", "uncached")
+QUESTION = "What are the three qualities mentioned for choosing work? Answer in two sentences."
+
+
+def run_trial(client: anthropic.Anthropic, model: AnthropicModel, system_text: str,
+              config: str, max_tokens: int, semaphore: threading.Semaphore) -> Dict:
+    """Issue one streamed request and measure it."""
+    system_block = {"type": "text", "text": system_text}
+    if config == "cached":
+        system_block["cache_control"] = {"type": "ephemeral"}
+
+    profiler = ProfilerStreaming(model=model, cache_used=config == "cached")
+    with semaphore:
+        profiler.begin()
+        with client.messages.stream(
+            model=model.name,
+            max_tokens=max_tokens,
+            system=[system_block],
+            messages=[{"role": "user", "content": QUESTION}],
+        ) as stream:
+            for _ in profiler.wrap(stream.text_stream):
+                pass
+        final_message = stream.get_final_message()
+    profiler.finish(final_message.usage)
+
+    usage = final_message.usage.model_dump()
+    summary = profiler.summary()
+    return {
+        "model": model.name,
+        "config": config,
+        "ttft_s": summary["ttft_s"],
+        "total_latency_s": summary["total_duration_s"],
+        "tokens_per_s": summary["tokens_per_s"],
+        "input_tokens": usage.get("input_tokens"),
+        "output_tokens": usage.get("output_tokens"),
+        "cache_creation_input_tokens": usage.get("cache_creation_input_tokens") or 0,
+        "cache_read_input_tokens": usage.get("cache_read_input_tokens") or 0,
+        "total_cost": price_usage(usage, model.name)["total_cost"],
+    }
+
+
+def run_model(client: anthropic.Anthropic, model: AnthropicModel, system_text: str, trials: int,
+              warmup: int, max_tokens: int, semaphore: threading.Semaphore, seed: int) -> List[Dict]:
+    """Warmup rounds, then `trials` rounds with the two configs in a random order each round."""
+    rng = random.Random(f"{seed}:{model.name}")
+    results = []
+    for round_index in range(warmup + trials):
+        order = list(CONFIGS)
+        rng.shuffle(order)
+        for config in order:
+            try:
+                trial = run_trial(client, model, system_text, config, max_tokens, semaphore)
+            except anthropic.APIError as e:
+                print(f"❌ {model.name} {config}: {e}")
+                continue
+            trial.update(round=round_index, warmup=round_index < warmup)
+            results.append(trial)
+    return results
+
+
+def bootstrap_ci(values: np.ndarray, rng: np.random.Generator, n_resamples: int = 5_000, level: float = 0.95):
+    if len(values) < 2:
+        return np.nan, np.nan
+    means = rng.choice(values, size=(n_resamples, len(values)), replace=True).mean(axis=1)
+    return tuple(np.quantile(means, [(1 - level) / 2, (1 + level) / 2]))
+
+
+def permutation_p_value(a: np.ndarray, b: np.ndarray, rng: np.random.Generator, n_resamples: int = 10_000) -> float:
+    """Two-sided p-value for a difference in means, by label permutation."""
+    if len(a) < 2 or len(b) < 2:
+        return np.nan
+    observed = abs(a.mean() - b.mean())
+    pooled = np.concatenate([a, b])
+    permuted = np.argsort(rng.random((n_resamples, len(pooled))), axis=1)
+    shuffled = pooled[permuted]
+    diffs = np.abs(shuffled[:, : len(a)].mean(axis=1) - shuffled[:, len(a):].mean(axis=1))
+    return float((np.sum(diffs >= observed) + 1) / (n_resamples + 1))
+
+
+def summarize(trials: pd.DataFrame, seed: int = 0) -> pd.DataFrame:
+    """Mean, 95% CI and cached-vs-uncached significance per model and metric (warmup excluded)."""
+    rng = np.random.default_rng(seed)
+    measured = trials[~trials["warmup"]]
+    rows = []
+    for model in measured["model"].unique():
+        for metric in METRICS:
+            per_config = {
+                config: measured.loc[(measured["model"] == model) & (measured["config"] == config), metric]
+                .dropna().to_numpy(dtype=float)
+                for config in CONFIGS
+            }
+            row = {"model": model, "metric": metric}
+            for config, values in per_config.items():
+                low, high = bootstrap_ci(values, rng)
+                row.update({f"{config}_n": len(values), f"{config}_mean": values.mean() if len(values) else np.nan,
+                            f"{config}_ci_low": low, f"{config}_ci_high": high})
+            row["p_value"] = permutation_p_value(per_config["cached"], per_config["uncached"], rng)
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def write_results(trials: pd.DataFrame, summary: pd.DataFrame, metadata: Dict, output: Optional[Path] = None) -> Path:
+    """Write metadata, every trial and the summary rows to one JSONL file."""
+    output = output or OUTPUT_DIR / f"cache_benchmark_{metadata['started_at'].replace(':', '-')}.jsonl"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        f.write(json.dumps({"type": "run", **metadata}) + "\n")
+        for record in trials.to_dict(orient="records"):
+            f.write(json.dumps({"type": "trial", **record}, default=float) + "\n")
+        for record in summary.to_dict(orient="records"):
+            f.write(json.dumps({"type": "summary", **record}, default=float) + "\n")
+    return output
+
+
+def run_benchmark(models: Sequence[AnthropicModel], trials: int, warmup: int, concurrency: int,
+                  max_tokens: int, seed: int, client: anthropic.Anthropic, system_text: str) -> pd.DataFrame:
+    """Models run in parallel (trials stay sequential within a model); at most `concurrency` requests in flight."""
+    semaphore = threading.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=len(models)) as pool:
+        futures = [pool.submit(run_model, client, model, system_text, trials, warmup, max_tokens, semaphore, seed)
+                   for model in models]
+        return pd.DataFrame([trial for future in futures for trial in future.result()])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cached vs uncached prompt benchmark")
+    parser.add_argument("--trials", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--concurrency", type=int, default=3, help="Maximum requests in flight")
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--models", nargs="*", help="Model names (default: provider_models.ALL_MODELS)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mock", action="store_true", help="Run against a local mock Messages server")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    models = [m for m in ALL_MODELS if not args.models or m.name in args.models]
+    server = None
+    if args.mock:
+        from mock_messages_server import MockServerConfig, start_mock_server
+        server, base_url = start_mock_server(MockServerConfig(seed=args.seed))
+        client = anthropic.Anthropic(base_url=base_url, api_key="mock")
+    else:
+        client = anthropic.Anthropic()
+
+    metadata = {
+        "started_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "models": [m.name for m in models],
+        "trials": args.trials,
+        "warmup": args.warmup,
+        "concurrency": args.concurrency,
+        "max_tokens": args.max_tokens,
+        "seed": args.seed,
+        "base_url": str(client.base_url),
+    }
+    # mock runs stay offline, with a document above every model's minimum cacheable length
+    document = offline_document() if args.mock else fetch_essay()
+    start = time.perf_counter()
+    trials = run_benchmark(models, args.trials, args.warmup, args.concurrency, args.max_tokens,
+                           args.seed, client, document)
+    metadata["duration_s"] = time.perf_counter() - start
+    if server is not None:
+        server.shutdown()
+
+    if trials.empty:
+        print("No successful trials")
+        return
+    summary = summarize(trials, args.seed)
+    pd.set_option("display.width", 200)
+    print(summary.round(4).to_string(index=False))
+    print(f"\n✅ Results written to {write_results(trials, summary, metadata, args.output)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Offline prompt-cache breakpoint optimizer.
+
+Replays the Messages API requests captured in logs/*.jsonl, simulates the
+prefix cache (5 minute ephemeral TTL, at most 4 `cache_control` breakpoints,
+20-block lookback, minimum cacheable prefix length) and searches for the
+breakpoint placement that minimizes cost for each session.
+
+Placements are expressed as sets of anchors ("end of tools", "end of system",
+"last message", ...) so that a recommendation carries over from one request of
+a conversation to the next, the same way a client would implement it.
+"""
+
+import hashlib
+import json
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from itertools import accumulate, combinations
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from log_analytics import iter_log_files, iter_message_exchanges
+from provider_models import AnthropicModel, model_for_name
+
+CACHE_TTL = timedelta(minutes=5)
+MAX_BREAKPOINTS = 4
+LOOKBACK_BLOCKS = 20
+
+# Anchors a client can place a breakpoint on, in prompt order
+ANCHORS = ("tools", "system", "first_message", "previous_message", "last_message")
+LOGGED = "logged"
+
+
+@dataclass
+class PromptBlock:
+    """One cacheable content block of a request, in prefix order (tools -> system -> messages)."""
+    section: str
+    message_index: Optional[int]
+    digest: str
+    tokens: int
+    has_breakpoint: bool
+
+
+def min_cacheable_tokens(model: AnthropicModel) -> int:
+    """Shortest prefix the API will cache for this model."""
+    return 2048 if "haiku" in model.name else 1024
+
+
+def _canonical(block) -> str:
+    """Serialize a block without its cache_control marker, so placement doesn't change its identity."""
+    if isinstance(block, dict):
+        block = {k: v for k, v in block.items() if k != "cache_control"}
+    return json.dumps(block, sort_keys=True, separators=(",", ":"))
+
+
+def split_prompt_blocks(body: dict, total_input_tokens: int) -> List[PromptBlock]:
+    """
+    Flatten a request body into its cacheable blocks.
+
+    The logged usage gives the exact input token total of the request; it is
+    spread over the blocks in proportion to their serialized length.
+
+    Args:
+        body (dict): Messages API request body
+        total_input_tokens (int): input + cache write + cache read tokens from the usage
+
+    Returns:
+        list: PromptBlock objects in prefix order
+    """
+    raw = []  # (section, message_index, block)
+    for tool in body.get("tools") or []:
+        raw.append(("tools", None, tool))
+
+    system = body.get("system") or []
+    if isinstance(system, str):
+        system = [{"type": "text", "text": system}]
+    for block in system:
+        raw.append(("system", None, block))
+
+    for index, message in enumerate(body.get("messages") or []):
+        content = message.get("content")
+        if isinstance(content, str):
+            content = [{"type": "text", "text": content}]
+        for block in content:
+            raw.append(("messages", index, {"role": message.get("role"), **block}))
+
+    serialized = [_canonical(block) for _, _, block in raw]
+    total_chars = sum(len(s) for s in serialized) or 1
+
+    # Allocate whole tokens so that the per-block counts add up to the logged total
+    cumulative_chars = list(accumulate(len(s) for s in serialized))
+    cumulative_tokens = [round(total_input_tokens * c / total_chars) for c in cumulative_chars]
+    tokens = [b - a for a, b in zip([0] + cumulative_tokens[:-1], cumulative_tokens)]
+
+    return [
+        PromptBlock(
+            section=section,
+            message_index=message_index,
+            digest=hashlib.sha1(text.encode()).hexdigest(),
+            tokens=n_tokens,
+            has_breakpoint=isinstance(block, dict) and "cache_control" in block,
+        )
+        for (section, message_index, block), text, n_tokens in zip(raw, serialized, tokens)
+    ]
+
+
+def anchor_positions(blocks: Sequence[PromptBlock]) -> Dict[str, int]:
+    """Map each anchor name to the index of the block that ends it (missing anchors are omitted)."""
+    positions = {}
+    message_ends = {}
+    for i, block in enumerate(blocks):
+        if block.section in ("tools", "system"):
+            positions[block.section] = i
+        else:
+            message_ends[block.message_index] = i
+
+    if message_ends:
+        ordered = [message_ends[k] for k in sorted(message_ends)]
+        positions["first_message"] = ordered[0]
+        positions["last_message"] = ordered[-1]
+        if len(ordered) > 1:
+            positions["previous_message"] = ordered[-2]
+    return positions
+
+
+def breakpoints_for(blocks: Sequence[PromptBlock], placement: Union[str, Tuple[str, ...]]) -> List[int]:
+    """Block indices carrying a breakpoint under a placement (an anchor tuple or LOGGED)."""
+    if placement == LOGGED:
+        positions = [i for i, block in enumerate(blocks) if block.has_breakpoint]
+    else:
+        anchors = anchor_positions(blocks)
+        positions = [anchors[name] for name in placement if name in anchors]
+    return sorted(set(positions))[-MAX_BREAKPOINTS:]
+
+
+class PrefixCacheSimulator:
+    """Ephemeral prefix cache shared by all requests of a replay, keyed by (model, prefix hash)."""
+
+    def __init__(self, ttl: timedelta = CACHE_TTL):
+        self.ttl = ttl
+        self.entries: Dict[Tuple[str, str], datetime] = {}
+
+    def request(self, model: AnthropicModel, blocks: Sequence[PromptBlock],
+                breakpoints: Sequence[int], now: datetime) -> Dict[str, int]:
+        """
+        Simulate one request and return its token split.
+
+        Returns:
+            dict: cache_read_input_tokens, cache_creation_input_tokens and input_tokens
+        """
+        prefix_digests = list(accumulate(
+            (block.digest for block in blocks),
+            lambda prev, digest: hashlib.sha1((prev + digest).encode()).hexdigest(),
+        ))
+        cumulative = list(accumulate(block.tokens for block in blocks))
+        total = cumulative[-1] if cumulative else 0
+        min_tokens = min_cacheable_tokens(model)
+
+        # Cache read: longest live prefix found by looking back from each breakpoint
+        read_position = None
+        for bp in breakpoints:
+            for position in range(bp, max(bp - LOOKBACK_BLOCKS, -1), -1):
+                key = (model.name, prefix_digests[position])
+                expires = self.entries.get(key)
+                if expires is not None and expires > now:
+                    if read_position is None or position > read_position:
+                        read_position = position
+                    break
+        read_tokens = cumulative[read_position] if read_position is not None else 0
+        if read_position is not None:
+            self.entries[(model.name, prefix_digests[read_position])] = now + self.ttl
+
+        # Cache write: everything up to the last breakpoint long enough to be cached
+        cacheable = [bp for bp in breakpoints if cumulative[bp] >= min_tokens]
+        write_tokens = 0
+        if cacheable and cumulative[cacheable[-1]] > read_tokens:
+            write_tokens = cumulative[cacheable[-1]] - read_tokens
+        for bp in cacheable:
+            self.entries[(model.name, prefix_digests[bp])] = now + self.ttl
+
+        return {
+            "cache_read_input_tokens": read_tokens,
+            "cache_creation_input_tokens": write_tokens,
+            "input_tokens": total - read_tokens - write_tokens,
+        }
+
+
+def price_usage(model: AnthropicModel, usage: Dict[str, int]) -> float:
+    """Dollar cost of a usage split at the model's AnthropicModel prices."""
+    return (
+        usage.get("input_tokens", 0) * model.input_price_per_mtok
+        + usage.get("cache_creation_input_tokens", 0) * model.prompt_caching_write_price_per_mtok
+        + usage.get("cache_read_input_tokens", 0) * model.prompt_caching_read_price_per_mtok
+        + usage.get("output_tokens", 0) * model.output_price_per_mtok
+    ) / 1_000_000
+
+
+def load_session_requests(paths: Optional[Sequence[Path]] = None) -> Dict[str, List[dict]]:
+    """Group the logged Messages calls by session, prepared for replay and sorted by time."""
+    sessions: Dict[str, List[dict]] = {}
+    for exchange in iter_message_exchanges(paths):
+        model = model_for_name(exchange["body"].get("model", ""))
+        usage = exchange["usage"]
+        if model is None or not usage:
+            continue
+        total_input = (
+            (usage.get("input_tokens") or 0)
+            + (usage.get("cache_creation_input_tokens") or 0)
+            + (usage.get("cache_read_input_tokens") or 0)
+        )
+        sessions.setdefault(exchange["session"], []).append({
+            "timestamp": exchange["timestamp"],
+            "model": model,
+            "blocks": split_prompt_blocks(exchange["body"], total_input),
+            "output_tokens": usage.get("output_tokens") or 0,
+        })
+    for requests in sessions.values():
+        requests.sort(key=lambda r: r["timestamp"])
+    return sessions
+
+
+def replay_session(requests: Sequence[dict], placement: Union[str, Tuple[str, ...]]) -> Dict[str, float]:
+    """Replay a session under one placement and return its cached tokens and cost totals."""
+    cache = PrefixCacheSimulator()
+    totals = {"cache_read_input_tokens": 0, "cache_creation_input_tokens": 0,
+              "input_tokens": 0, "output_tokens": 0, "cost": 0.0}
+    for request in requests:
+        breakpoints = breakpoints_for(request["blocks"], placement)
+        usage = cache.request(request["model"], request["blocks"], breakpoints, request["timestamp"])
+        usage["output_tokens"] = request["output_tokens"]
+        for key, value in usage.items():
+            totals[key] += value
+        totals["cost"] += price_usage(request["model"], usage)
+    return totals
+
+
+def candidate_placements() -> List[Tuple[str, ...]]:
+    """Every anchor subset that fits in the breakpoint limit, including no caching at all."""
+    return [combo for k in range(MAX_BREAKPOINTS + 1) for combo in combinations(ANCHORS, k)]
+
+
+def optimize_session(requests: Sequence[dict]) -> Tuple[pd.DataFrame, dict]:
+    """
+    Search all candidate placements for one session.
+
+    Returns:
+        tuple: (all placements ranked by cost, recommendation dict)
+    """
+    rows = []
+    for placement in [LOGGED] + candidate_placements():
+        totals = replay_session(requests, placement)
+        name = placement if placement == LOGGED else ("+".join(placement) or "none")
+        rows.append({"placement": name, **totals})
+
+    ranked = pd.DataFrame(rows).sort_values(
+        ["cost", "cache_read_input_tokens"], ascending=[True, False]
+    ).reset_index(drop=True)
+    by_name = ranked.set_index("placement")
+
+    best = ranked.iloc[0]
+    logged_cost = by_name.loc[LOGGED, "cost"]
+    uncached_cost = by_name.loc["none", "cost"]
+    recommendation = {
+        "requests": len(requests),
+        "recommended": best["placement"],
+        "cached_tokens": int(best["cache_read_input_tokens"]),
+        "cost": best["cost"],
+        "logged_cost": logged_cost,
+        "uncached_cost": uncached_cost,
+        "savings_vs_logged": logged_cost - best["cost"],
+        "savings_vs_uncached": uncached_cost - best["cost"],
+    }
+    return ranked, recommendation
+
+
+def main():
+    """Print a breakpoint recommendation and projected savings for each logged session."""
+    paths = [Path(p) for p in sys.argv[1:]] or iter_log_files()
+    sessions = load_session_requests(paths)
+    if not sessions:
+        print("Error: no priced Messages API requests found in the logs", file=sys.stderr)
+        sys.exit(1)
+
+    recommendations = {}
+    for session, requests in sessions.items():
+        ranked, recommendation = optimize_session(requests)
+        recommendations[session] = recommendation
+        print(f"\n{session} ({len(requests)} requests) - top placements:")
+        print(ranked.head(5).to_string(index=False))
+
+    summary = pd.DataFrame.from_dict(recommendations, orient="index")
+    pd.set_option("display.width", 200)
+    print("\nRecommendations:")
+    print(summary.to_string())
+    print(f"\nProjected savings vs logged placement: ${summary['savings_vs_logged'].sum():.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+Keep-alive scheduler for ephemeral prompt caches.
+
+A cache entry lives for 5 minutes after its last write or read. When the gap
+between two uses of a large cached prefix is longer than that, the next use
+pays the cache-write premium again. Any request that reads the prefix
+refreshes its TTL, so a minimal request (same prefix, one-word user turn,
+max_tokens=1) sent just before expiry keeps the entry warm. The cost is a
+cache read of the prefix.
+
+The scheduler tracks registered prefixes and their uses. When an entry is
+about to expire, it weighs the refreshes needed to bridge the gap until the
+expected next use against the premium that use would pay after a miss, at the
+AnthropicModel prices:
+
+    keep warm  <=>  p_reuse * tokens * (write - read) price  >  spent + n_refreshes * refresh cost
+
+where `spent` is what the refreshes since the last real use already cost, so
+bridging one gap never costs more than the premium it can save. Once the
+expected next use is overdue, p_reuse decays as expected_gap / idle time and
+only the next refresh is weighed, so an abandoned prefix stops being
+refreshed after a few intervals.
+
+Every decision is logged. Each real use after a bridged gap credits the
+premium it avoided, so `report()` shows what the refreshes actually saved.
+
+Usage:
+    python cache_keepalive.py          # demo against the mock server with a 3 s TTL
+"""
+
+import hashlib
+import heapq
+import json
+import math
+import statistics
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from cache_breakpoint_optimizer import CACHE_TTL, min_cacheable_tokens
+from cost_engine import price_usage
+from provider_models import AnthropicModel, model_for_name
+from token_estimator import TOKEN_ESTIMATOR
+
+REFRESH_MESSAGE = {"role": "user", "content": "."}
+
+
+def prefix_key(model_name: str, system: List[dict], messages: List[dict]) -> str:
+    return hashlib.sha1(json.dumps([model_name, system, messages], sort_keys=True).encode()).hexdigest()[:12]
+
+
+@dataclass
+class CachedPrefix:
+    """A cached request prefix: the system blocks (and messages) up to its last cache_control breakpoint."""
+    prefix_id: str
+    model: AnthropicModel
+    system: List[dict]
+    messages: List[dict]
+    tokens: int
+    expected_gap_s: Optional[float] = None  # None: estimated from the observed gaps between uses
+    p_reuse: float = 1.0  # probability that there is a next use at all
+    max_idle_s: float = 3_600.0  # stop refreshing after this long without a real use
+    last_use: float = 0.0
+    last_touch: float = 0.0  # last request of any kind that wrote or read the entry
+    gaps: List[float] = field(default_factory=list)
+    refreshes: int = 0
+    refreshes_since_use: int = 0
+    refresh_cost: float = 0.0
+    refresh_cost_since_use: float = 0.0
+    premiums_avoided: float = 0.0
+    last_decision: str = ""
+
+    def expected_gap(self) -> Optional[float]:
+        if self.expected_gap_s is not None:
+            return self.expected_gap_s
+        return statistics.median(self.gaps[-20:]) if self.gaps else None
+
+
+class CacheKeepAlive:
+    def __init__(self, client, ttl_s: float = CACHE_TTL.total_seconds(), margin_s: float = 20.0,
+                 clock: Callable[[], float] = time.monotonic, verbose: bool = True):
+        """
+        Args:
+            client: Anthropic client (or mock) used for the refresh requests
+            ttl_s (float): Cache TTL; refreshes are sent `margin_s` before it runs out
+            clock: Monotonic clock in seconds, injectable for simulations
+        """
+        self.client = client
+        self.ttl_s = ttl_s
+        self.margin_s = min(margin_s, ttl_s / 2)
+        self.clock = clock
+        self.verbose = verbose
+        self.prefixes: Dict[str, CachedPrefix] = {}
+        self.decisions: List[Dict] = []
+        self._due: List[tuple] = []  # heap of (due_time, touch_time, prefix_id)
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def register(self, model_name: str, system: List[dict], messages: Optional[List[dict]] = None,
+                 tokens: Optional[int] = None, expected_gap_s: Optional[float] = None, p_reuse: float = 1.0,
+                 prefix_id: Optional[str] = None) -> str:
+        """
+        Track a cached prefix, written just now by a real request.
+
+        Args:
+            model_name (str): API model id
+            system (list): System blocks exactly as sent, cache_control included
+            messages (list): Messages up to and including the last breakpoint, if it is not on the system prompt
+            tokens (int): Prefix size; estimated when not given
+            expected_gap_s (float): Expected time between uses, if known in advance
+        """
+        model = model_for_name(model_name)
+        if model is None:
+            raise ValueError(f"Unknown model {model_name}")
+        messages = messages or []
+        if tokens is None:
+            tokens = TOKEN_ESTIMATOR.estimate(model.name, system=system, messages=messages)
+        prefix_id = prefix_id or prefix_key(model.name, system, messages)
+        now = self.clock()
+        with self._lock:
+            self.prefixes[prefix_id] = CachedPrefix(prefix_id, model, system, messages, tokens,
+                                                    expected_gap_s, p_reuse, last_use=now, last_touch=now)
+            self._schedule(self.prefixes[prefix_id])
+        self._wake.set()
+        return prefix_id
+
+    def touch(self, prefix_id: str, usage: Optional[dict] = None):
+        """Record a real use of the prefix, with its usage when available, and credit any premium avoided."""
+        now = self.clock()
+        with self._lock:
+            prefix = self.prefixes[prefix_id]
+            gap = now - prefix.last_use
+            prefix.gaps.append(gap)
+            read = (usage or {}).get("cache_read_input_tokens") or 0
+            if prefix.refreshes_since_use and gap > self.ttl_s and (usage is None or read > 0):
+                # without the refreshes this use would have found the entry expired
+                prefix.premiums_avoided += self._premium(prefix)
+            prefix.refreshes_since_use = 0
+            prefix.refresh_cost_since_use = 0.0
+            prefix.last_use = prefix.last_touch = now
+            self._schedule(prefix)
+        self._wake.set()
+
+    def use(self, model_name: str, system: List[dict], messages: Optional[List[dict]] = None,
+            usage: Optional[dict] = None, **register_kwargs) -> str:
+        """Register the prefix on its first use, touch it on the later ones; returns its id."""
+        model = model_for_name(model_name)
+        prefix_id = prefix_key(model.name if model else model_name, system, messages or [])
+        if prefix_id in self.prefixes:
+            self.touch(prefix_id, usage)
+            return prefix_id
+        return self.register(model_name, system, messages, prefix_id=prefix_id, **register_kwargs)
+
+    def _schedule(self, prefix: CachedPrefix):
+        heapq.heappush(self._due, (prefix.last_touch + self.ttl_s - self.margin_s, prefix.last_touch, prefix.prefix_id))
+
+    def _premium(self, prefix: CachedPrefix) -> float:
+        """Extra cost of rewriting the prefix instead of reading it."""
+        model = prefix.model
+        return prefix.tokens * (model.prompt_caching_write_price_per_mtok - model.prompt_caching_read_price_per_mtok) / 1e6
+
+    def _refresh_cost(self, prefix: CachedPrefix) -> float:
+        """Expected cost of one refresh: the prefix read, the one-word turn and one output token."""
+        model = prefix.model
+        return (prefix.tokens * model.prompt_caching_read_price_per_mtok
+                + 10 * model.input_price_per_mtok + model.output_price_per_mtok) / 1e6
+
+    def decide(self, prefix: CachedPrefix, now: float) -> Dict:
+        """Break-even decision for refreshing `prefix` now."""
+        idle = now - prefix.last_use
+        decision = {"prefix_id": prefix.prefix_id, "model": prefix.model.name, "tokens": prefix.tokens,
+                    "idle_s": idle}
+        expected_gap = prefix.expected_gap()
+        refresh_interval = self.ttl_s - self.margin_s
+        if prefix.tokens < min_cacheable_tokens(prefix.model):
+            return {**decision, "keep": False, "reason": "prefix too short to be cached"}
+        if idle > prefix.max_idle_s:
+            return {**decision, "keep": False, "reason": "idle for longer than max_idle_s"}
+        if expected_gap is None:
+            return {**decision, "keep": False, "reason": "no expected next use yet"}
+
+        overdue = idle >= expected_gap
+        if overdue:
+            # the expected use didn't come: it gets less likely the longer we wait, weigh one refresh at a time
+            remaining = refresh_interval
+            p_reuse = prefix.p_reuse * (expected_gap / idle if idle > 0 else 1.0)
+        else:
+            remaining = expected_gap - idle
+            p_reuse = prefix.p_reuse
+        refreshes = math.ceil(max(remaining - self.margin_s, 0.0) / refresh_interval)
+        if refreshes == 0:
+            return {**decision, "keep": False, "reason": "next use expected before expiry"}
+        spent = prefix.refresh_cost_since_use
+        keepalive_cost = refreshes * self._refresh_cost(prefix)
+        expiry_cost = p_reuse * self._premium(prefix)
+        keep = expiry_cost > spent + keepalive_cost
+        if keep or not spent:
+            reason = "overdue, break-even" if overdue else "break-even"
+        else:
+            reason = "refresh budget spent"
+        return {**decision, "keep": keep,
+                "expected_gap_s": expected_gap, "refreshes_needed": refreshes,
+                "keepalive_cost": keepalive_cost, "spent_cost": spent, "expiry_cost": expiry_cost,
+                "reason": reason}
+
+    def refresh(self, prefix: CachedPrefix) -> dict:
+        response = self.client.messages.create(
+            model=prefix.model.name,
+            max_tokens=1,
+            system=prefix.system,
+            messages=prefix.messages + [REFRESH_MESSAGE],
+        )
+        usage = response.usage.model_dump()
+        cost = price_usage(usage, prefix.model.name)["total_cost"]
+        with self._lock:
+            prefix.refreshes += 1
+            prefix.refreshes_since_use += 1
+            prefix.refresh_cost += cost
+            prefix.refresh_cost_since_use += cost
+            prefix.last_touch = self.clock()
+            self._schedule(prefix)
+        return usage
+
+    def run_pending(self) -> Optional[float]:
+        """Decide (and refresh) every prefix that is due; returns the time of the next due entry."""
+        while True:
+            with self._lock:
+                if not self._due:
+                    return None
+                due, touch_time, prefix_id = self._due[0]
+                if due > self.clock():
+                    return due
+                heapq.heappop(self._due)
+                prefix = self.prefixes.get(prefix_id)
+                if prefix is None or prefix.last_touch != touch_time:
+                    continue  # superseded by a later use or refresh
+                decision = self.decide(prefix, self.clock())
+                prefix.last_decision = "refresh" if decision["keep"] else f"expire ({decision['reason']})"
+                self.decisions.append(decision)
+            if self.verbose:
+                self._print_decision(decision)
+            if decision["keep"]:
+                try:
+                    self.refresh(prefix)
+                except Exception as e:
+                    print(f"❌ keep-alive refresh of {prefix_id} failed: {e}")
+
+    def _print_decision(self, decision: Dict):
+        if "keepalive_cost" in decision:
+            print(f"🔥 {decision['prefix_id']} ({decision['model']}, {decision['tokens']} tokens): "
+                  f"{decision['refreshes_needed']} refreshes ${decision['keepalive_cost']:.6f} "
+                  f"(+${decision['spent_cost']:.6f} spent) vs "
+                  f"expiry ${decision['expiry_cost']:.6f} -> {'refresh' if decision['keep'] else 'let expire'}")
+        else:
+            print(f"🧊 {decision['prefix_id']}: let expire ({decision['reason']})")
+
+    def _run(self):
+        while not self._stop.is_set():
+            next_due = self.run_pending()
+            timeout = None if next_due is None else max(next_due - self.clock(), 0.0)
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def start(self) -> "CacheKeepAlive":
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="cache-keepalive", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def report(self) -> pd.DataFrame:
+        """Per prefix: refreshes sent and their cost, write premiums avoided and the net saving."""
+        with self._lock:
+            rows = [{
+                "prefix_id": p.prefix_id,
+                "model": p.model.name,
+                "tokens": p.tokens,
+                "uses": len(p.gaps) + 1,
+                "expected_gap_s": p.expected_gap(),
+                "refreshes": p.refreshes,
+                "refresh_cost": p.refresh_cost,
+                "premiums_avoided": p.premiums_avoided,
+                "net_saved": p.premiums_avoided - p.refresh_cost,
+                "last_decision": p.last_decision,
+            } for p in self.prefixes.values()]
+        return pd.DataFrame(rows)
+
+
+def main():
+    """Demo: uses 8 s apart against a mock server whose cache lives 3 s, with and without keep-alive."""
+    import anthropic
+    from mock_messages_server import MockServerConfig, start_mock_server
+    from provider_models import CLAUDE_SONNET_4
+
+    ttl_s, gap_s, uses = 3.0, 8.0, 4
+    system = [{"type": "text", "text": "You answer questions about this manual.\n" + "Section text. " * 2_000,
+               "cache_control": {"type": "ephemeral"}}]
+    for keep_warm in (False, True):
+        server, base_url = start_mock_server(MockServerConfig(ttft_median_s=0.05, token_latency_median_s=0.001,
+                                                              cache_ttl_s=ttl_s))
+        client = anthropic.Anthropic(base_url=base_url, api_key="mock")
+        keepalive = CacheKeepAlive(client, ttl_s=ttl_s, margin_s=0.5, verbose=keep_warm)
+        total = 0.0
+        for i in range(uses):
+            response = client.messages.create(model=CLAUDE_SONNET_4.name, max_tokens=50, system=system,
+                                              messages=[{"role": "user", "content": f"Question {i}"}])
+            usage = response.usage.model_dump()
+            total += price_usage(usage, CLAUDE_SONNET_4.name)["total_cost"]
+            keepalive.use(CLAUDE_SONNET_4.name, system, usage=usage, expected_gap_s=gap_s)
+            if keep_warm:
+                keepalive.start()
+            if i < uses - 1:
+                time.sleep(gap_s)
+        keepalive.stop()
+        server.shutdown()
+        report = keepalive.report()
+        total += report["refresh_cost"].sum()
+        print(f"\n{'With' if keep_warm else 'Without'} keep-alive: total ${total:.6f}")
+        print(report.round(6).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
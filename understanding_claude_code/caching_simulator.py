@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Event-driven multi-turn prompt caching cost simulator.
+
+Models conversations as streams of events (user turn arrives -> response
+completes -> think time -> next turn) on one shared clock, so that the
+ephemeral cache, its TTL expiry and a system prompt shared between
+conversations behave as they would in production. Every caching strategy is
+replayed over the same conversations; strategies (and replicates) run in
+parallel worker processes.
+
+Costs use the AnthropicModel prices, including the cache write premium and
+the cache read discount. Latency uses a simple prefill + decode model.
+
+Usage:
+    python caching_simulator.py [n_conversations] [--logs]
+"""
+
+import hashlib
+import heapq
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from cache_breakpoint_optimizer import PrefixCacheSimulator, PromptBlock, price_usage
+from provider_models import CLAUDE_SONNET_4, AnthropicModel, model_for_name
+
+# Breakpoint anchors per strategy, resolved against each request's blocks
+STRATEGIES: Dict[str, tuple] = {
+    "no_caching": (),
+    "system_only": ("system",),
+    "rolling_last_user": ("last_user",),
+    "multi_breakpoint": ("system", "previous_user", "last_user"),
+}
+
+EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class Turn:
+    """One user turn: how long the user thinks before sending it, and its sizes."""
+    think_time_s: float
+    user_tokens: int
+    output_tokens: int
+
+
+@dataclass
+class Conversation:
+    conversation_id: str
+    start_s: float
+    system_id: str  # conversations with the same id share the same system prompt
+    system_tokens: int
+    turns: List[Turn] = field(default_factory=list)
+    model_name: Optional[str] = None  # overrides the simulated model, e.g. for logged conversations
+
+
+@dataclass
+class LatencyModel:
+    """TTFT = base + per-token prefill (cheaper for cache reads); decode at a fixed rate."""
+    base_ttft_s: float = 0.4
+    prefill_s_per_token: float = 25e-6
+    cached_prefill_s_per_token: float = 2.5e-6
+    output_tokens_per_s: float = 60.0
+
+    def ttft(self, usage: Dict[str, int]) -> float:
+        uncached = usage["input_tokens"] + usage["cache_creation_input_tokens"]
+        return (self.base_ttft_s + uncached * self.prefill_s_per_token
+                + usage["cache_read_input_tokens"] * self.cached_prefill_s_per_token)
+
+    def decode(self, output_tokens: int) -> float:
+        return output_tokens / self.output_tokens_per_s
+
+
+def synthetic_conversations(n: int, seed: int = 0, shared_system_tokens: int = 8_000,
+                            mean_turns: float = 6.0, think_time_median_s: float = 45.0,
+                            long_pause_probability: float = 0.1,
+                            arrival_window_s: float = 3_600.0) -> List[Conversation]:
+    """
+    Generate conversations that share one system prompt.
+
+    Turn sizes and think times are log-normal; a fraction of the pauses are
+    long (6-30 minutes) so that the 5 minute TTL actually gets exercised.
+    """
+    rng = np.random.default_rng(seed)
+    conversations = []
+    for i in range(n):
+        n_turns = 1 + rng.poisson(mean_turns - 1)
+        think = rng.lognormal(np.log(think_time_median_s), 0.8, n_turns)
+        long_pauses = rng.random(n_turns) < long_pause_probability
+        think[long_pauses] = rng.uniform(360, 1_800, long_pauses.sum())
+        think[0] = 0.0
+        turns = [
+            Turn(think_time_s=float(t), user_tokens=int(u), output_tokens=int(o))
+            for t, u, o in zip(
+                think,
+                rng.lognormal(np.log(150), 1.0, n_turns).astype(int) + 1,
+                rng.lognormal(np.log(300), 0.7, n_turns).astype(int) + 1,
+            )
+        ]
+        conversations.append(Conversation(
+            conversation_id=f"synthetic-{seed}-{i}",
+            start_s=float(rng.uniform(0, arrival_window_s)),
+            system_id="shared-system",
+            system_tokens=shared_system_tokens,
+            turns=turns,
+        ))
+    return conversations
+
+
+def conversations_from_logs(paths=None) -> List[Conversation]:
+    """
+    Rebuild conversations from the logged Messages calls.
+
+    Calls with the same session, model and system prompt form a conversation;
+    each call becomes a turn whose user size is the growth of the input since
+    the previous call, and whose think time is the gap between the two calls.
+    """
+    from log_analytics import iter_message_exchanges
+
+    grouped: Dict[tuple, list] = {}
+    for exchange in iter_message_exchanges(paths):
+        body, usage = exchange["body"], exchange["usage"]
+        if not usage:
+            continue
+        system_key = hashlib.sha1(repr(body.get("system")).encode()).hexdigest()
+        grouped.setdefault((exchange["session"], body["model"], system_key), []).append(exchange)
+
+    conversations = []
+    for (session, model_name, system_key), exchanges in grouped.items():
+        exchanges.sort(key=lambda e: e["timestamp"])
+        turns, previous_total, previous_ts, previous_output = [], None, None, 0
+        system_tokens = None
+        for exchange in exchanges:
+            usage = exchange["usage"]
+            total = sum(usage.get(k) or 0 for k in
+                        ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"))
+            if previous_total is None:
+                # first call: attribute the cached part (or 90%) of the input to the system prompt
+                system_tokens = (usage.get("cache_creation_input_tokens") or 0) + (usage.get("cache_read_input_tokens") or 0)
+                system_tokens = system_tokens or int(total * 0.9)
+                user_tokens = total - system_tokens
+                think = 0.0
+            else:
+                user_tokens = total - previous_total - previous_output
+                think = (exchange["timestamp"] - previous_ts).total_seconds()
+            turns.append(Turn(think_time_s=think, user_tokens=max(int(user_tokens), 1),
+                              output_tokens=int(usage.get("output_tokens") or 1)))
+            previous_total, previous_ts = total, exchange["timestamp"]
+            previous_output = usage.get("output_tokens") or 0
+        conversations.append(Conversation(
+            conversation_id=f"{session}:{system_key[:8]}:{len(conversations)}",
+            start_s=(exchanges[0]["timestamp"] - EPOCH).total_seconds(),
+            system_id=system_key,
+            system_tokens=max(int(system_tokens), 1),
+            turns=turns,
+            model_name=model_name,
+        ))
+    return conversations
+
+
+def _request_blocks(conversation: Conversation, turn_index: int) -> List[PromptBlock]:
+    """System block followed by the user/assistant blocks of every turn up to `turn_index`."""
+    def block(digest_source: str, tokens: int) -> PromptBlock:
+        return PromptBlock(section="messages", message_index=None,
+                           digest=hashlib.sha1(digest_source.encode()).hexdigest(),
+                           tokens=tokens, has_breakpoint=False)
+
+    blocks = [block(f"system:{conversation.system_id}", conversation.system_tokens)]
+    for k, turn in enumerate(conversation.turns[: turn_index + 1]):
+        blocks.append(block(f"{conversation.conversation_id}:{k}:user", turn.user_tokens))
+        if k < turn_index:
+            blocks.append(block(f"{conversation.conversation_id}:{k}:assistant", turn.output_tokens))
+    return blocks
+
+
+def _breakpoints(strategy: str, n_blocks: int) -> List[int]:
+    positions = {"system": 0, "last_user": n_blocks - 1}
+    if n_blocks >= 4:
+        positions["previous_user"] = n_blocks - 3
+    return sorted({positions[a] for a in STRATEGIES[strategy] if a in positions})
+
+
+def simulate_strategy(strategy: str, conversations: Sequence[Conversation],
+                      model: AnthropicModel = CLAUDE_SONNET_4,
+                      latency: Optional[LatencyModel] = None) -> pd.DataFrame:
+    """
+    Run every conversation through one strategy on a shared event clock.
+
+    Returns:
+        pd.DataFrame: One row per request with its usage, cost, TTFT and latency
+    """
+    latency = latency or LatencyModel()
+    cache = PrefixCacheSimulator()
+    events = [(c.start_s, i, 0) for i, c in enumerate(conversations)]
+    heapq.heapify(events)
+
+    rows = []
+    while events:
+        now_s, conv_index, turn_index = heapq.heappop(events)
+        conversation = conversations[conv_index]
+        turn = conversation.turns[turn_index]
+
+        conversation_model = model_for_name(conversation.model_name or "") or model
+        blocks = _request_blocks(conversation, turn_index)
+        usage = cache.request(conversation_model, blocks, _breakpoints(strategy, len(blocks)),
+                              EPOCH + timedelta(seconds=now_s))
+        usage["output_tokens"] = turn.output_tokens
+        ttft = latency.ttft(usage)
+        duration = ttft + latency.decode(turn.output_tokens)
+
+        rows.append({
+            "strategy": strategy,
+            "conversation_id": conversation.conversation_id,
+            "turn": turn_index,
+            "time_s": now_s,
+            **usage,
+            "cost": price_usage(conversation_model, usage),
+            "ttft_s": ttft,
+            "latency_s": duration,
+        })
+        if turn_index + 1 < len(conversation.turns):
+            next_turn = conversation.turns[turn_index + 1]
+            heapq.heappush(events, (now_s + duration + next_turn.think_time_s, conv_index, turn_index + 1))
+    return pd.DataFrame(rows)
+
+
+def _simulate_job(job: tuple) -> pd.DataFrame:
+    strategy, conversations, model_name, latency, replicate = job
+    model = model_for_name(model_name)
+    df = simulate_strategy(strategy, conversations, model, latency)
+    df["replicate"] = replicate
+    return df
+
+
+def sweep_strategies(conversation_sets: Sequence[Sequence[Conversation]],
+                     strategies: Sequence[str] = tuple(STRATEGIES),
+                     model: AnthropicModel = CLAUDE_SONNET_4,
+                     latency: Optional[LatencyModel] = None,
+                     max_workers: Optional[int] = None) -> pd.DataFrame:
+    """Simulate every (strategy, conversation set) pair in parallel and concatenate the per-request rows."""
+    jobs = [(strategy, conversations, model.name, latency or LatencyModel(), replicate)
+            for replicate, conversations in enumerate(conversation_sets)
+            for strategy in strategies]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        return pd.concat(pool.map(_simulate_job, jobs), ignore_index=True)
+
+
+def strategy_distributions(requests: pd.DataFrame) -> pd.DataFrame:
+    """Per-strategy distributions of cost per conversation and of request TTFT / latency."""
+    per_conversation = requests.groupby(["strategy", "replicate", "conversation_id"]).agg(cost=("cost", "sum"))
+    cost = per_conversation.groupby("strategy")["cost"].describe(percentiles=[0.5, 0.9, 0.99])
+    cost.columns = [f"cost_{c}" for c in cost.columns]
+    timings = requests.groupby("strategy")[["ttft_s", "latency_s"]].quantile([0.5, 0.9, 0.99]).unstack()
+    timings.columns = [f"{metric}_p{int(q * 100)}" for metric, q in timings.columns]
+    totals = requests.groupby("strategy")[["cost", "cache_read_input_tokens", "cache_creation_input_tokens"]].sum()
+    totals.columns = ["total_cost", "cache_read_input_tokens", "cache_creation_input_tokens"]
+    return pd.concat([totals, cost.drop(columns="cost_count"), timings], axis=1).sort_values("total_cost")
+
+
+def main():
+    """Sweep all strategies over synthetic (default) or logged conversations and print the distributions."""
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    if "--logs" in sys.argv[1:]:
+        conversation_sets = [conversations_from_logs()]
+    else:
+        n = int(args[0]) if args else 2_000
+        conversation_sets = [synthetic_conversations(n, seed=seed) for seed in range(4)]
+
+    n_conversations = sum(len(s) for s in conversation_sets)
+    print(f"Simulating {len(STRATEGIES)} strategies over {n_conversations} conversations...")
+    requests = sweep_strategies(conversation_sets)
+
+    pd.set_option("display.width", 250)
+    pd.set_option("display.max_columns", 30)
+    print(strategy_distributions(requests).round(5).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Append-only conversation history shared by the caching and streaming experiments.
+
+The API payload is built incrementally: each turn is converted to its API
+message (and serialized to JSON) once, when it is added, and `get_turns`
+hands out that shared payload instead of rebuilding it. Moving the
+`cache_control` marker to the latest user turn swaps in a marked copy of
+that one message and restores the previous one, and turns are indexed by
+timestamp so `get_turns_before` is a binary search instead of a scan.
+
+Each turn's token count is estimated once, when it is added, and kept as a
+running total. An optional context policy bounds the payload: when the
+window goes over budget it is cut back well below the budget in one step,
+so the trimmed prefix then stays byte-identical (and cacheable) for many
+turns instead of shifting on every request.
+"""
+
+import json
+import uuid
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from provider_models import CLAUDE_HAIKU_35
+from token_estimator import TOKEN_ESTIMATOR
+
+CACHE_CONTROL = {"type": "ephemeral"}
+SUMMARY_PREFIX = "Summary of the earlier part of this conversation:\n"
+
+
+class ContextPolicy:
+    """Decides where the request window starts once the conversation goes over budget."""
+
+    def __init__(self, max_tokens: int, target_ratio: float = 0.6):
+        """
+        Args:
+            max_tokens (int): Budget for system + window tokens
+            target_ratio (float): Fraction of the budget to cut back to when trimming;
+                the lower it is, the longer the new prefix stays stable
+        """
+        self.max_tokens = max_tokens
+        self.target_ratio = target_ratio
+
+    def new_start(self, history: "ConversationHistory") -> Optional[int]:
+        """Index of the first message to keep, or None while within budget."""
+        if history.request_tokens <= self.max_tokens:
+            return None
+        target = self.target_ratio * self.max_tokens - history.system_tokens - history.summary_tokens
+        return history.window_start_for(target)
+
+    def summarize(self, history: "ConversationHistory", start: int, new_start: int) -> Optional[str]:
+        """Summary text replacing the dropped turns (None: drop them without a summary)."""
+        return None
+
+
+class KeepLastTokens(ContextPolicy):
+    """Keep the system prompt plus as many of the latest turns as fit in the budget."""
+
+
+class SummarizeOldest(ContextPolicy):
+    """Replace the turns that fall out of the window with a running summary."""
+
+    def __init__(self, max_tokens: int, summarize: Callable[[Optional[str], List[dict]], str],
+                 target_ratio: float = 0.6):
+        """
+        Args:
+            summarize: (previous summary or None, dropped turns) -> new summary text
+        """
+        super().__init__(max_tokens, target_ratio)
+        self._summarize = summarize
+
+    def summarize(self, history: "ConversationHistory", start: int, new_start: int) -> Optional[str]:
+        return self._summarize(history.summary, history.turns[start:new_start])
+
+
+def llm_summarizer(client, model_name: str = CLAUDE_HAIKU_35.name, max_tokens: int = 300):
+    """A `summarize` callable for SummarizeOldest that asks a (cheap) model for the summary."""
+    def summarize(previous: Optional[str], turns: List[dict]) -> str:
+        transcript = "\n".join(f"{t['role']}: {t['content'][0]['text']}" for t in turns)
+        if previous:
+            transcript = f"{SUMMARY_PREFIX}{previous}\n\n{transcript}"
+        response = client.messages.create(
+            model=model_name,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": f"Summarize this conversation in a few sentences, "
+                                                  f"keeping facts needed to continue it:\n\n{transcript}"}],
+        )
+        return response.content[0].text
+    return summarize
+
+
+class ConversationHistory:
+    def __init__(self, model_name: str = CLAUDE_HAIKU_35.name, system_tokens: int = 0,
+                 context_policy: Optional[ContextPolicy] = None):
+        """
+        Args:
+            model_name (str): Model whose tokenizer calibration is used for the turn counts
+            system_tokens (int): Size of the system prompt, counted in the policy's budget
+            context_policy: Optional ContextPolicy bounding the request payload
+        """
+        self.model_name = model_name
+        self.system_tokens = system_tokens
+        self.context_policy = context_policy
+        self.turns: List[dict] = []  # bookkeeping records: role, content, id, timestamp, tokens
+        self._all: List[dict] = []  # API message of every turn, never carrying the marker
+        self._all_serialized: List[str] = []  # JSON of every API message
+        self._cumulative_tokens: List[int] = [0]  # _cumulative_tokens[i] = tokens of turns[:i]
+        self._timestamps: List[datetime] = []  # non-decreasing, for bisect
+        self._start = 0  # first turn in the request window
+        self.summary: Optional[str] = None
+        self.summary_tokens = 0
+        self._messages: List[dict] = []  # request payload: optional summary + window
+        self._serialized: List[str] = []  # JSON of each payload message, kept in sync with _messages
+        self._last_user_index: Optional[int] = None  # payload index
+        self._marked_index: Optional[int] = None  # payload message currently carrying cache_control
+        self._unmarked: Optional[dict] = None  # the message the marked copy stands in for
+
+    def _add_turn(self, role: str, content: str, msg_id: Optional[str]):
+        timestamp = datetime.now()
+        if self._timestamps and timestamp < self._timestamps[-1]:
+            # wall clock stepped back: keep the index sorted
+            timestamp = self._timestamps[-1]
+
+        message = {"role": role, "content": [{"type": "text", "text": content}]}
+        tokens = TOKEN_ESTIMATOR.estimate(self.model_name, messages=[message])
+        self.turns.append(
+            {"role": role, "content": [{"type": "text", "text": content}],
+             "id": msg_id or str(uuid.uuid4()),  # Add an ID for tracking
+             "timestamp": timestamp,  # Add a timestamp for tracking
+             "tokens": tokens}
+        )
+        serialized = json.dumps(message)
+        self._all.append(message)
+        self._all_serialized.append(serialized)
+        self._cumulative_tokens.append(self._cumulative_tokens[-1] + tokens)
+        self._timestamps.append(timestamp)
+        self._messages.append(message)
+        self._serialized.append(serialized)
+        if role == "user":
+            self._last_user_index = len(self._messages) - 1
+        self._apply_policy()
+
+    def add_turn_assistant(self, content, msg_id: Optional[str] = None):
+        self._add_turn("assistant", content, msg_id)
+
+    def add_turn_user(self, content, msg_id: Optional[str] = None):
+        self._add_turn("user", content, msg_id)
+
+    @property
+    def window_tokens(self) -> int:
+        """Tokens of the turns currently sent (summary excluded)."""
+        return self._cumulative_tokens[-1] - self._cumulative_tokens[self._start]
+
+    @property
+    def request_tokens(self) -> int:
+        """System + summary + window tokens: the size of the next request."""
+        return self.system_tokens + self.summary_tokens + self.window_tokens
+
+    def window_start_for(self, target_tokens: float) -> int:
+        """Smallest user-turn index whose suffix fits in `target_tokens` (always keeps the last user turn)."""
+        total = self._cumulative_tokens[-1]
+        start = max(bisect_left(self._cumulative_tokens, total - target_tokens), self._start)
+        last_user = next((i for i in range(len(self.turns) - 1, -1, -1) if self.turns[i]["role"] == "user"), start)
+        while start < last_user and self.turns[start]["role"] != "user":
+            start += 1
+        return min(start, last_user)
+
+    def _apply_policy(self):
+        if self.context_policy is None:
+            return
+        new_start = self.context_policy.new_start(self)
+        if new_start is None or new_start <= self._start:
+            return
+        summary = self.context_policy.summarize(self, self._start, new_start)
+        self._rebuild_window(new_start, summary)
+
+    def _rebuild_window(self, new_start: int, summary: Optional[str]):
+        """Rebuild the payload once per trim; appends in between stay O(1)."""
+        self._mark(None)
+        self._start = new_start
+        self.summary = summary
+        self._messages = self._all[new_start:]
+        self._serialized = self._all_serialized[new_start:]
+        if summary:
+            # the window starts on a user turn: prepend the summary to it so roles keep alternating
+            summary_block = {"type": "text", "text": SUMMARY_PREFIX + summary}
+            first = self._messages[0]
+            self._messages[0] = {"role": first["role"], "content": [summary_block] + first["content"]}
+            self._serialized[0] = json.dumps(self._messages[0])
+            self.summary_tokens = TOKEN_ESTIMATOR.estimate(
+                self.model_name, messages=[{"role": "user", "content": [summary_block]}])
+        else:
+            self.summary_tokens = 0
+        user_indices = [i for i, m in enumerate(self._messages) if m["role"] == "user"]
+        self._last_user_index = user_indices[-1] if user_indices else None
+
+    def _mark(self, index: Optional[int]):
+        """Move the cache_control marker to payload message `index` (None removes it)."""
+        if index == self._marked_index:
+            return
+        if self._marked_index is not None:
+            self._set(self._marked_index, self._unmarked)
+            self._unmarked = None
+        if index is not None:
+            # the marked message is a copy, so the stored turns (and their JSON) never carry the marker
+            message = self._unmarked = self._messages[index]
+            content = message["content"]
+            self._set(index, {"role": message["role"],
+                              "content": content[:-1] + [{**content[-1], "cache_control": dict(CACHE_CONTROL)}]})
+        self._marked_index = index
+
+    def _set(self, index: int, message: dict):
+        self._messages[index] = message
+        self._serialized[index] = json.dumps(message)
+
+    def get_turns(self, add_cache_control: bool = True) -> List[dict]:
+        """
+        API-ready messages, with cache_control on the last user turn if requested.
+
+        The returned list is the history's own payload, not a copy (building
+        one would cost O(turns) per request): it is valid until the next
+        add_turn_* / get_turns call and must be treated as read-only.
+        """
+        self._mark(self._last_user_index if add_cache_control else None)
+        return self._messages
+
+    def get_turns_json(self, add_cache_control: bool = True) -> str:
+        """The `messages` array as JSON, joined from the per-message serializations."""
+        self.get_turns(add_cache_control)
+        return "[" + ",".join(self._serialized) + "]"
+
+    def get_turns_before(self, timestamp: datetime, include: bool = True):
+        end = (bisect_right if include else bisect_left)(self._timestamps, timestamp)
+        return self.turns[:end]
+
+    def __len__(self):
+        return len(self.turns)
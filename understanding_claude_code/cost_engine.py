@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Vectorized batch cost engine.
+
+Prices arrays of usage records (input, output, cache-creation and cache-read
+tokens plus a model id) in a single NumPy pass against one pricing table,
+built from the AnthropicModel definitions in provider_models.py. Model ids
+are resolved once per distinct id, never once per record.
+
+Usage:
+    python cost_engine.py                # price every logged call in logs/
+    python cost_engine.py --benchmark    # time pricing of 1M synthetic records
+"""
+
+import sys
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+from provider_models import PRICED_MODELS, AnthropicModel, model_for_name
+
+USAGE_COLUMNS = [
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+]
+COST_COLUMNS = ["input_cost", "output_cost", "cache_creation_cost", "cache_read_cost"]
+
+UsageRecords = Union[pd.DataFrame, Sequence[dict], Dict[str, Sequence]]
+
+
+def pricing_table(models: Iterable[AnthropicModel] = PRICED_MODELS) -> pd.DataFrame:
+    """Price per million tokens for each usage column, one row per model name."""
+    return pd.DataFrame(
+        {
+            model.name: [
+                model.input_price_per_mtok,
+                model.output_price_per_mtok,
+                model.prompt_caching_write_price_per_mtok,
+                model.prompt_caching_read_price_per_mtok,
+            ]
+            for model in models
+        },
+        index=USAGE_COLUMNS,
+    ).T
+
+
+PRICING_TABLE = pricing_table()
+
+
+def price_matrix(model_ids: Sequence[str], table: pd.DataFrame = PRICING_TABLE) -> np.ndarray:
+    """
+    Per-record price rows (n x 4, $/MTok) for an array of API model ids.
+
+    Ids that are not in the table are resolved through `model_for_name` (so
+    dated and `-latest` ids share their family's price); unknown models get NaN.
+    """
+    codes, uniques = pd.factorize(pd.Series(model_ids, dtype="object").fillna(""))
+    unique_prices = np.full((len(uniques) + 1, len(USAGE_COLUMNS)), np.nan)
+    for i, model_id in enumerate(uniques):
+        if model_id in table.index:
+            unique_prices[i] = table.loc[model_id].to_numpy()
+        else:
+            model = model_for_name(model_id)
+            if model is not None and model.name in table.index:
+                unique_prices[i] = table.loc[model.name].to_numpy()
+    # factorize marks missing values with -1, which indexes the all-NaN last row
+    return unique_prices[codes]
+
+
+def price_usage_records(records: UsageRecords, model_column: str = "model",
+                        group_by: Optional[List[str]] = None,
+                        table: pd.DataFrame = PRICING_TABLE) -> Tuple[pd.DataFrame, Optional[pd.DataFrame]]:
+    """
+    Price a batch of usage records in one vectorized pass.
+
+    Args:
+        records: DataFrame, list of dicts or dict of arrays with the usage
+            columns and a model id column (missing usage columns count as 0)
+        model_column (str): Name of the model id column
+        group_by (list): Columns to total by (e.g. ["model"] or ["session"])
+        table (pd.DataFrame): Pricing table, defaults to PRICED_MODELS
+
+    Returns:
+        tuple: (records with input/output/cache costs and total_cost added,
+        grouped totals or None when group_by is not given)
+    """
+    df = records.copy() if isinstance(records, pd.DataFrame) else pd.DataFrame(records)
+    for column in USAGE_COLUMNS:
+        if column not in df:
+            df[column] = 0
+
+    tokens = df[USAGE_COLUMNS].apply(pd.to_numeric, errors="coerce").fillna(0).to_numpy(dtype=float)
+    costs = tokens * price_matrix(df[model_column].to_numpy(), table) / 1_000_000
+
+    df[COST_COLUMNS] = costs
+    df["total_cost"] = costs.sum(axis=1)
+
+    grouped = None
+    if group_by:
+        groups = df.groupby(group_by, dropna=False)
+        grouped = groups[USAGE_COLUMNS + COST_COLUMNS + ["total_cost"]].sum()
+        grouped.insert(0, "calls", groups.size())
+    return df, grouped
+
+
+def price_usage(usage_data: dict, model_id: str) -> Dict[str, float]:
+    """Price a single usage dict; the one-record case of `price_usage_records`."""
+    priced, _ = price_usage_records([{**usage_data, "model": model_id}])
+    return {column: float(priced[column].iloc[0]) for column in COST_COLUMNS + ["total_cost"]}
+
+
+def benchmark(n_records: int = 1_000_000, seed: int = 0) -> float:
+    """Seconds taken to price `n_records` synthetic records spread over every priced model."""
+    rng = np.random.default_rng(seed)
+    names = [model.name for model in PRICED_MODELS]
+    records = {
+        "model": np.array(names, dtype=object)[rng.integers(0, len(names), n_records)],
+        **{column: rng.integers(0, 50_000, n_records) for column in USAGE_COLUMNS},
+    }
+    start = time.perf_counter()
+    price_usage_records(records, group_by=["model"])
+    return time.perf_counter() - start
+
+
+def main():
+    """Price every logged Messages call, grouped by session and model."""
+    if "--benchmark" in sys.argv[1:]:
+        print(f"Priced 1,000,000 records in {benchmark():.3f} s")
+        return
+
+    from log_analytics import load_request_log
+
+    calls = load_request_log()
+    calls = calls[calls["model"].notna() & calls["input_tokens"].notna()]
+    _, by_model = price_usage_records(calls, group_by=["session", "model"])
+
+    pd.set_option("display.width", 200)
+    print(by_model.round(6).to_string())
+    print(f"\nTotal: ${by_model['total_cost'].sum():.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Shared loader for the web documents used as large prompts (e.g. the Paul Graham essay).
+
+Documents are cached on disk as extracted text, together with the response's
+ETag / Last-Modified validators. A cached document younger than `max_age_s`
+is returned without touching the network. An older one is revalidated with
+a conditional GET, so an unchanged page costs one 304 and no re-parsing.
+Pages are converted to text while they download: chunks are fed to an
+HTMLParser subclass that keeps only text nodes outside script/style, so
+there is no parse tree and the raw HTML is never held as a whole.
+
+Usage:
+    python document_loader.py [url ...]     # fetch (or revalidate) and print sizes
+"""
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import requests
+
+DOCUMENTS_DIR = Path(__file__).resolve().parent / "outputs" / "documents"
+GREAT_WORK_URL = "https://www.paulgraham.com/greatwork.html"
+DEFAULT_MAX_AGE_S = 7 * 24 * 3600.0
+TIMEOUT_S = 10.0
+OFFLINE_DOCUMENT_TOKENS = 4_096  # twice the longest minimum cacheable prefix (2048 tokens on Haiku)
+
+SKIPPED_TAGS = {"script", "style", "noscript", "template"}
+BLOCK_TAGS = {
+    "br", "p", "div", "li", "ul", "ol", "tr", "table", "section", "article", "header", "footer",
+    "h1", "h2", "h3", "h4", "h5", "h6", "blockquote", "pre", "hr", "title",
+}
+
+GREAT_WORK_FALLBACK = """
+How to Do Great Work
+July 2023
+If you collected lists of techniques for doing great work in a lot of different fields, what would the intersection look like? I decided to find out by making it.
+Partly my goal was to create a guide that could be used by someone working in any field. But I was also curious about the shape of the intersection. And one thing this exercise shows is that it does have a definite shape; it's not just a point labelled "work hard."
+The following recipe assumes you're very ambitious.
+The first step is to decide what to work on. The work you choose needs to have three qualities: it has to be something you have a natural aptitude for, that you have a deep interest in, and that offers scope to do great work.
+In practice you don't have to worry much about the third criterion. Ambitious people are if anything already too conservative about it. So all you need to do is find something you have an aptitude for and great interest in. [1]
+That sounds straightforward, but it's often quite difficult. When you're young you don't know what you're good at or what different kinds of work are like. Some kinds of work you end up doing may not even exist yet. So while some people know what they want to do at 14, most have to figure it out.
+The way to figure out what to work on is by working. If you're not sure what to work on, guess. But pick something and get going. You'll probably guess wrong some of the time, but that's fine. It's good to know about multiple things; some of the biggest discoveries come from noticing connections between different fields.
+"""
+
+
+class TextExtractor(HTMLParser):
+    """Incremental HTML to text: feed() chunks as they arrive, then text()."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self._parts: List[str] = []
+        self._skip_depth = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in BLOCK_TAGS:
+            self._parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def text(self) -> str:
+        """Extracted text with the usual line / double-space clean-up; block tags start a new line."""
+        self.close()
+        lines = (line.strip() for line in "".join(self._parts).splitlines())
+        chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
+        return "\n".join(chunk for chunk in chunks if chunk)
+
+
+def extract_text(html_chunks) -> str:
+    """Text of an HTML document given as an iterable of str chunks (or a single str)."""
+    extractor = TextExtractor()
+    for chunk in [html_chunks] if isinstance(html_chunks, str) else html_chunks:
+        extractor.feed(chunk)
+    return extractor.text()
+
+
+@dataclass
+class CachedDocument:
+    url: str
+    text: str
+    fetched_at: float  # last successful fetch or revalidation
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+class DocumentLoader:
+    def __init__(self, directory: Path = DOCUMENTS_DIR, max_age_s: float = DEFAULT_MAX_AGE_S,
+                 timeout_s: float = TIMEOUT_S):
+        """
+        Args:
+            directory (Path): One JSON file per URL with the extracted text and the validators
+            max_age_s (float): Cached documents younger than this are used without revalidation
+        """
+        self.directory = Path(directory)
+        self.max_age_s = max_age_s
+        self.timeout_s = timeout_s
+        self._local = threading.local()  # one requests.Session (connection pool) per thread
+
+    def _session(self) -> requests.Session:
+        if not hasattr(self._local, "session"):
+            self._local.session = requests.Session()
+        return self._local.session
+
+    def _path(self, url: str) -> Path:
+        return self.directory / f"{hashlib.sha1(url.encode()).hexdigest()}.json"
+
+    def cached(self, url: str) -> Optional[CachedDocument]:
+        try:
+            return CachedDocument(**json.loads(self._path(url).read_text(encoding="utf-8")))
+        except (FileNotFoundError, json.JSONDecodeError, TypeError):
+            return None
+
+    def _store(self, document: CachedDocument):
+        path = self._path(document.url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        tmp.write_text(json.dumps(asdict(document)), encoding="utf-8")
+        tmp.replace(path)
+
+    def load(self, url: str, revalidate: bool = False) -> CachedDocument:
+        """
+        Cached text of `url`, fetched or revalidated when missing or stale.
+
+        Raises:
+            requests.RequestException: When the page can't be fetched and nothing is cached
+        """
+        cached = self.cached(url)
+        if cached is not None and not revalidate and time.time() - cached.fetched_at < self.max_age_s:
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+        try:
+            with self._session().get(url, headers=headers, stream=True, timeout=self.timeout_s) as response:
+                if response.status_code == 304 and cached is not None:
+                    cached.fetched_at = time.time()
+                    self._store(cached)
+                    return cached
+                response.raise_for_status()
+                if "charset" not in response.headers.get("Content-Type", "").lower():
+                    # no declared charset: assume UTF-8 rather than requests' ISO-8859-1 default
+                    # (apparent_encoding would read the whole body before streaming starts)
+                    response.encoding = "utf-8"
+                text = extract_text(response.iter_content(chunk_size=64 * 1024, decode_unicode=True))
+                document = CachedDocument(url, text, time.time(), response.headers.get("ETag"),
+                                          response.headers.get("Last-Modified"))
+        except requests.RequestException:
+            if cached is not None:
+                return cached  # stale beats nothing
+            raise
+        self._store(document)
+        return document
+
+    def load_many(self, urls: Sequence[str], max_workers: int = 8) -> Dict[str, Optional[CachedDocument]]:
+        """Load several URLs concurrently; failures map to None."""
+        def load_or_none(url):
+            try:
+                return self.load(url)
+            except requests.RequestException as e:
+                print(f"❌ Error fetching {url}: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max(min(max_workers, len(urls)), 1)) as pool:
+            return dict(zip(urls, pool.map(load_or_none, urls)))
+
+
+DOCUMENT_LOADER = DocumentLoader()
+
+
+def fetch_essay(url: str = GREAT_WORK_URL) -> str:
+    """Text of the 'How to Do Great Work' essay (or another page), with a built-in fallback when offline."""
+    try:
+        text = DOCUMENT_LOADER.load(url).text
+        print(f"📄 Essay loaded: {len(text)} characters")
+        return text
+    except requests.RequestException as e:
+        print(f"❌ Error fetching content: {e}")
+        return GREAT_WORK_FALLBACK
+
+
+def offline_document(min_tokens: int = OFFLINE_DOCUMENT_TOKENS) -> str:
+    """
+    The bundled essay excerpt, repeated as numbered parts until every model
+    family's estimate reaches `min_tokens`: a prompt long enough to be cached,
+    built without any network call (for --mock runs).
+    """
+    from provider_models import ALL_MODELS
+    from token_estimator import TOKEN_ESTIMATOR
+
+    excerpt = GREAT_WORK_FALLBACK.strip()
+    parts: List[str] = []
+    text = ""
+    while min(TOKEN_ESTIMATOR.estimate_text(text, model.name) for model in ALL_MODELS) < min_tokens:
+        parts.append(f"Part {len(parts) + 1}\n{excerpt}")
+        text = "\n\n".join(parts)
+    return text
+
+
+def main():
+    urls = sys.argv[1:] or [GREAT_WORK_URL]
+    start = time.perf_counter()
+    documents = DOCUMENT_LOADER.load_many(urls)
+    for url, document in documents.items():
+        if document is not None:
+            print(f"✅ {url}: {len(document.text)} characters (etag={document.etag})")
+    print(f"⏱️  {time.perf_counter() - start:.3f} s")
+
+
+if __name__ == "__main__":
+    main()
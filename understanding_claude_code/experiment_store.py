@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+SQLite store of prompt caching experiment results.
+
+Every call made by prompt_caching_experiment.py (usage, cost, latency) is
+appended as one row, so results survive reruns and sessions and build up a
+dataset over time. Rows get increasing ids, which lets a dashboard load only
+the rows it has not seen yet instead of re-reading the whole table.
+
+Usage:
+    python experiment_store.py     # aggregate of everything recorded so far
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Sequence
+
+import pandas as pd
+
+STORE_PATH = Path(__file__).resolve().parent / "outputs" / "prompt_caching_runs.sqlite"
+
+RESULT_COLUMNS = {
+    "run_id": "TEXT NOT NULL",
+    "created_at": "TEXT NOT NULL",
+    "model": "TEXT",
+    "call": "TEXT",
+    "input_tokens": "INTEGER",
+    "cache_creation_input_tokens": "INTEGER",
+    "cache_read_input_tokens": "INTEGER",
+    "output_tokens": "INTEGER",
+    "total_cost": "REAL",
+    "latency_s": "REAL",
+    "ttft_s": "REAL",
+    "tokens_per_s": "REAL",
+    "error": "TEXT",
+}
+
+
+class ExperimentStore:
+    def __init__(self, path: Path = STORE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        columns = ", ".join(f"{name} {kind}" for name, kind in RESULT_COLUMNS.items())
+        with self._conn:
+            self._conn.execute(f"CREATE TABLE IF NOT EXISTS results (id INTEGER PRIMARY KEY AUTOINCREMENT, {columns})")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS results_model_call ON results (model, call)")
+
+    def insert_rows(self, run_id: str, rows: Sequence[Dict]) -> int:
+        """Append one run's result rows (unknown keys are ignored); returns the number inserted."""
+        created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        names = list(RESULT_COLUMNS)
+        values = [
+            tuple({"run_id": run_id, "created_at": created_at, **row}.get(name) for name in names)
+            for row in rows
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT INTO results ({', '.join(names)}) VALUES ({', '.join('?' * len(names))})", values
+            )
+        return len(values)
+
+    def rows_since(self, last_id: int = 0) -> pd.DataFrame:
+        """Rows with id > last_id, oldest first: the increment a dashboard has not loaded yet."""
+        with self._lock:
+            return pd.read_sql_query("SELECT * FROM results WHERE id > ? ORDER BY id", self._conn, params=(last_id,))
+
+    def close(self):
+        self._conn.close()
+
+
+def aggregate(results: pd.DataFrame) -> pd.DataFrame:
+    """Per model and call type: number of calls, mean cost / latency / TTFT and the share of input read from cache."""
+    measured = results[results["error"].isna()] if "error" in results else results
+    if measured.empty:
+        return pd.DataFrame()
+    grouped = measured.groupby(["model", "call"])
+    summary = grouped.agg(
+        calls=("total_cost", "size"),
+        mean_cost=("total_cost", "mean"),
+        mean_latency_s=("latency_s", "mean"),
+        mean_ttft_s=("ttft_s", "mean"),
+        cache_read_input_tokens=("cache_read_input_tokens", "sum"),
+        input_tokens=("input_tokens", "sum"),
+        cache_creation_input_tokens=("cache_creation_input_tokens", "sum"),
+    )
+    total_input = summary[["cache_read_input_tokens", "input_tokens", "cache_creation_input_tokens"]].sum(axis=1)
+    summary["cached_share"] = summary["cache_read_input_tokens"] / total_input.where(total_input > 0)
+    return summary.drop(columns=["cache_read_input_tokens", "input_tokens", "cache_creation_input_tokens"])
+
+
+def main():
+    store = ExperimentStore()
+    results = store.rows_since(0)
+    print(f"📦 {store.path}: {len(results)} calls in {results['run_id'].nunique()} runs")
+    if not results.empty:
+        pd.set_option("display.width", 200)
+        print(aggregate(results).round(6).to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Asyncio load generator for prompt caching under concurrent conversations.
+
+Drives N conversations over one shared, cached system prompt. Conversations
+arrive as a Poisson process, each turn waits a log-normal think time after
+the previous answer, and at most `concurrency` requests are in flight at
+once (the rest queue, and the queueing time is reported separately from the
+TTFT). Each conversation keeps its own ConversationHistory, with the rolling
+cache_control marker on its last user turn.
+
+The report gives aggregate throughput, TTFT and latency percentiles, the
+cache hit ratio and the cost per conversation. Runs against the live API,
+or against the local mock server with --mock.
+
+Usage:
+    python load_generator.py --conversations 50 --rate 2 --turns 3 --concurrency 10 --mock
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Sequence
+
+import anthropic
+import numpy as np
+import pandas as pd
+
+from conversation_history import ConversationHistory
+from cost_engine import price_usage_records
+from provider_models import CLAUDE_HAIKU_35
+
+QUESTIONS = [
+    "What is the main theme of this text?",
+    "What are the three qualities mentioned for choosing work?",
+    "Summarize the key points in 2-3 sentences.",
+    "Which piece of advice would be hardest to follow, and why?",
+    "Give one concrete example of the ideas in this text.",
+]
+
+
+@dataclass
+class LoadConfig:
+    conversations: int = 20
+    arrival_rate_per_s: float = 1.0  # Poisson arrivals of new conversations
+    turns: int = 3
+    think_time_median_s: float = 5.0  # log-normal pause between an answer and the next question
+    think_time_sigma: float = 0.6
+    concurrency: int = 8  # requests in flight at most
+    model_name: str = CLAUDE_HAIKU_35.name
+    max_tokens: int = 200
+    seed: int = 0
+    questions: Sequence[str] = field(default_factory=lambda: list(QUESTIONS))
+
+
+async def run_turn(client: anthropic.AsyncAnthropic, semaphore: asyncio.Semaphore, config: LoadConfig,
+                   system: List[dict], history: ConversationHistory, row: Dict) -> str:
+    """Send one turn, filling `row` with its timings and usage; returns the answer."""
+    queued = time.perf_counter()
+    async with semaphore:
+        start = time.perf_counter()
+        row["queue_s"] = start - queued
+        first_chunk = None
+        answer = []
+        async with client.messages.stream(
+            model=config.model_name,
+            max_tokens=config.max_tokens,
+            system=system,
+            messages=history.get_turns(),
+        ) as stream:
+            async for text in stream.text_stream:
+                if first_chunk is None:
+                    first_chunk = time.perf_counter()
+                answer.append(text)
+            final_message = await stream.get_final_message()
+        end = time.perf_counter()
+    usage = final_message.usage
+    row.update(
+        ttft_s=(first_chunk or end) - start,
+        latency_s=end - start,
+        input_tokens=usage.input_tokens,
+        output_tokens=usage.output_tokens,
+        cache_creation_input_tokens=usage.cache_creation_input_tokens or 0,
+        cache_read_input_tokens=usage.cache_read_input_tokens or 0,
+    )
+    return "".join(answer)
+
+
+async def run_conversation(client: anthropic.AsyncAnthropic, semaphore: asyncio.Semaphore, config: LoadConfig,
+                           system: List[dict], conversation_id: int, start_delay_s: float,
+                           rng: random.Random, t0: float, rows: List[Dict]):
+    await asyncio.sleep(start_delay_s)
+    history = ConversationHistory(config.model_name)
+    for turn in range(config.turns):
+        if turn:
+            await asyncio.sleep(rng.lognormvariate(0, config.think_time_sigma) * config.think_time_median_s)
+        history.add_turn_user(config.questions[(conversation_id + turn) % len(config.questions)])
+        row = {"conversation": conversation_id, "turn": turn, "model": config.model_name,
+               "sent_s": time.perf_counter() - t0}
+        rows.append(row)
+        try:
+            answer = await run_turn(client, semaphore, config, system, history, row)
+        except anthropic.APIError as e:
+            row["error"] = str(e)
+            return
+        history.add_turn_assistant(answer)
+
+
+async def run_load(client: anthropic.AsyncAnthropic, config: LoadConfig, system_prompt: str) -> pd.DataFrame:
+    """Run every conversation concurrently; one row per request."""
+    rng = random.Random(config.seed)
+    system = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+    semaphore = asyncio.Semaphore(config.concurrency)
+    arrivals = np.cumsum(np.random.default_rng(config.seed).exponential(1 / config.arrival_rate_per_s,
+                                                                        config.conversations))
+    arrivals -= arrivals[0]
+    rows: List[Dict] = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(
+        run_conversation(client, semaphore, config, system, i, float(delay),
+                         random.Random(rng.random()), t0, rows)
+        for i, delay in enumerate(arrivals)
+    ))
+    df = pd.DataFrame(rows)
+    df.attrs["wall_s"] = time.perf_counter() - t0
+    return df
+
+
+def load_report(requests: pd.DataFrame) -> Dict[str, float]:
+    """Throughput, TTFT / latency percentiles, cache hit ratio and cost per conversation."""
+    ok = requests[requests["error"].isna()] if "error" in requests else requests
+    if ok.empty:  # every request failed (e.g. rate limited): report the failures, no latency or cost figures
+        nan = float("nan")
+        return {
+            "requests": len(requests),
+            "errors": len(requests),
+            "conversations": requests["conversation"].nunique() if "conversation" in requests else 0,
+            "wall_s": requests.attrs.get("wall_s", nan),
+            "requests_per_s": 0.0,
+            "output_tokens_per_s": 0.0,
+            "ttft_p50_s": nan, "ttft_p90_s": nan, "ttft_p99_s": nan,
+            "latency_p50_s": nan, "latency_p90_s": nan, "latency_p99_s": nan,
+            "queue_p90_s": nan,
+            "cache_hit_ratio": nan,
+            "requests_with_cache_read": nan,
+            "cost_per_conversation_mean": nan,
+            "cost_per_conversation_p90": nan,
+            "total_cost": 0.0,
+        }
+    priced, per_conversation = price_usage_records(ok, group_by=["conversation"])
+    wall_s = requests.attrs.get("wall_s") or float((ok["sent_s"] + ok["latency_s"]).max())
+    total_input = ok[["input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"]].sum(axis=1)
+    ttft = np.percentile(ok["ttft_s"], [50, 90, 99]).tolist()
+    latency = np.percentile(ok["latency_s"], [50, 90, 99]).tolist()
+    cost = per_conversation["total_cost"]
+    return {
+        "requests": len(requests),
+        "errors": len(requests) - len(ok),
+        "conversations": requests["conversation"].nunique(),
+        "wall_s": wall_s,
+        "requests_per_s": len(ok) / wall_s,
+        "output_tokens_per_s": float(ok["output_tokens"].sum() / wall_s),
+        "ttft_p50_s": ttft[0], "ttft_p90_s": ttft[1], "ttft_p99_s": ttft[2],
+        "latency_p50_s": latency[0], "latency_p90_s": latency[1], "latency_p99_s": latency[2],
+        "queue_p90_s": float(np.percentile(ok["queue_s"], 90)),
+        "cache_hit_ratio": float(ok["cache_read_input_tokens"].sum() / total_input.sum()),
+        "requests_with_cache_read": float((ok["cache_read_input_tokens"] > 0).mean()),
+        "cost_per_conversation_mean": float(cost.mean()),
+        "cost_per_conversation_p90": float(cost.quantile(0.9)),
+        "total_cost": float(priced["total_cost"].sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent multi-conversation prompt caching load")
+    parser.add_argument("--conversations", type=int, default=20)
+    parser.add_argument("--rate", type=float, default=1.0, help="New conversations per second")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--think-s", type=float, default=5.0, help="Median think time between turns")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum requests in flight")
+    parser.add_argument("--model", default=CLAUDE_HAIKU_35.name)
+    parser.add_argument("--max-tokens", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--mock", action="store_true", help="Run against a local mock Messages server")
+    args = parser.parse_args()
+
+    config = LoadConfig(conversations=args.conversations, arrival_rate_per_s=args.rate, turns=args.turns,
+                        think_time_median_s=args.think_s, concurrency=args.concurrency,
+                        model_name=args.model, max_tokens=args.max_tokens, seed=args.seed)
+    server = None
+    if args.mock:
+        from mock_messages_server import MockServerConfig, start_mock_server
+        server, base_url = start_mock_server(MockServerConfig(seed=args.seed))
+        client = anthropic.AsyncAnthropic(base_url=base_url, api_key="mock")
+    else:
+        client = anthropic.AsyncAnthropic()
+
+    from document_loader import fetch_essay, offline_document
+    document = offline_document() if args.mock else fetch_essay()  # mock runs stay offline
+    system_prompt = f"<file_contents> {document} </file_contents>"
+    print(f"🚀 {config.conversations} conversations x {config.turns} turns, {config.arrival_rate_per_s}/s arrivals, "
+          f"concurrency {config.concurrency} against {client.base_url}")
+    requests = asyncio.run(run_load(client, config, system_prompt))
+    if server is not None:
+        server.shutdown()
+
+    for name, value in load_report(requests).items():
+        print(f"   • {name}: {value:.6g}" if isinstance(value, float) else f"   • {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
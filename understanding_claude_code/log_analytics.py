@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Latency and throughput analytics over the captured request/response logs.
+
+This script reads the JSONL captures in logs/, pairs every request with its
+response by requestId and computes, per model and endpoint:
+  - total latency (request sent -> response body fully received)
+  - time to first byte (request sent -> response headers received)
+  - time to first token for SSE responses
+  - output throughput in tokens/sec
+
+All timing columns are computed on whole DataFrame columns at once; the only
+per-record work is parsing the response bodies for their `usage` block.
+"""
+
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+import numpy as np
+import pandas as pd
+
+from token_estimator import TOKEN_ESTIMATOR, prompt_text
+
+LOGS_DIR = Path(__file__).resolve().parent.parent / "logs"
+PERCENTILES = [0.5, 0.9, 0.99]
+
+
+def iter_log_files(logs_dir: Path = LOGS_DIR) -> List[Path]:
+    """Return the JSONL capture files in `logs_dir`, oldest session first."""
+    return sorted(Path(logs_dir).glob("*.jsonl"))
+
+
+def parse_sse_events(body: str) -> List[dict]:
+    """
+    Parse a Server-Sent Events body into the list of its JSON `data` payloads.
+
+    Args:
+        body (str): Raw `text/event-stream` body as captured in the logs
+
+    Returns:
+        list: Decoded event payloads, in stream order (ping events included)
+    """
+    events = []
+    for line in body.splitlines():
+        if not line.startswith("data:"):
+            continue
+        try:
+            events.append(json.loads(line[len("data:"):]))
+        except json.JSONDecodeError:
+            continue
+    return events
+
+
+def extract_usage(body) -> dict:
+    """
+    Extract the final `usage` block from a Messages API response body.
+
+    Works for both plain JSON responses and SSE streams, where the usage is
+    split between `message_start` (input side) and `message_delta` (output).
+    """
+    if isinstance(body, dict):
+        return dict(body.get("usage") or {})
+    if not isinstance(body, str) or "message_start" not in body:
+        return {}
+
+    usage = {}
+    for event in parse_sse_events(body):
+        if event.get("type") == "message_start":
+            usage.update(event.get("message", {}).get("usage") or {})
+        elif event.get("type") == "message_delta":
+            usage.update(event.get("usage") or {})
+    return usage
+
+
+def iter_message_exchanges(paths: Optional[Iterable[Path]] = None) -> Iterator[dict]:
+    """
+    Yield every logged Messages API call with its request body and usage.
+
+    Args:
+        paths: JSONL files to read (defaults to every file in logs/)
+
+    Yields:
+        dict: session, request_id, timestamp (datetime), body and usage,
+        in capture order within each file
+    """
+    for path in paths if paths is not None else iter_log_files():
+        path = Path(path)
+        with open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                request = record.get("request") or {}
+                body = request.get("body")
+                if not isinstance(body, dict) or "messages" not in body:
+                    continue
+                response = record.get("response") or {}
+                yield {
+                    "session": path.stem,
+                    "request_id": record.get("requestId"),
+                    "timestamp": datetime.fromisoformat(request["timestamp"]),
+                    "body": body,
+                    "usage": extract_usage(response.get("body")),
+                }
+
+
+def _split_record(record: dict, session: str):
+    """Split one captured line into its request half and its response half."""
+    request_id = record.get("requestId")
+    request = record.get("request")
+    response = record.get("response")
+
+    request_row = None
+    if request:
+        body = request.get("body")
+        url = request.get("url", "")
+        request_row = {
+            "session": session,
+            "request_id": request_id,
+            "method": request.get("method"),
+            "url": url,
+            "host": urlparse(url).netloc,
+            "endpoint": urlparse(url).path,
+            "model": body.get("model") if isinstance(body, dict) else None,
+            "prompt_chars": (
+                len(prompt_text(body.get("system"), body.get("messages"), body.get("tools")))
+                if isinstance(body, dict) and "messages" in body else 0
+            ),
+            "request_ts": request.get("timestamp"),
+        }
+
+    response_row = None
+    if response:
+        body = response.get("body")
+        content_type = (response.get("headers") or {}).get("content-type", "")
+        usage = extract_usage(body)
+        response_row = {
+            "session": session,
+            "request_id": request_id,
+            "status_code": response.get("statusCode"),
+            "is_sse": content_type.startswith("text/event-stream") or bool(response.get("streaming")),
+            "response_ts": response.get("timestamp"),
+            # the capture is written once the body has been fully consumed
+            "completed_ts": record.get("timestamp"),
+            "input_tokens": usage.get("input_tokens"),
+            "output_tokens": usage.get("output_tokens"),
+            "cache_creation_input_tokens": usage.get("cache_creation_input_tokens"),
+            "cache_read_input_tokens": usage.get("cache_read_input_tokens"),
+        }
+    return request_row, response_row
+
+
+def load_request_log(paths: Optional[Iterable[Path]] = None) -> pd.DataFrame:
+    """
+    Load the captures into a DataFrame with one row per paired request.
+
+    Requests and responses are collected separately and joined on
+    (session, requestId), so captures that write the two halves on separate
+    lines are paired the same way as the combined lines written today.
+
+    Args:
+        paths: JSONL files to load (defaults to every file in logs/)
+
+    Returns:
+        pd.DataFrame: Paired requests with their timing and usage columns
+    """
+    request_rows, response_rows = [], []
+    for path in paths if paths is not None else iter_log_files():
+        path = Path(path)
+        with open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                request_row, response_row = _split_record(json.loads(line), path.stem)
+                if request_row:
+                    request_rows.append(request_row)
+                if response_row:
+                    response_rows.append(response_row)
+
+    requests_df = pd.DataFrame(request_rows).drop_duplicates(["session", "request_id"])
+    responses_df = pd.DataFrame(response_rows).drop_duplicates(["session", "request_id"], keep="last")
+    if requests_df.empty:
+        return requests_df
+
+    df = requests_df.merge(responses_df, on=["session", "request_id"], how="left")
+    df["estimated_input_tokens"] = TOKEN_ESTIMATOR.estimate_chars_array(
+        df["model"].fillna("").tolist(), df["prompt_chars"]
+    )
+    return add_timing_columns(df)
+
+
+def add_timing_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """Compute latency, TTFB, TTFT and throughput columns for all rows at once."""
+    request_ts = pd.to_datetime(df["request_ts"], utc=True, format="ISO8601")
+    response_ts = pd.to_datetime(df["response_ts"], utc=True, format="ISO8601")
+    completed_ts = pd.to_datetime(df["completed_ts"], utc=True, format="ISO8601")
+
+    df["latency_s"] = (completed_ts - request_ts).dt.total_seconds()
+    df["ttfb_s"] = (response_ts - request_ts).dt.total_seconds()
+    # The SSE capture has no per-event timestamps; the API flushes the headers
+    # together with `message_start`, so first byte is our first-token estimate.
+    df["ttft_s"] = df["ttfb_s"].where(df["is_sse"].fillna(False).astype(bool))
+    df["generation_s"] = (completed_ts - response_ts).dt.total_seconds()
+
+    output_tokens = pd.to_numeric(df["output_tokens"], errors="coerce")
+    generation_s = df["generation_s"].where(df["generation_s"] > 0)
+    df["tokens_per_s"] = output_tokens / generation_s
+    df["end_to_end_tokens_per_s"] = output_tokens / df["latency_s"].where(df["latency_s"] > 0)
+    return df
+
+
+def latency_summary(df: pd.DataFrame, by: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Latency percentiles and throughput grouped by model and endpoint.
+
+    Args:
+        df (pd.DataFrame): Output of `load_request_log`
+        by (list): Grouping columns (defaults to ["model", "endpoint"])
+
+    Returns:
+        pd.DataFrame: One row per group with count, p50/p90/p99 of latency,
+        TTFB and TTFT, mean tokens/sec and total output tokens
+    """
+    by = by or ["model", "endpoint"]
+    keys = [df[col].fillna("-") for col in by]
+    grouped = df.groupby(keys)
+
+    quantiles = (
+        grouped[["latency_s", "ttfb_s", "ttft_s"]]
+        .quantile(PERCENTILES)
+        .unstack()
+    )
+    quantiles.columns = [f"{metric}_p{int(q * 100)}" for metric, q in quantiles.columns]
+
+    summary = pd.concat(
+        [
+            grouped.size().rename("requests"),
+            quantiles,
+            grouped["tokens_per_s"].mean().rename("tokens_per_s_mean"),
+            grouped["output_tokens"].sum(min_count=1).rename("output_tokens"),
+            grouped["latency_s"].sum().rename("wall_clock_s"),
+        ],
+        axis=1,
+    )
+    return summary.sort_values("wall_clock_s", ascending=False)
+
+
+def session_wall_clock(df: pd.DataFrame) -> pd.DataFrame:
+    """Share of each session's request wall-clock time spent per endpoint."""
+    per_endpoint = df.groupby(["session", "endpoint"])["latency_s"].sum()
+    share = per_endpoint / per_endpoint.groupby(level="session").transform("sum")
+    return pd.DataFrame({"latency_s": per_endpoint, "share": share.replace([np.inf], np.nan)})
+
+
+def main():
+    """Print the latency and throughput summary for every capture in logs/."""
+    paths = [Path(p) for p in sys.argv[1:]] or iter_log_files()
+    if not paths:
+        print(f"Error: no log files found in {LOGS_DIR}", file=sys.stderr)
+        sys.exit(1)
+
+    df = load_request_log(paths)
+    print(f"Loaded {len(df)} requests from {len(paths)} log files")
+
+    pd.set_option("display.width", 200)
+    pd.set_option("display.max_columns", 30)
+    print("\nLatency by model and endpoint:")
+    print(latency_summary(df).round(3).to_string())
+
+    print("\nWall-clock time per session and endpoint:")
+    print(session_wall_clock(df).round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
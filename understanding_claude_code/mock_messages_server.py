@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Anthropic Messages API.
+
+Serves POST /v1/messages (streaming SSE or plain JSON) and
+POST /v1/messages/count_tokens, with `usage` including the
+cache_creation_input_tokens / cache_read_input_tokens fields. Prompt caching
+is simulated from the request's `cache_control` breakpoints with a TTL, and
+time-to-first-token and per-token latencies are drawn from seeded log-normal
+distributions, so benchmarks are repeatable and need no network or API spend.
+
+Point the SDK at it through the base URL:
+
+    client = anthropic.Anthropic(base_url="http://127.0.0.1:8765", api_key="mock")
+
+or, for the existing scripts, without touching their code:
+
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 ANTHROPIC_API_KEY=mock python terminal_streaming_animation.py
+
+Usage:
+    python mock_messages_server.py [--port 8765] [--ttft-ms 400] [--token-ms 15] [--seed 0]
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List, Optional, Tuple
+
+from cache_breakpoint_optimizer import LOGGED, PrefixCacheSimulator, breakpoints_for, split_prompt_blocks
+from provider_models import CLAUDE_HAIKU_35, model_for_name
+from token_estimator import TOKEN_ESTIMATOR
+
+DEFAULT_RESPONSE = (
+    "The essay argues that great work comes from choosing a field you have a natural "
+    "aptitude for and a deep interest in, then working on it with curiosity, "
+    "persistence and a willingness to follow unexpected paths."
+)
+
+
+@dataclass
+class MockServerConfig:
+    """Latency distributions and caching behaviour of the mock server."""
+    ttft_median_s: float = 0.4
+    ttft_sigma: float = 0.25
+    prefill_s_per_token: float = 20e-6  # added to TTFT per uncached input token
+    cached_prefill_s_per_token: float = 2e-6
+    token_latency_median_s: float = 0.015
+    token_latency_sigma: float = 0.4
+    cache_ttl_s: float = 300.0
+    seed: int = 0
+    response_text: str = DEFAULT_RESPONSE
+
+
+class MockMessagesState:
+    """State shared by all handler threads: the prefix cache and the seeded RNG."""
+
+    def __init__(self, config: MockServerConfig):
+        self.config = config
+        self.cache = PrefixCacheSimulator(ttl=timedelta(seconds=config.cache_ttl_s))
+        self.rng = random.Random(config.seed)
+        self.lock = threading.Lock()
+
+    def usage_for(self, body: dict) -> dict:
+        model = model_for_name(body.get("model", "")) or CLAUDE_HAIKU_35
+        total_tokens = TOKEN_ESTIMATOR.estimate(
+            model.name, system=body.get("system"), messages=body.get("messages"), tools=body.get("tools")
+        )
+        blocks = split_prompt_blocks(body, total_tokens)
+        with self.lock:
+            return self.cache.request(model, blocks, breakpoints_for(blocks, LOGGED), datetime.now(timezone.utc))
+
+    def timings(self, usage: dict, n_tokens: int) -> Tuple[float, List[float]]:
+        """Draw TTFT and the delay before each subsequent token."""
+        config = self.config
+        with self.lock:
+            ttft = self.rng.lognormvariate(0, config.ttft_sigma) * config.ttft_median_s
+            gaps = [self.rng.lognormvariate(0, config.token_latency_sigma) * config.token_latency_median_s
+                    for _ in range(max(n_tokens - 1, 0))]
+        uncached = usage["input_tokens"] + usage["cache_creation_input_tokens"]
+        ttft += uncached * config.prefill_s_per_token + usage["cache_read_input_tokens"] * config.cached_prefill_s_per_token
+        return ttft, gaps
+
+
+def response_tokens(text: str, max_tokens: int) -> List[str]:
+    """Split the canned answer into word-sized deltas, capped at max_tokens."""
+    words = text.split(" ")
+    return [word if i == 0 else " " + word for i, word in enumerate(words)][:max_tokens]
+
+
+def _sse(event: str, data: dict) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n".encode()
+
+
+class MockMessagesHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    state: MockMessagesState = None  # set by make_server
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("content-length") or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError:
+            self._send_json(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "invalid JSON"}})
+            return
+
+        path = self.path.split("?")[0]
+        if path == "/v1/messages/count_tokens":
+            tokens = TOKEN_ESTIMATOR.estimate(body.get("model", ""), system=body.get("system"),
+                                              messages=body.get("messages"), tools=body.get("tools"))
+            self._send_json(200, {"input_tokens": tokens})
+        elif path == "/v1/messages":
+            self._messages(body)
+        else:
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+
+    def _messages(self, body: dict):
+        usage = self.state.usage_for(body)
+        tokens = response_tokens(self.state.config.response_text, int(body.get("max_tokens", 1024)))
+        usage["output_tokens"] = len(tokens)
+        ttft, gaps = self.state.timings(usage, len(tokens))
+        message = {
+            "id": f"msg_mock_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": {**usage, "output_tokens": 1},
+        }
+        stop_reason = "end_turn" if len(tokens) < int(body.get("max_tokens", 1024)) else "max_tokens"
+
+        if not body.get("stream"):
+            time.sleep(ttft + sum(gaps))
+            message.update(content=[{"type": "text", "text": "".join(tokens)}],
+                           stop_reason=stop_reason, usage=usage)
+            self._send_json(200, message)
+            return
+
+        # like the real API, headers go out together with message_start, after the prefill
+        time.sleep(ttft)
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream; charset=utf-8")
+        self.send_header("cache-control", "no-cache")
+        self.send_header("connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        self.wfile.write(_sse("message_start", {"type": "message_start", "message": message}))
+        self.wfile.write(_sse("content_block_start", {"type": "content_block_start", "index": 0,
+                                                      "content_block": {"type": "text", "text": ""}}))
+        for i, token in enumerate(tokens):
+            if i > 0:
+                time.sleep(gaps[i - 1])
+            self.wfile.write(_sse("content_block_delta", {"type": "content_block_delta", "index": 0,
+                                                          "delta": {"type": "text_delta", "text": token}}))
+            self.wfile.flush()
+        self.wfile.write(_sse("content_block_stop", {"type": "content_block_stop", "index": 0}))
+        self.wfile.write(_sse("message_delta", {"type": "message_delta",
+                                                "delta": {"stop_reason": stop_reason, "stop_sequence": None},
+                                                "usage": {"output_tokens": len(tokens)}}))
+        self.wfile.write(_sse("message_stop", {"type": "message_stop"}))
+        self.wfile.flush()
+
+
+def make_server(config: Optional[MockServerConfig] = None, host: str = "127.0.0.1", port: int = 0) -> ThreadingHTTPServer:
+    """Build the server; port 0 picks a free port (see server.server_address)."""
+    handler = type("BoundMockMessagesHandler", (MockMessagesHandler,),
+                   {"state": MockMessagesState(config or MockServerConfig())})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_mock_server(config: Optional[MockServerConfig] = None, port: int = 0) -> Tuple[ThreadingHTTPServer, str]:
+    """Run the server on a background thread; returns (server, base_url). Stop with server.shutdown()."""
+    server = make_server(config, port=port)
+    threading.Thread(target=server.serve_forever, name="mock-messages-server", daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local mock of the Anthropic Messages API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="Median time to first token")
+    parser.add_argument("--token-ms", type=float, default=15.0, help="Median delay between tokens")
+    parser.add_argument("--ttl-s", type=float, default=300.0, help="Prompt cache TTL")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    config = MockServerConfig(ttft_median_s=args.ttft_ms / 1000, token_latency_median_s=args.token_ms / 1000,
+                              cache_ttl_s=args.ttl_s, seed=args.seed)
+    server = make_server(config, args.host, args.port)
+    print(f"Mock Messages API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Calls behind the prompt caching Streamlit app (prompt_caching_experiment.py).
+
+A cache test is two streamed calls with the system prompt marked for caching:
+the first writes the cache entry, the second should read it. `sweep_models`
+runs that pair for several models in parallel. A model that fails, for any
+reason, gets an `error` row instead of aborting the sweep, so the rows of the
+other models still reach the tables and the experiment store.
+
+The display helpers (TTFT text, answer text, call timeline) are here too.
+Nothing here depends on Streamlit, so it can be driven against the mock
+Messages server.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import plotly.graph_objects as go
+
+from cache_keepalive import CacheKeepAlive
+from caching_experiment import ProfilerStreaming, format_ttft  # format_ttft re-exported for the app
+from cost_engine import price_usage
+from provider_models import model_for_name
+
+
+class ClaudeModel(Enum):
+    OPUS_4 = "claude-opus-4-20250514"
+    SONNET_4 = "claude-sonnet-4-20250514"
+    SONNET_3_7 = "claude-3-7-sonnet-20241022"
+    SONNET_3_5 = "claude-3-5-sonnet-20241022"
+    HAIKU_3_5 = "claude-3-5-haiku-20241022"
+    OPUS_3 = "claude-3-opus-20240229"
+    HAIKU_3 = "claude-3-haiku-20240307"
+
+
+def calculate_cost(usage_data: Dict[str, Any], model: ClaudeModel) -> Dict[str, float]:
+    """Calculate cost based on usage data and the shared AnthropicModel pricing table"""
+    return price_usage(usage_data, model.value)
+
+
+def cached_call(client, model: ClaudeModel, system_prompt: str, user_prompt: str,
+                keepalive: Optional[CacheKeepAlive] = None,
+                on_chunk: Optional[Callable[[str, ProfilerStreaming], None]] = None):
+    """
+    One streamed call with the system prompt marked for caching; returns (response, usage, cost, latency_s, profiler).
+    on_chunk(text so far, profiler) is called after every chunk, for live displays.
+    """
+    system = [{"type": "text", "text": system_prompt, "cache_control": {"type": "ephemeral"}}]
+    profiler = ProfilerStreaming(model=model_for_name(model.value), cache_used=True)
+    text = ""
+    profiler.begin()
+    with client.messages.stream(
+        model=model.value,
+        max_tokens=1024,
+        system=system,
+        messages=[{"role": "user", "content": user_prompt}],
+    ) as stream:
+        for chunk in profiler.wrap(stream.text_stream):
+            text += chunk
+            if on_chunk is not None:
+                on_chunk(text, profiler)
+        response = stream.get_final_message()
+    profiler.finish(response.usage)
+    latency_s = (profiler.end_ns - profiler.start_ns) / 1e9
+    usage = response.usage.model_dump()
+    cached_tokens = (usage.get("cache_creation_input_tokens") or 0) + (usage.get("cache_read_input_tokens") or 0)
+    if keepalive is not None and cached_tokens:
+        # only a prefix the API actually cached is worth keeping warm
+        keepalive.use(model.value, system, usage=usage, tokens=cached_tokens)
+    return response, usage, calculate_cost(usage, model), latency_s, profiler
+
+
+def result_row(model: ClaudeModel, call: str, usage: Dict[str, Any], cost: Dict[str, float], latency_s: float,
+               profiler: ProfilerStreaming) -> Dict[str, Any]:
+    """Flat record of one call, as shown in the tables and stored in the experiment store"""
+    metrics = profiler.summary()
+    return {
+        "model": model.name,
+        "call": call,
+        "input_tokens": usage.get("input_tokens", 0),
+        "cache_creation_input_tokens": usage.get("cache_creation_input_tokens") or 0,
+        "cache_read_input_tokens": usage.get("cache_read_input_tokens") or 0,
+        "output_tokens": usage.get("output_tokens", 0),
+        "total_cost": cost["total_cost"],
+        "latency_s": latency_s,
+        "ttft_s": metrics["ttft_s"],
+        "tokens_per_s": metrics["tokens_per_s"],
+    }
+
+
+def run_cache_pair(client, model: ClaudeModel, system_prompt: str, user_prompt: str,
+                   keepalive: Optional[CacheKeepAlive] = None) -> List[Dict[str, Any]]:
+    """Cache creation call then cache hit call for one model, one result row per call (an error row ends the pair)"""
+    rows = []
+    for call in ("cache creation", "cache hit"):
+        try:
+            # the cache entry is readable as soon as the first response has returned, no need to wait
+            _, usage, cost, latency_s, profiler = cached_call(client, model, system_prompt, user_prompt, keepalive)
+            rows.append(result_row(model, call, usage, cost, latency_s, profiler))
+        except Exception as e:  # API errors and anything else: one model failing must not abort a sweep
+            rows.append({"model": model.name, "call": call, "error": f"{type(e).__name__}: {e}"})
+            break
+    return rows
+
+
+def sweep_models(client, models: List[ClaudeModel], system_prompt: str, user_prompt: str,
+                 keepalive: Optional[CacheKeepAlive] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Run every model's pair in parallel (calls stay sequential within a model); yield each model's rows as it finishes"""
+    with ThreadPoolExecutor(max_workers=len(models)) as pool:
+        futures = [pool.submit(run_cache_pair, client, model, system_prompt, user_prompt, keepalive) for model in models]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def response_text(response) -> str:
+    """All text blocks of a final message (there may be none, e.g. a tool call or an empty answer)"""
+    return "".join(block.text for block in response.content if block.type == "text")
+
+
+def timeline_chart(profilers: Dict[str, ProfilerStreaming]) -> go.Figure:
+    """Per call: time waiting for the first token, then generating, side by side on one time axis"""
+    figure = go.Figure()
+    calls = list(profilers)
+    ttfts = [profilers[call].ttft_s or 0.0 for call in calls]
+    durations = [(profilers[call].end_ns - profilers[call].start_ns) / 1e9 for call in calls]
+    figure.add_bar(y=calls, x=ttfts, orientation="h", name="waiting for first token")
+    figure.add_bar(y=calls, x=[d - t for d, t in zip(durations, ttfts)], base=ttfts, orientation="h", name="generating")
+    figure.update_layout(barmode="overlay", xaxis_title="seconds since request", height=250,
+                         margin=dict(l=10, r=10, t=30, b=10))
+    return figure
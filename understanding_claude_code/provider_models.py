@@ -1,5 +1,11 @@
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Optional
+from typing import Dict, Optional
 import anthropic
 
 @dataclass
@@ -63,11 +69,56 @@ class ClaudeSonnet37(AnthropicModel):
     def __init__(self):
         super().__init__(
             name="claude-3-7-sonnet-latest",
-            description="Fastest, most cost-effective model",
-            input_price_per_mtok=0.80,
-            output_price_per_mtok=4.0,
-            prompt_caching_write_price_per_mtok=1.0,
-            prompt_caching_read_price_per_mtok=0.08
+            description="Fast, intelligent, cost-effective model",
+            input_price_per_mtok=3.0,
+            output_price_per_mtok=15.0,
+            prompt_caching_write_price_per_mtok=3.75,
+            prompt_caching_read_price_per_mtok=0.30
+        )
+
+
+@dataclass
+class ClaudeSonnet35(AnthropicModel):
+    """Claude Sonnet 3.5 - Previous generation balanced model."""
+
+    def __init__(self):
+        super().__init__(
+            name="claude-3-5-sonnet-20241022",
+            description="Previous generation balanced model",
+            input_price_per_mtok=3.0,
+            output_price_per_mtok=15.0,
+            prompt_caching_write_price_per_mtok=3.75,
+            prompt_caching_read_price_per_mtok=0.30
+        )
+
+
+@dataclass
+class ClaudeOpus3(AnthropicModel):
+    """Claude Opus 3 - Previous generation most capable model."""
+
+    def __init__(self):
+        super().__init__(
+            name="claude-3-opus-20240229",
+            description="Previous generation most capable model",
+            input_price_per_mtok=15.0,
+            output_price_per_mtok=75.0,
+            prompt_caching_write_price_per_mtok=18.75,
+            prompt_caching_read_price_per_mtok=1.50
+        )
+
+
+@dataclass
+class ClaudeHaiku3(AnthropicModel):
+    """Claude Haiku 3 - Previous generation fastest model."""
+
+    def __init__(self):
+        super().__init__(
+            name="claude-3-haiku-20240307",
+            description="Previous generation fastest model",
+            input_price_per_mtok=0.25,
+            output_price_per_mtok=1.25,
+            prompt_caching_write_price_per_mtok=0.30,
+            prompt_caching_read_price_per_mtok=0.03
         )
 
 # Model instances for easy access
@@ -75,40 +126,197 @@ CLAUDE_OPUS_4 = ClaudeOpus4()
 CLAUDE_SONNET_4 = ClaudeSonnet4()
 CLAUDE_HAIKU_35 = ClaudeHaiku35()
 
+CLAUDE_SONNET_37 = ClaudeSonnet37()
+CLAUDE_SONNET_35 = ClaudeSonnet35()
+CLAUDE_OPUS_3 = ClaudeOpus3()
+CLAUDE_HAIKU_3 = ClaudeHaiku3()
+
 # List of all available models
 ALL_MODELS = [CLAUDE_OPUS_4, CLAUDE_SONNET_4, CLAUDE_HAIKU_35]
 
+# Every model with known pricing, including previous generations; the single pricing table
+PRICED_MODELS = ALL_MODELS + [CLAUDE_SONNET_37, CLAUDE_SONNET_35, CLAUDE_OPUS_3, CLAUDE_HAIKU_3]
 
 
-def price_anthropic_call_no_caching(model:AnthropicModel, output_tokens:str, system_message_str:str, messages:list[dict]):
-    input_tokens = anthropic.Anthropic().messages.count_tokens(
-        model=model.name,
-        system =[ {
-                "type": "text",
-                "text": system_message_str
-            }],
-        messages=messages
-    )
-    price_input = input_tokens * model.input_price_per_mtok / 1_000_000
-    price_output = output_tokens * model.output_price_per_mtok / 1_000_000
-    return price_input + price_output
-
-def price_anthropic_call_with_input_caching(model:AnthropicModel, output_tokens:str, system_message_str:str, messages:list[dict]):
-    # lets consider that the input tokens cache read are only the system message 
-    input_tokens_cache_read = anthropic.Anthropic().messages.count_tokens(
-        model=model.name,
-        system=[{
-            "type": "text",
-            "text": system_message_str
-        }],
-        messages=[]
+def model_family(model_name: str) -> str:
+    """Strip the date / `-latest` suffix, e.g. claude-3-5-haiku-20241022 -> claude-3-5-haiku."""
+    return re.sub(r"-(\d{8}|latest)$", "", model_name)
+
+
+def model_for_name(model_name: str) -> Optional[AnthropicModel]:
+    """Find the priced model matching an API model id, by exact name then by family."""
+    for model in PRICED_MODELS:
+        if model.name == model_name:
+            return model
+    for model in PRICED_MODELS:
+        if model_family(model.name) == model_family(model_name):
+            return model
+    return None
+
+
+class TokenCounter:
+    """
+    Token counting through one shared, pooled Anthropic client.
+
+    Results are kept in an LRU cache keyed by a hash of the request content, so
+    a system prompt that is counted once is never sent to `count_tokens` again.
+    `count_tokens` takes one request per call (there is no batch endpoint), so
+    `count_many` is not a batched call: it deduplicates the requests (identical
+    ones, including those already in flight, share one call) and sends the
+    distinct misses concurrently from a thread pool. The pool (and the client)
+    are only created on the first miss.
+    """
+
+    def __init__(self, client: Optional[anthropic.Anthropic] = None,
+                 max_cache_entries: int = 4096, max_workers: int = 8):
+        self._client = client
+        self.max_cache_entries = max_cache_entries
+        self._cache: OrderedDict[str, int] = OrderedDict()
+        self._in_flight: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.max_workers = max_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def client(self) -> anthropic.Anthropic:
+        # created on first use so importing this module never needs an API key
+        with self._lock:
+            if self._client is None:
+                self._client = anthropic.Anthropic()
+            return self._client
+
+    @staticmethod
+    def _api_messages(messages: list[dict]) -> list[dict]:
+        # ConversationHistory turns carry bookkeeping keys (id, timestamp) the API rejects
+        return [{"role": m["role"], "content": m["content"]} for m in messages]
+
+    @staticmethod
+    def cache_key(model_name: str, system: Optional[list[dict]], messages: list[dict]) -> str:
+        payload = json.dumps(
+            {"model": model_name, "system": system, "messages": TokenCounter._api_messages(messages)},
+            sort_keys=True, separators=(",", ":"), default=str,
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _remember(self, key: str, tokens: int):
+        with self._lock:
+            self._cache[key] = tokens
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.max_cache_entries:
+                self._cache.popitem(last=False)
+            self._in_flight.pop(key, None)
+
+    def _request(self, key: str, model_name: str, system: Optional[list[dict]], messages: list[dict]) -> int:
+        try:
+            kwargs = {"model": model_name, "messages": self._api_messages(messages)}
+            if system:
+                kwargs["system"] = system
+            tokens = self.client.messages.count_tokens(**kwargs).input_tokens
+        except BaseException:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            raise
+        self._remember(key, tokens)
+        return tokens
+
+    def submit(self, model_name: str, system: Optional[list[dict]] = None,
+               messages: Optional[list[dict]] = None) -> Future:
+        """Schedule a count; returns a Future resolved immediately on a cache hit."""
+        messages = messages or []
+        key = self.cache_key(model_name, system, messages)
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                done = Future()
+                done.set_result(self._cache[key])
+                return done
+            if key in self._in_flight:
+                return self._in_flight[key]
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="count_tokens")
+            future = self._executor.submit(self._request, key, model_name, system, messages)
+            self._in_flight[key] = future
+            return future
+
+    def count(self, model_name: str, system: Optional[list[dict]] = None,
+              messages: Optional[list[dict]] = None) -> int:
+        """Number of input tokens for this system + messages on `model_name`."""
+        return self.submit(model_name, system, messages).result()
+
+    def count_many(self, requests: list[dict]) -> list[int]:
+        """Count several requests (dicts of count() kwargs) concurrently, in order."""
+        futures = [self.submit(**request) for request in requests]
+        return [future.result() for future in futures]
+
+
+# Shared counter used by the pricing helpers below
+TOKEN_COUNTER = TokenCounter()
+
+
+def _system_blocks(system_message_str: str) -> list[dict]:
+    return [{"type": "text", "text": system_message_str}]
+
+
+def _input_token_counts(model: AnthropicModel, requests: list[dict], estimate: bool) -> list[int]:
+    if estimate:
+        # offline fast path: calibrated estimate, no network round-trip
+        from token_estimator import TOKEN_ESTIMATOR
+        return [TOKEN_ESTIMATOR.estimate(model.name, system=r.get("system"), messages=r.get("messages"))
+                for r in requests]
+    return TOKEN_COUNTER.count_many([{"model_name": model.name, **r} for r in requests])
+
+
+class EstimatedPrice(float):
+    """
+    A price computed from estimated (not counted) input tokens. It is used as a
+    plain float; `low` / `high` give the range implied by the estimator's error bound.
+    """
+
+    def __new__(cls, value: float, low: float, high: float):
+        price = super().__new__(cls, value)
+        price.low, price.high = low, high
+        return price
+
+    def __repr__(self):
+        return f"{float(self)!r} (estimated, {self.low!r} to {self.high!r})"
+
+
+def _estimated_price(model: AnthropicModel, price, *input_tokens: float) -> EstimatedPrice:
+    """`price(*input_tokens)` with its range, the relative error bound applied to every estimated count."""
+    from token_estimator import TOKEN_ESTIMATOR
+    error = TOKEN_ESTIMATOR.entry(model.name).error_bound
+    return EstimatedPrice(price(*input_tokens),
+                          price(*(tokens / (1 + error) for tokens in input_tokens)),
+                          price(*(tokens / max(1 - error, 1e-6) for tokens in input_tokens)))
+
+
+def price_anthropic_call_no_caching(model:AnthropicModel, output_tokens:int, system_message_str:str, messages:list[dict], estimate:bool = False):
+    """Price of the call; with estimate=True, an EstimatedPrice carrying its error range."""
+    (input_tokens,) = _input_token_counts(
+        model, [{"system": _system_blocks(system_message_str), "messages": messages}], estimate
     )
-    # lets consider that the input tokens no cache read are the messages
-    input_tokens = anthropic.Anthropic().messages.count_tokens(
-        model=model.name,
-        messages=messages 
-    )   
-    price_input_cache_read = input_tokens_cache_read * model.prompt_caching_read_price_per_mtok / 1_000_000
-    price_input_read = input_tokens * model.input_price_per_mtok / 1_000_000
-    price_output = output_tokens * model.output_price_per_mtok / 1_000_000
-    return price_input_cache_read + price_input_read + price_output
\ No newline at end of file
+
+    def price(input_tokens):
+        return (input_tokens * model.input_price_per_mtok + output_tokens * model.output_price_per_mtok) / 1_000_000
+
+    return _estimated_price(model, price, input_tokens) if estimate else price(input_tokens)
+
+def price_anthropic_call_with_input_caching(model:AnthropicModel, output_tokens:int, system_message_str:str, messages:list[dict], estimate:bool = False):
+    # lets consider that the input tokens cache read are only the system message,
+    # and the input tokens no cache read are the messages. count_tokens needs at least one message,
+    # so the system prompt is measured as (system + messages) - (messages alone); both are counted concurrently
+    total_input_tokens, input_tokens = _input_token_counts(model, [
+        {"system": _system_blocks(system_message_str), "messages": messages},
+        {"messages": messages},
+    ], estimate)
+    input_tokens_cache_read = max(total_input_tokens - input_tokens, 0)
+
+    def price(input_tokens_cache_read, input_tokens):
+        price_input_cache_read = input_tokens_cache_read * model.prompt_caching_read_price_per_mtok / 1_000_000
+        price_input_read = input_tokens * model.input_price_per_mtok / 1_000_000
+        price_output = output_tokens * model.output_price_per_mtok / 1_000_000
+        return price_input_cache_read + price_input_read + price_output
+
+    if estimate:
+        return _estimated_price(model, price, input_tokens_cache_read, input_tokens)
+    return price(input_tokens_cache_read, input_tokens)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Opt-in on-disk cache of exact-match Messages API responses.
+
+Responses are keyed by the canonical request hash from stream_recording
+(model, system blocks, messages and sampling parameters) plus the number of
+times that same request was already issued by the client. The second of two
+identical calls in a caching experiment is therefore still served the
+(cache-read) response it got originally, and not the first call's
+(cache-write) one.
+
+Entries use the stream_recording format (chunks, chunk offsets and the final
+message with its usage), so cached streams can be replayed instantly or with
+their original timing. The cache is bounded in bytes and evicts the least
+recently used entries first. Runs that must measure real API caching pass
+`bypass=True`: nothing is read from the cache, and fresh responses replace
+the stored ones.
+
+Usage:
+    python terminal_streaming_animation.py --response-cache [--bypass-cache]
+    python response_cache.py [--clear]       # show (or clear) the cache
+"""
+
+import gzip
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Optional
+
+import anthropic
+from anthropic.types import Message
+
+from stream_recording import RecordingStreamManager, ReplayStream, final_message, request_key, stream_record
+
+CACHE_DIR = Path(__file__).resolve().parent / "outputs" / "response_cache"
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class ResponseCache:
+    def __init__(self, directory: Path = CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        """
+        Args:
+            directory (Path): One gzipped JSON file per entry, fanned out by key prefix
+            max_bytes (int): Total size above which least recently used entries are evicted
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._sizes: Optional[Dict[Path, int]] = None  # scanned on first write
+        self._lock = threading.Lock()  # size bookkeeping and the hit/miss counters
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json.gz"
+
+    def get(self, key: str) -> Optional[dict]:
+        path = self._path(key)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                record = json.load(f)
+        except (FileNotFoundError, EOFError, json.JSONDecodeError):
+            with self._lock:
+                self.misses += 1
+            return None
+        os.utime(path)  # mtime is the LRU clock
+        with self._lock:
+            self.hits += 1
+        return record
+
+    def put(self, key: str, record: dict):
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(f".tmp{threading.get_ident()}")
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump(record, f, separators=(",", ":"))
+        os.replace(tmp, path)  # readers never see a partial entry
+        with self._lock:
+            sizes = self._scan()
+            sizes[path] = path.stat().st_size
+            self._evict(sizes)
+
+    def _scan(self) -> Dict[Path, int]:
+        if self._sizes is None:
+            self._sizes = {p: p.stat().st_size for p in self.directory.glob("*/*.json.gz")}
+        return self._sizes
+
+    def _evict(self, sizes: Dict[Path, int]):
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(sizes, key=lambda p: p.stat().st_mtime if p.exists() else 0)
+        for path in by_age:
+            if total <= self.max_bytes:
+                break
+            total -= sizes.pop(path)
+            path.unlink(missing_ok=True)
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return sum(self._scan().values())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._scan())
+
+    def clear(self):
+        with self._lock:
+            for path in self._scan():
+                path.unlink(missing_ok=True)
+            self._sizes = {}
+
+
+class _CachedMessages:
+    def __init__(self, client: "CachingClient"):
+        self._client = client
+
+    def stream(self, **kwargs):
+        key = self._client.entry_key(kwargs)
+        record = None if self._client.bypass else self._client.cache.get(key)
+        if record is not None:
+            return ReplayStream(record, self._client.speed)
+        sink = _CacheSink(self._client.cache, key)
+        return RecordingStreamManager(self._client.client.messages.stream(**kwargs), kwargs, sink)
+
+    def create(self, **kwargs) -> Message:
+        if kwargs.get("stream"):
+            return self._client.client.messages.create(**kwargs)
+        key = self._client.entry_key(kwargs)
+        record = None if self._client.bypass else self._client.cache.get(key)
+        if record is not None:
+            return final_message(record)
+
+        start_ns = time.perf_counter_ns()
+        message = self._client.client.messages.create(**kwargs)
+        elapsed_us = (time.perf_counter_ns() - start_ns) // 1_000
+        text = "".join(block.text for block in message.content if block.type == "text")
+        self._client.cache.put(key, stream_record(kwargs, [text], [elapsed_us], elapsed_us, message))
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self._client.client.messages, name)
+
+
+class _CacheSink:
+    """The `save` target of a recording stream: writes the finished stream to the cache."""
+
+    def __init__(self, cache: ResponseCache, key: str):
+        self.cache = cache
+        self.key = key
+
+    def save(self, record: dict):
+        self.cache.put(self.key, record)
+
+
+class CachingClient:
+    """Anthropic client proxy serving `messages.stream` / `messages.create` from a ResponseCache."""
+
+    def __init__(self, client: Optional[anthropic.Anthropic] = None, cache: Optional[ResponseCache] = None,
+                 bypass: bool = False, speed: Optional[float] = None):
+        """
+        Args:
+            client: The live client used on misses
+            cache (ResponseCache): Defaults to outputs/response_cache
+            bypass (bool): Always call the API (and refresh the stored entries)
+            speed (float): Replay speed of cached streams, None = instant, 1.0 = original timing
+        """
+        self.client = client or anthropic.Anthropic()
+        self.cache = cache if cache is not None else ResponseCache()
+        self.bypass = bypass
+        self.speed = speed
+        self.messages = _CachedMessages(self)
+        self._occurrences: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def entry_key(self, kwargs: dict) -> str:
+        """Request hash + how many times this client has already issued the same request."""
+        key = request_key(kwargs)
+        with self._lock:
+            occurrence = self._occurrences[key]
+            self._occurrences[key] += 1
+        return f"{key}-{occurrence}"
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+def main():
+    cache = ResponseCache()
+    if "--clear" in sys.argv[1:]:
+        cache.clear()
+        print(f"🗑️  Cleared {cache.directory}")
+        return
+    print(f"📦 {cache.directory}: {len(cache)} entries, {cache.size_bytes() / 1024:.1f} KiB "
+          f"(limit {cache.max_bytes / 1024 / 1024:.0f} MiB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Re-chunking of streamed text for UIs that redraw on every chunk (st.write_stream).
+
+A streamed answer arrives in many small chunks, and redrawing a Streamlit
+element per chunk floods the browser. `batched_text` joins chunks into
+batches of at most `max_chars` characters, and no buffered text waits more
+than `max_interval_s` to be shown. The source is read on a background thread,
+so the interval flush also happens during a stall: text already received
+isn't held back until the next chunk arrives.
+"""
+
+import queue
+import threading
+import time
+from typing import Iterable, Iterator
+
+_END = object()
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def batched_text(text_stream: Iterable[str], max_interval_s: float = 0.05, max_chars: int = 200) -> Iterator[str]:
+    """
+    Re-chunk a text stream so st.write_stream redraws at most every `max_interval_s`
+    or `max_chars` characters, whichever comes first; the last partial batch is
+    flushed when the stream ends, and an error in the stream is raised after the
+    text received before it.
+    """
+    chunks: queue.Queue = queue.Queue()
+
+    def pump():
+        try:
+            for text in text_stream:
+                chunks.put(text)
+        except BaseException as e:
+            chunks.put(_Failure(e))
+        finally:
+            chunks.put(_END)
+
+    threading.Thread(target=pump, name="batched-text", daemon=True).start()
+    batch, size, deadline = [], 0, None
+    while True:
+        timeout = None if deadline is None else max(deadline - time.perf_counter(), 0.0)
+        try:
+            item = chunks.get(timeout=timeout)
+        except queue.Empty:  # stalled with text buffered: show it now
+            yield "".join(batch)
+            batch, size, deadline = [], 0, None
+            continue
+        if item is _END or isinstance(item, _Failure):
+            if batch:
+                yield "".join(batch)
+            if isinstance(item, _Failure):
+                raise item.error
+            return
+        batch.append(item)
+        size += len(item)
+        if deadline is None:
+            deadline = time.perf_counter() + max_interval_s
+        if size >= max_chars:
+            yield "".join(batch)
+            batch, size, deadline = [], 0, None
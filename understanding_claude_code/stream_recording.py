@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Record and replay Messages API streams with their original timing.
+
+`RecordingClient` wraps an `anthropic.Anthropic` client: every
+`client.messages.stream(...)` goes to the API as usual, and once the stream
+closes its text chunks, their offsets from the moment the stream was opened
+and the final message (usage, id, stop reason) are appended to a JSONL file
+(gzip-compressed when the name ends in .gz), one stream per line.
+
+`ReplayClient` serves those recordings through the same interface
+(`with client.messages.stream(...) as stream`, `stream.text_stream`,
+`stream.get_final_message()`), at the original speed, N times faster, or
+as fast as possible, so the streaming UIs and the profiler can be
+benchmarked offline and reproducibly. A request that was never recorded
+is an error unless --lenient-replay is given.
+
+Usage:
+    python terminal_streaming_animation.py --record outputs/recordings/demo.jsonl.gz
+    python terminal_streaming_animation.py --replay outputs/recordings/demo.jsonl.gz --speed 4
+    python stream_recording.py outputs/recordings/demo.jsonl.gz      # list a recording
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import anthropic
+from anthropic.types import Message
+
+RECORDINGS_DIR = Path(__file__).resolve().parent / "outputs" / "recordings"
+FORMAT_VERSION = 1
+
+# Request fields that determine the response; transport options (extra_headers, timeout...) are left out
+REQUEST_FIELDS = (
+    "model", "system", "messages", "max_tokens", "temperature", "top_p", "top_k",
+    "stop_sequences", "tools", "tool_choice", "thinking", "metadata",
+)
+
+
+def canonical_request(kwargs: dict) -> dict:
+    """The response-determining part of a Messages request, JSON-ready."""
+    return {key: kwargs[key] for key in REQUEST_FIELDS if kwargs.get(key) is not None}
+
+
+def request_key(kwargs: dict) -> str:
+    """sha256 of the canonical request (sorted keys, no whitespace)."""
+    canonical = json.dumps(canonical_request(kwargs), sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _open(path: Path, mode: str):
+    return gzip.open(path, mode + "t", encoding="utf-8") if path.suffix == ".gz" else open(path, mode, encoding="utf-8")
+
+
+def stream_record(kwargs: dict, chunks: List[str], offsets_us: List[int], end_us: int, message: Message) -> dict:
+    """
+    One recorded stream. The message is stored without its content, which is
+    rebuilt from the chunks on replay.
+    """
+    message_data = message.model_dump(mode="json", exclude_none=True)
+    message_data.pop("content", None)
+    return {
+        "v": FORMAT_VERSION,
+        "key": request_key(kwargs),
+        "model": kwargs.get("model"),  # the full request is only kept as its hash, to keep files small
+        "chunks": chunks,
+        "offsets_us": offsets_us,
+        "end_us": end_us,
+        "message": message_data,
+    }
+
+
+def append_records(path: Path, records: Sequence[dict]):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with _open(path, "a") as f:
+        for record in records:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+
+def load_records(path: Path) -> List[dict]:
+    with _open(path, "r") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def final_message(record: dict) -> Message:
+    """Rebuild the SDK Message of a recorded stream."""
+    return Message.model_validate(
+        {**record["message"], "content": [{"type": "text", "text": "".join(record["chunks"])}]}
+    )
+
+
+class _RecordingStream:
+    """Proxy for a MessageStream that timestamps the text chunks as they are read."""
+
+    def __init__(self, stream, opened_ns: int):
+        self._stream = stream
+        self._opened_ns = opened_ns
+        self.chunks: List[str] = []
+        self.offsets_us: List[int] = []
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        for text in self._stream.text_stream:
+            self.offsets_us.append((time.perf_counter_ns() - self._opened_ns) // 1_000)
+            self.chunks.append(text)
+            yield text
+
+    def get_final_message(self) -> Message:
+        return self._stream.get_final_message()
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class RecordingStreamManager:
+    """Wraps the SDK's stream manager; hands the finished stream to `recorder.save`."""
+
+    def __init__(self, manager, kwargs: dict, recorder: "RecordingClient"):
+        self._manager = manager
+        self._kwargs = kwargs
+        self._recorder = recorder
+
+    def __enter__(self) -> _RecordingStream:
+        opened_ns = time.perf_counter_ns()
+        self._stream = _RecordingStream(self._manager.__enter__(), opened_ns)
+        return self._stream
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                message = self._stream.get_final_message()  # drains anything the caller did not read
+                end_us = (time.perf_counter_ns() - self._stream._opened_ns) // 1_000
+                self._recorder.save(stream_record(self._kwargs, self._stream.chunks, self._stream.offsets_us,
+                                                  end_us, message))
+        finally:
+            suppress = self._manager.__exit__(exc_type, exc, tb)
+        return suppress
+
+
+class _RecordingMessages:
+    def __init__(self, recorder: "RecordingClient"):
+        self._recorder = recorder
+
+    def stream(self, **kwargs) -> RecordingStreamManager:
+        return RecordingStreamManager(self._recorder.client.messages.stream(**kwargs), kwargs, self._recorder)
+
+    def __getattr__(self, name):
+        return getattr(self._recorder.client.messages, name)
+
+
+class RecordingClient:
+    """Anthropic client proxy that appends every completed stream to `path`."""
+
+    def __init__(self, path: Path, client: Optional[anthropic.Anthropic] = None):
+        self.path = Path(path)
+        self.client = client or anthropic.Anthropic()
+        self.messages = _RecordingMessages(self)
+        self._lock = threading.Lock()
+
+    def save(self, record: dict):
+        with self._lock:
+            append_records(self.path, [record])
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+class ReplayStream:
+    """Stand-in for MessageStream (and its manager) that plays a recorded stream back."""
+
+    def __init__(self, record: dict, speed: Optional[float] = 1.0):
+        """
+        Args:
+            record (dict): A recorded stream (see stream_record)
+            speed (float): Playback rate, 2.0 = twice as fast; None plays as fast as possible
+        """
+        self.record = record
+        self.speed = speed
+        self._opened_ns: Optional[int] = None
+        self._consumed = 0
+
+    def __enter__(self) -> "ReplayStream":
+        self._opened_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return None
+
+    def _wait_until(self, offset_us: int):
+        if not self.speed:
+            return
+        delay = self._opened_ns / 1e9 + offset_us / 1e6 / self.speed - time.perf_counter_ns() / 1e9
+        if delay > 0:
+            time.sleep(delay)
+
+    @property
+    def text_stream(self) -> Iterator[str]:
+        if self._opened_ns is None:
+            self.__enter__()
+        chunks, offsets = self.record["chunks"], self.record["offsets_us"]
+        while self._consumed < len(chunks):
+            i = self._consumed
+            self._wait_until(offsets[i])
+            self._consumed += 1
+            yield chunks[i]
+
+    def until_done(self):
+        for _ in self.text_stream:
+            pass
+        self._wait_until(self.record["end_us"])
+
+    def get_final_message(self) -> Message:
+        self.until_done()
+        return final_message(self.record)
+
+    def get_final_text(self) -> str:
+        return self.get_final_message().content[0].text
+
+
+class _ReplayMessages:
+    def __init__(self, replay: "ReplayClient"):
+        self._replay = replay
+
+    def stream(self, **kwargs) -> ReplayStream:
+        return ReplayStream(self._replay.next_record(kwargs), self._replay.speed)
+
+
+class ReplayClient:
+    """
+    Serves recorded streams in place of an Anthropic client.
+
+    Each call gets the first unused recording of the same request (or, once they
+    are all used, the first one again). A request that was never recorded (e.g.
+    the prompt changed since) raises KeyError: replaying another request's
+    answer would silently skew a benchmark. With `strict=False` the next unused
+    recording in file order is served instead, with a warning on every mismatch.
+    """
+
+    def __init__(self, path: Path, speed: Optional[float] = 1.0, strict: bool = True):
+        self.records = load_records(Path(path))
+        self.speed = speed
+        self.strict = strict
+        self.messages = _ReplayMessages(self)
+        self._used = [False] * len(self.records)
+        self._lock = threading.Lock()
+
+    def next_record(self, kwargs: dict) -> dict:
+        key = request_key(kwargs)
+        with self._lock:
+            if not self.records:
+                raise KeyError("Empty recording")
+            if all(self._used):
+                self._used = [False] * len(self.records)
+            order = sorted(range(len(self.records)), key=lambda i: self._used[i])  # unused first
+            matching = [i for i in order if self.records[i]["key"] == key]
+            if not matching:
+                if self.strict:
+                    raise KeyError(f"No recording of request {key[:12]} ({kwargs.get('model')})")
+                print(f"⚠️ No recording of request {key[:12]} ({kwargs.get('model')}), "
+                      f"replaying {self.records[order[0]]['key'][:12]} instead")
+            index = (matching or order)[0]
+            self._used[index] = True
+            return self.records[index]
+
+
+def add_stream_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--record", type=Path, help="Record every stream to this JSONL(.gz) file")
+    parser.add_argument("--replay", type=Path, help="Replay streams from this recording instead of calling the API")
+    parser.add_argument("--speed", type=float, default=1.0, help="Replay speed multiplier, 0 = as fast as possible")
+    parser.add_argument("--lenient-replay", action="store_true",
+                        help="With --replay: serve the next recording (with a warning) for requests never recorded")
+    parser.add_argument("--response-cache", action="store_true",
+                        help="Serve repeated requests from the on-disk response cache (see response_cache.py)")
+    parser.add_argument("--bypass-cache", action="store_true",
+                        help="With --response-cache: always call the API and refresh the cache")
+
+
+def client_from_args(args: argparse.Namespace):
+    """Live, recording, replaying or response-caching client, according to the arguments above."""
+    if args.replay:
+        return ReplayClient(args.replay, speed=args.speed or None, strict=not args.lenient_replay)
+    client = RecordingClient(args.record) if args.record else anthropic.Anthropic()
+    if args.response_cache:
+        from response_cache import CachingClient
+        client = CachingClient(client, bypass=args.bypass_cache)
+    return client
+
+
+def client_from_argv(argv: Optional[Sequence[str]] = None):
+    """client_from_args for scripts without their own parser (unknown arguments are ignored)."""
+    parser = argparse.ArgumentParser(add_help=False)
+    add_stream_arguments(parser)
+    args, _ = parser.parse_known_args(sys.argv[1:] if argv is None else argv)
+    return client_from_args(args)
+
+
+def describe(records: Sequence[dict]) -> List[Dict]:
+    """Per-stream summary: model, chunks, TTFT, duration and output tokens."""
+    return [
+        {
+            "model": record["model"],
+            "chunks": len(record["chunks"]),
+            "ttft_s": record["offsets_us"][0] / 1e6 if record["offsets_us"] else None,
+            "duration_s": record["end_us"] / 1e6,
+            "output_tokens": record["message"].get("usage", {}).get("output_tokens"),
+            "key": record["key"][:12],
+        }
+        for record in records
+    ]
+
+
+def main():
+    for path in sys.argv[1:] or sorted(RECORDINGS_DIR.glob("*.jsonl*")):
+        print(f"📼 {path}")
+        for row in describe(load_records(Path(path))):
+            print("   " + ", ".join(f"{k}={v}" for k, v in row.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -158,20 +158,22 @@ The following recipe assumes you're very ambitious.
 The first step is to decide what to work on. The work you choose needs to have three qualities: it has to be something you have a natural aptitude for, that you have a deep interest in, and that offers scope to do great work.
 """
 import streamlit as st
-import anthropic
-client = anthropic.Anthropic()
+from stream_batching import batched_text
+from stream_recording import client_from_argv
+# `streamlit run streaming_animation.py -- --replay FILE [--speed N]` replays a recording (see stream_recording.py)
+client = client_from_argv()
 import time
+
+
 st.header("Streaming Animation with Anthropic API")
 if st.button("Stream data"):
     with st.spinner("Streaming..."):
-        stream_data = []
         with client.messages.stream(
             max_tokens=1024,
             messages=[{"role": "user", "content": f"Hello can you repeat back to me this paragraph, five times exactly : \nparagraph: {great_work_pgraham}"}],
             # model="claude-3-5-haiku-20241022",
             model = "claude-3-7-sonnet-20250219"
         ) as stream:
-            for text in stream.text_stream:
-                stream_data.append(text)
-                st.write_stream([text])
+            # one element for the whole answer, fed by a single generator
+            st.write_stream(batched_text(stream.text_stream))
 # %%
@@ -0,0 +1,72 @@
+"""
+Frame-rate coalescing renderer for streamed text.
+
+Printing every streamed chunk with `flush=True` costs one write syscall per
+token, and the old `time.sleep(0.01)` "typewriter" delay stalled the stream
+reader by 10 ms per chunk. The renderer decouples the two: the reader only
+appends chunks to a buffer (never blocks on the terminal), and a background
+thread writes whatever has arrived once per frame, so a long answer appears
+as fast as the network delivers it while still scrolling smoothly.
+
+Usage:
+    with TerminalRenderer(fps=60) as renderer:
+        for text in stream.text_stream:
+            renderer.write(text)
+"""
+
+import sys
+import threading
+from collections import deque
+from typing import Deque, Optional, TextIO
+
+
+class TerminalRenderer:
+    def __init__(self, fps: float = 60.0, out: Optional[TextIO] = None):
+        """
+        Args:
+            fps (float): Frames per second, i.e. the maximum number of writes per second
+            out (TextIO): Stream to render to, defaults to sys.stdout
+        """
+        self.frame_s = 1.0 / fps
+        self.out = out or sys.stdout
+        self._pending: Deque[str] = deque()  # appends/pops are thread-safe, no lock on the hot path
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.frames = 0  # number of writes actually issued
+
+    def start(self) -> "TerminalRenderer":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="terminal-renderer", daemon=True)
+        self._thread.start()
+        return self
+
+    def write(self, text: str):
+        """Queue a chunk; returns immediately."""
+        self._pending.append(text)
+
+    def _flush(self):
+        parts = []
+        while self._pending:
+            parts.append(self._pending.popleft())
+        if parts:
+            self.out.write("".join(parts))
+            self.out.flush()
+            self.frames += 1
+
+    def _run(self):
+        while not self._stop.wait(self.frame_s):
+            self._flush()
+
+    def close(self):
+        """Stop the render thread and write whatever is still buffered."""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        self._flush()
+
+    def __enter__(self) -> "TerminalRenderer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -6,88 +6,18 @@ Uses streaming to display text with typewriter effect in the terminal
 import anthropic
 import time
 import sys
-import requests
-from bs4 import BeautifulSoup
 
-try:
-    response = requests.get("https://www.paulgraham.com/greatwork.html")
-    response.raise_for_status()
-    soup = BeautifulSoup(response.text, 'html.parser')
-    
-    # Extract text content from the HTML
-    for script in soup(["script", "style"]):
-        script.extract()
-    great_work_pgraham = soup.get_text()
-    
-    # Clean up the text
-    lines = (line.strip() for line in great_work_pgraham.splitlines())
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    great_work_pgraham = '\n'.join(chunk for chunk in chunks if chunk)
-    
-    print("✅ Successfully fetched Paul Graham's 'Great Work' essay")
-    print(f"📄 Content length: {len(great_work_pgraham)} characters")
-    
-except requests.RequestException as e:
-    print(f"❌ Error fetching content: {e}")
-    # Fallback content
-    great_work_pgraham = """
-July 2023
-If you collected lists of techniques for doing great work in a lot of different fields, what would the intersection look like? I decided to find out by making it.
-Partly my goal was to create a guide that could be used by someone working in any field. But I was also curious about the shape of the intersection. And one thing this exercise shows is that it does have a definite shape; it's not just a point labelled "work hard."
-The following recipe assumes you're very ambitious.
-The first step is to decide what to work on. The work you choose needs to have three qualities: it has to be something you have a natural aptitude for, that you have a deep interest in, and that offers scope to do great work.
-"""
-    print("🔄 Using fallback content")
-
-
-class ConversationHistory:
-    def __init__(self):
-        self.turns = []
-
-    def add_turn_assistant(self, content):
-        self.turns.append({
-            "role": "assistant",
-            "content": [
-                {
-                    "type": "text",
-                    "text": content
-                }
-            ]
-        })
+from conversation_history import ConversationHistory
+from document_loader import fetch_essay
+from stream_recording import client_from_argv
+from terminal_renderer import TerminalRenderer
 
-    def add_turn_user(self, content):
-        self.turns.append({
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": content
-                }
-            ]
-        })
+great_work_pgraham = fetch_essay()
 
-    def get_turns(self):
-        result = []
-        user_turns_processed = 0
-        for turn in reversed(self.turns):
-            if turn["role"] == "user" and user_turns_processed < 1:
-                result.append({
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "text",
-                            "text": turn["content"][0]["text"],
-                            # "cache_control": {"type": "ephemeral"}
-                        }
-                    ]
-                })
-                user_turns_processed += 1
-            else:
-                result.append(turn)
-        return list(reversed(result))
 
-def stream_terminal_animation():
-    client = anthropic.Anthropic()
+def stream_terminal_animation(client=None):
+    """client: an anthropic.Anthropic, or a stream_recording Recording/ReplayClient"""
+    client = client or anthropic.Anthropic()
     conversation_history = ConversationHistory()
     
     system_message = f"<file_contents> {great_work_pgraham} </file_contents>"
@@ -123,12 +53,11 @@ def stream_terminal_animation():
                      "cache_control": {"type": "ephemeral"}
                      },
                 ],
-                messages=conversation_history.get_turns(),
-            ) as stream:
+                messages=conversation_history.get_turns(add_cache_control=False),
+            ) as stream, TerminalRenderer() as renderer:
                 for text in stream.text_stream:
-                    print(text, end="", flush=True)
+                    renderer.write(text)
                     full_response += text
-                    time.sleep(0.01)  # Small delay for visual effect
             
             print()  # New line after streaming
             
@@ -163,4 +92,5 @@ def stream_terminal_animation():
         time.sleep(1)  # Pause between questions
 
 if __name__ == "__main__":
-    stream_terminal_animation()
\ No newline at end of file
+    # --record FILE / --replay FILE [--speed N], see stream_recording.py
+    stream_terminal_animation(client_from_argv())
\ No newline at end of file
@@ -0,0 +1,21 @@
+import anthropic
+import pytest
+
+from mock_messages_server import MockServerConfig, start_mock_server
+
+FAST_MOCK = dict(ttft_median_s=0.005, ttft_sigma=0.0, prefill_s_per_token=0.0, cached_prefill_s_per_token=0.0,
+                 token_latency_median_s=0.0005, token_latency_sigma=0.0)
+
+
+@pytest.fixture
+def mock_server():
+    """Base URL of a fast local mock Messages API (fresh cache per test)."""
+    server, base_url = start_mock_server(MockServerConfig(**FAST_MOCK))
+    yield base_url
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def mock_client(mock_server):
+    return anthropic.Anthropic(base_url=mock_server, api_key="mock", max_retries=0)
@@ -0,0 +1,57 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from cache_benchmark import (
+    CONFIGS, bootstrap_ci, permutation_p_value, run_benchmark, summarize, write_results,
+)
+from document_loader import OFFLINE_DOCUMENT_TOKENS, offline_document
+from provider_models import ALL_MODELS, CLAUDE_SONNET_4
+from token_estimator import TOKEN_ESTIMATOR
+
+
+def test_offline_document_is_cacheable_on_every_model():
+    document = offline_document()
+    assert all(TOKEN_ESTIMATOR.estimate_text(document, model.name) >= OFFLINE_DOCUMENT_TOKENS
+               for model in ALL_MODELS)
+
+
+def test_bootstrap_ci_brackets_the_mean():
+    values = np.random.default_rng(0).normal(10, 1, 50)
+    low, high = bootstrap_ci(values, np.random.default_rng(1))
+    assert low < values.mean() < high
+    assert all(np.isnan(bootstrap_ci(values[:1], np.random.default_rng(1))))
+
+
+def test_permutation_p_value_separates_different_means():
+    rng = np.random.default_rng(0)
+    a, b = rng.normal(0, 1, 30), rng.normal(3, 1, 30)
+    assert permutation_p_value(a, b, np.random.default_rng(1), 2_000) < 0.01
+    assert permutation_p_value(a, rng.normal(0, 1, 30), np.random.default_rng(1), 2_000) > 0.01
+
+
+def test_mock_run_cached_is_cheaper(mock_client, tmp_path):
+    trials = run_benchmark([CLAUDE_SONNET_4], trials=3, warmup=1, concurrency=2, max_tokens=20, seed=0,
+                           client=mock_client, system_text=offline_document())
+    assert len(trials) == 2 * (3 + 1)
+    measured = trials[~trials["warmup"]]
+    assert (measured.loc[measured["config"] == "cached", "cache_read_input_tokens"] > 0).all()
+    assert (measured.loc[measured["config"] == "uncached", "cache_read_input_tokens"] == 0).all()
+
+    summary = summarize(trials).set_index("metric")
+    cost = summary.loc["total_cost"]
+    assert cost["cached_n"] == cost["uncached_n"] == 3
+    assert cost["cached_mean"] < cost["uncached_mean"]
+
+    path = write_results(trials, summary.reset_index(), {"started_at": "t"}, tmp_path / "run.jsonl")
+    kinds = [json.loads(line)["type"] for line in path.read_text().splitlines()]
+    assert kinds == ["run"] + ["trial"] * len(trials) + ["summary"] * len(summary)
+
+
+def test_summarize_skips_warmup_rounds():
+    trials = pd.DataFrame([{"model": "m", "config": config, "warmup": warmup, "ttft_s": 100.0 if warmup else 1.0,
+                            "total_latency_s": 1.0, "tokens_per_s": 1.0, "total_cost": 1.0}
+                           for config in CONFIGS for warmup in (True, False, False)])
+    ttft = summarize(trials).set_index("metric").loc["ttft_s"]
+    assert ttft["cached_mean"] == ttft["uncached_mean"] == 1.0
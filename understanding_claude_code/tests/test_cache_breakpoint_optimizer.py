@@ -0,0 +1,78 @@
+from datetime import datetime, timedelta
+
+from cache_breakpoint_optimizer import (
+    CACHE_TTL, LOGGED, MAX_BREAKPOINTS, PrefixCacheSimulator, anchor_positions, breakpoints_for,
+    candidate_placements, optimize_session, split_prompt_blocks,
+)
+from provider_models import CLAUDE_SONNET_4
+
+T0 = datetime(2025, 7, 26, 8, 0, 0)
+
+
+def body(turns: int):
+    messages = [{"role": "user" if i % 2 == 0 else "assistant", "content": f"turn {i} " + "x" * 200}
+                for i in range(turns)]
+    return {
+        "tools": [{"name": "read", "description": "d" * 500}],
+        "system": [{"type": "text", "text": "s" * 4000, "cache_control": {"type": "ephemeral"}}],
+        "messages": messages,
+    }
+
+
+def test_split_prompt_blocks_adds_up_to_the_logged_total():
+    blocks = split_prompt_blocks(body(3), 5_000)
+    assert [block.section for block in blocks] == ["tools", "system", "messages", "messages", "messages"]
+    assert sum(block.tokens for block in blocks) == 5_000
+    assert [block.has_breakpoint for block in blocks] == [False, True, False, False, False]
+
+
+def test_cache_control_does_not_change_block_identity():
+    marked = split_prompt_blocks(body(1), 1_000)
+    unmarked_body = body(1)
+    del unmarked_body["system"][0]["cache_control"]
+    unmarked = split_prompt_blocks(unmarked_body, 1_000)
+    assert [b.digest for b in marked] == [b.digest for b in unmarked]
+
+
+def test_anchor_positions_and_breakpoints():
+    blocks = split_prompt_blocks(body(4), 5_000)
+    assert anchor_positions(blocks) == {"tools": 0, "system": 1, "first_message": 2,
+                                        "previous_message": 4, "last_message": 5}
+    assert breakpoints_for(blocks, ("system", "last_message")) == [1, 5]
+    assert breakpoints_for(blocks, LOGGED) == [1]
+    assert all(len(placement) <= MAX_BREAKPOINTS for placement in candidate_placements())
+
+
+def test_simulator_write_then_read_then_expire():
+    blocks = split_prompt_blocks(body(1), 3_000)
+    cache = PrefixCacheSimulator()
+    first = cache.request(CLAUDE_SONNET_4, blocks, [1], T0)
+    assert first["cache_read_input_tokens"] == 0
+    assert first["cache_creation_input_tokens"] == sum(b.tokens for b in blocks[:2])
+
+    second = cache.request(CLAUDE_SONNET_4, blocks, [1], T0 + timedelta(minutes=1))
+    assert second["cache_read_input_tokens"] == first["cache_creation_input_tokens"]
+    assert second["cache_creation_input_tokens"] == 0
+
+    # the read refreshed the TTL, so this one still hits; then nothing for longer than the TTL
+    third = cache.request(CLAUDE_SONNET_4, blocks, [1], T0 + timedelta(minutes=5))
+    assert third["cache_read_input_tokens"] > 0
+    expired = cache.request(CLAUDE_SONNET_4, blocks, [1], T0 + timedelta(minutes=5) + CACHE_TTL)
+    assert expired["cache_read_input_tokens"] == 0
+
+
+def test_prefix_below_minimum_is_not_cached():
+    blocks = split_prompt_blocks(body(1), 500)
+    usage = PrefixCacheSimulator().request(CLAUDE_SONNET_4, blocks, [1], T0)
+    assert usage["cache_creation_input_tokens"] == 0
+    assert usage["input_tokens"] == 500
+
+
+def test_optimize_session_beats_no_caching():
+    requests = [{"timestamp": T0 + timedelta(seconds=30 * i), "model": CLAUDE_SONNET_4,
+                 "blocks": split_prompt_blocks(body(2 * i + 1), 3_000 + 100 * i), "output_tokens": 50}
+                for i in range(5)]
+    ranked, recommendation = optimize_session(requests)
+    assert recommendation["requests"] == 5
+    assert recommendation["cost"] == ranked["cost"].min()
+    assert recommendation["savings_vs_uncached"] > 0
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+from cache_keepalive import CacheKeepAlive
+from provider_models import CLAUDE_SONNET_4
+
+SYSTEM = [{"type": "text", "text": "manual", "cache_control": {"type": "ephemeral"}}]
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeClient:
+    """Answers every refresh with a cache read of the whole prefix."""
+
+    def __init__(self, tokens):
+        self.calls = []
+        usage = SimpleNamespace(model_dump=lambda: {"input_tokens": 10, "output_tokens": 1,
+                                                    "cache_read_input_tokens": tokens})
+        self.messages = SimpleNamespace(create=lambda **kwargs: self.calls.append(kwargs) or
+                                        SimpleNamespace(usage=usage))
+
+
+def keepalive(tokens=50_000):
+    clock = Clock()
+    return CacheKeepAlive(FakeClient(tokens), ttl_s=300, margin_s=20, clock=clock, verbose=False), clock
+
+
+def advance(ka, clock, until):
+    """Run every due decision up to `until`, jumping the clock from one due time to the next."""
+    while True:
+        due = ka.run_pending()
+        if due is None or due > until:
+            break
+        clock.now = due
+    clock.now = until
+
+
+def test_a_bridged_gap_credits_the_avoided_premium():
+    ka, clock = keepalive()
+    prefix_id = ka.register(CLAUDE_SONNET_4.name, SYSTEM, tokens=50_000, expected_gap_s=1_000)
+    advance(ka, clock, 1_000)
+    prefix = ka.prefixes[prefix_id]
+    assert prefix.refreshes == 3  # at 280, 560 and 840: each one TTL minus the 20 s margin after the last
+    assert all(d["keep"] for d in ka.decisions)
+    ka.touch(prefix_id, {"cache_read_input_tokens": 50_000})
+    assert prefix.premiums_avoided == ka._premium(prefix)
+    assert prefix.refresh_cost_since_use == 0 and prefix.refreshes_since_use == 0
+    assert ka.report()["net_saved"].iloc[0] > 0
+
+
+def test_an_abandoned_prefix_never_costs_more_than_its_premium():
+    ka, clock = keepalive()
+    prefix_id = ka.register(CLAUDE_SONNET_4.name, SYSTEM, tokens=50_000, expected_gap_s=400)
+    advance(ka, clock, 100_000)
+    prefix = ka.prefixes[prefix_id]
+    assert 0 < prefix.refreshes < 10
+    assert prefix.refresh_cost <= ka._premium(prefix)
+    assert ka.decisions[-1]["keep"] is False
+    assert ka.decisions[-1]["reason"] in ("refresh budget spent", "overdue, break-even")
+    assert any(d["reason"] == "overdue, break-even" for d in ka.decisions)
+
+
+def test_the_overdue_reuse_probability_decays_with_idle_time():
+    ka, clock = keepalive()
+    prefix_id = ka.register(CLAUDE_SONNET_4.name, SYSTEM, tokens=50_000, expected_gap_s=100)
+    prefix = ka.prefixes[prefix_id]
+    premium = ka._premium(prefix)
+    assert ka.decide(prefix, 200)["expiry_cost"] == premium / 2
+    assert ka.decide(prefix, 1_000)["expiry_cost"] == premium / 10
+
+
+def test_short_or_gapless_prefixes_are_left_to_expire():
+    ka, clock = keepalive(tokens=500)
+    ka.register(CLAUDE_SONNET_4.name, SYSTEM, tokens=500, expected_gap_s=1_000)
+    ka.register(CLAUDE_SONNET_4.name, SYSTEM + SYSTEM, tokens=50_000)
+    advance(ka, clock, 1_000)
+    assert sorted(d["reason"] for d in ka.decisions) == ["no expected next use yet", "prefix too short to be cached"]
+    assert ka.client.calls == []
+
+
+def test_use_registers_once_then_touches():
+    ka, clock = keepalive()
+    first = ka.use(CLAUDE_SONNET_4.name, SYSTEM, tokens=50_000)
+    clock.now = 120
+    assert ka.use(CLAUDE_SONNET_4.name, SYSTEM) == first
+    clock.now = 200
+    ka.use(CLAUDE_SONNET_4.name, SYSTEM)
+    prefix = ka.prefixes[first]
+    assert len(ka.prefixes) == 1
+    assert prefix.gaps == [120, 80] and prefix.expected_gap() == 100
+    assert prefix.premiums_avoided == 0  # nothing was refreshed in between
@@ -0,0 +1,54 @@
+import pytest
+
+from caching_simulator import (
+    STRATEGIES, Conversation, Turn, simulate_strategy, strategy_distributions, sweep_strategies,
+    synthetic_conversations,
+)
+
+
+def conversation(conversation_id, think_times, system_tokens=8_000, start_s=0.0):
+    return Conversation(conversation_id, start_s, "shared", system_tokens,
+                        [Turn(think, user_tokens=200, output_tokens=300) for think in think_times])
+
+
+def test_every_turn_becomes_one_request_in_time_order():
+    conversations = synthetic_conversations(20, seed=3)
+    requests = simulate_strategy("rolling_last_user", conversations)
+    assert len(requests) == sum(len(c.turns) for c in conversations)
+    for _, turns in requests.groupby("conversation_id"):
+        assert turns["turn"].tolist() == sorted(turns["turn"])
+        assert turns["time_s"].is_monotonic_increasing
+
+
+def test_no_caching_never_touches_the_cache():
+    requests = simulate_strategy("no_caching", synthetic_conversations(10))
+    assert requests["cache_read_input_tokens"].sum() == 0
+    assert requests["cache_creation_input_tokens"].sum() == 0
+
+
+def test_rolling_breakpoint_reads_the_previous_turn_within_the_ttl():
+    requests = simulate_strategy("rolling_last_user", [conversation("c", [0, 30, 30])])
+    assert requests["cache_read_input_tokens"].iloc[0] == 0
+    assert (requests["cache_read_input_tokens"].iloc[1:] > 8_000).all()
+
+
+def test_a_pause_longer_than_the_ttl_rewrites_the_prefix():
+    requests = simulate_strategy("system_only", [conversation("c", [0, 30, 600])])
+    assert requests["cache_read_input_tokens"].tolist() == [0, 8_000, 0]
+    assert requests["cache_creation_input_tokens"].iloc[2] == 8_000
+
+
+def test_system_prompt_is_shared_between_conversations():
+    requests = simulate_strategy("system_only", [conversation("a", [0]), conversation("b", [0], start_s=60)])
+    assert requests.set_index("conversation_id").loc["b", "cache_read_input_tokens"] == 8_000
+
+
+def test_caching_is_cheaper_and_the_sweep_matches_serial_runs():
+    sets = [synthetic_conversations(15, seed=seed) for seed in (0, 1)]
+    requests = sweep_strategies(sets, max_workers=2)
+    summary = strategy_distributions(requests)
+    assert set(summary.index) == set(STRATEGIES)
+    assert summary.loc["multi_breakpoint", "total_cost"] < summary.loc["no_caching", "total_cost"]
+    serial = simulate_strategy("system_only", sets[1])["cost"].sum()
+    swept = requests[(requests["strategy"] == "system_only") & (requests["replicate"] == 1)]["cost"].sum()
+    assert swept == pytest.approx(serial)
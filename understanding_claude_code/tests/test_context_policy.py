@@ -0,0 +1,66 @@
+from conversation_history import SUMMARY_PREFIX, ConversationHistory, KeepLastTokens, SummarizeOldest
+
+LONG = "some words in a fairly long turn " * 10
+
+
+def fill(history: ConversationHistory, turns: int) -> ConversationHistory:
+    for i in range(turns):
+        history.add_turn_user(f"question {i}: {LONG}")
+        history.add_turn_assistant(f"answer {i}: {LONG}")
+    history.add_turn_user("last question")
+    return history
+
+
+def roles_alternate(messages) -> bool:
+    roles = [m["role"] for m in messages]
+    return roles[0] == "user" and all(a != b for a, b in zip(roles, roles[1:]))
+
+
+def test_window_stays_within_budget_and_keeps_the_last_user_turn():
+    history = fill(ConversationHistory(system_tokens=100, context_policy=KeepLastTokens(600)), 20)
+    assert history.request_tokens <= 600
+    messages = history.get_turns()
+    assert messages[-1]["content"][-1]["text"] == "last question"
+    assert roles_alternate(messages)
+    assert len(history) == 41  # the full record is kept, only the payload is trimmed
+
+
+def test_system_tokens_count_against_the_budget():
+    small = fill(ConversationHistory(system_tokens=0, context_policy=KeepLastTokens(800)), 20)
+    big = fill(ConversationHistory(system_tokens=400, context_policy=KeepLastTokens(800)), 20)
+    assert len(big.get_turns()) < len(small.get_turns())
+
+
+def test_trimmed_prefix_is_stable_between_trims():
+    history = fill(ConversationHistory(context_policy=KeepLastTokens(1_000, target_ratio=0.5)), 10)
+    start = history._start
+    first_message = history.get_turns()[0]
+    history.add_turn_assistant("short answer")
+    history.add_turn_user("short follow-up")
+    assert history._start == start
+    assert history.get_turns()[0] == first_message
+
+
+def test_summary_is_merged_into_the_first_kept_user_turn():
+    summarized = []
+
+    def summarize(previous, turns):
+        summarized.append((previous, len(turns)))
+        return f"summary of {len(turns)} turns" + (" after an earlier one" if previous else "")
+
+    history = fill(ConversationHistory(context_policy=SummarizeOldest(800, summarize)), 20)
+    assert summarized and summarized[0][0] is None
+    if len(summarized) > 1:
+        assert summarized[1][0] is not None  # the running summary is passed back in
+
+    messages = history.get_turns()
+    assert roles_alternate(messages)
+    first_blocks = messages[0]["content"]
+    assert first_blocks[0]["text"].startswith(SUMMARY_PREFIX + "summary of")
+    assert first_blocks[1]["text"].startswith("question")
+    assert history.summary_tokens > 0
+    assert history.request_tokens <= 800
+
+    # the kept turn's own record is untouched
+    kept = history.turns[history._start]
+    assert kept["content"] == [first_blocks[1]]
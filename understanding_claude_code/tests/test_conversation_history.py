@@ -0,0 +1,76 @@
+import json
+import time
+from datetime import datetime
+
+from conversation_history import CACHE_CONTROL, ConversationHistory
+
+
+def conversation(turns: int) -> ConversationHistory:
+    history = ConversationHistory()
+    for i in range(turns):
+        history.add_turn_user(f"question {i}")
+        history.add_turn_assistant(f"answer {i}")
+    return history
+
+
+def markers(messages):
+    return [i for i, m in enumerate(messages) if any("cache_control" in b for b in m["content"])]
+
+
+def test_payload_mirrors_the_turns():
+    history = conversation(3)
+    messages = history.get_turns(add_cache_control=False)
+    assert [m["role"] for m in messages] == ["user", "assistant"] * 3
+    assert [m["content"][0]["text"] for m in messages] == [t["content"][0]["text"] for t in history.turns]
+    assert set(messages[0]) == {"role", "content"}
+    assert markers(messages) == []
+
+
+def test_marker_follows_the_last_user_turn():
+    history = conversation(2)
+    assert markers(history.get_turns()) == [2]
+    history.add_turn_user("question 2")
+    messages = history.get_turns()
+    assert markers(messages) == [4]
+    assert messages[4]["content"][-1]["cache_control"] == CACHE_CONTROL
+    assert markers(history.get_turns(add_cache_control=False)) == []
+
+
+def test_the_stable_prefix_is_reused_between_calls():
+    history = conversation(3)
+    history.add_turn_user("question 3")
+    first = history.get_turns()
+    prefix = first[:-1]
+    history.add_turn_assistant("answer 3")
+    history.add_turn_user("question 4")
+    again = history.get_turns()
+    assert again is first  # the shared payload, not a rebuilt list
+    assert all(a is b for a, b in zip(again, prefix))
+    # only the message losing the marker and the one gaining it were swapped
+    assert again[6] is history._all[6] and "cache_control" not in again[6]["content"][-1]
+    assert again[-1] is not history._all[-1] and "cache_control" not in history._all[-1]["content"][-1]
+
+
+def test_json_payload_matches_the_messages():
+    history = conversation(3)
+    history.add_turn_user("last")
+    for add_cache_control in (True, False, True):
+        assert json.loads(history.get_turns_json(add_cache_control)) == history.get_turns(add_cache_control)
+    assert CACHE_CONTROL == {"type": "ephemeral"}
+
+
+def test_token_counts_accumulate():
+    history = conversation(3)
+    assert history.window_tokens == sum(turn["tokens"] for turn in history.turns)
+    assert history.request_tokens == history.window_tokens
+
+
+def test_turns_before_a_timestamp():
+    history = conversation(1)
+    time.sleep(0.001)
+    cutoff = datetime.now()
+    time.sleep(0.001)
+    history.add_turn_user("later")
+    assert len(history.get_turns_before(cutoff)) == 2
+    assert len(history.get_turns_before(history.turns[-1]["timestamp"])) == 3
+    assert len(history.get_turns_before(history.turns[0]["timestamp"], include=False)) == 0
@@ -0,0 +1,50 @@
+import math
+
+import numpy as np
+import pytest
+
+import cache_breakpoint_optimizer
+from cost_engine import USAGE_COLUMNS, price_matrix, price_usage, price_usage_records
+from provider_models import CLAUDE_HAIKU_35, PRICED_MODELS
+
+
+def random_records(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    models = [PRICED_MODELS[i] for i in rng.integers(0, len(PRICED_MODELS), n)]
+    return models, [{"model": model.name, **{c: int(rng.integers(0, 100_000)) for c in USAGE_COLUMNS}}
+                    for model in models]
+
+
+def test_batch_matches_the_scalar_helper():
+    models, records = random_records(500)
+    priced, _ = price_usage_records(records)
+    expected = [cache_breakpoint_optimizer.price_usage(model, record) for model, record in zip(models, records)]
+    np.testing.assert_allclose(priced["total_cost"].to_numpy(), expected, rtol=1e-12)
+
+
+def test_single_record_price_breakdown():
+    usage = {"input_tokens": 1_000_000, "output_tokens": 1_000_000,
+             "cache_creation_input_tokens": 1_000_000, "cache_read_input_tokens": 1_000_000}
+    cost = price_usage(usage, CLAUDE_HAIKU_35.name)
+    assert cost["input_cost"] == pytest.approx(CLAUDE_HAIKU_35.input_price_per_mtok)
+    assert cost["output_cost"] == pytest.approx(CLAUDE_HAIKU_35.output_price_per_mtok)
+    assert cost["cache_creation_cost"] == pytest.approx(CLAUDE_HAIKU_35.prompt_caching_write_price_per_mtok)
+    assert cost["cache_read_cost"] == pytest.approx(CLAUDE_HAIKU_35.prompt_caching_read_price_per_mtok)
+
+
+def test_missing_and_null_usage_count_as_zero():
+    cost = price_usage({"input_tokens": 1_000, "cache_read_input_tokens": None}, CLAUDE_HAIKU_35.name)
+    assert cost["total_cost"] == pytest.approx(1_000 * CLAUDE_HAIKU_35.input_price_per_mtok / 1e6)
+
+
+def test_dated_aliases_resolve_and_unknown_models_are_nan():
+    prices = price_matrix(["claude-3-5-haiku-latest", "not-a-model", None])
+    np.testing.assert_allclose(prices[0], price_matrix([CLAUDE_HAIKU_35.name])[0])
+    assert np.isnan(prices[1]).all() and np.isnan(prices[2]).all()
+
+
+def test_group_totals():
+    _, records = random_records(200, seed=1)
+    priced, grouped = price_usage_records(records, group_by=["model"])
+    assert grouped["calls"].sum() == 200
+    assert math.isclose(grouped["total_cost"].sum(), priced["total_cost"].sum(), rel_tol=1e-12)
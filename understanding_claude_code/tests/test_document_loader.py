@@ -0,0 +1,84 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+from document_loader import DocumentLoader, extract_text
+
+PAGE = ("<html><head><title>Great Work</title><style>p { color: red }</style>"
+        "<script>var x = '<p>not text</p>';</script></head>"
+        "<body><h1>How to Do Great Work</h1><p>Curiosity &amp; delight —  naïve</p>"
+        "<ul><li>one</li><li>two</li></ul></body></html>")
+PAGE_TEXT = "Great Work\nHow to Do Great Work\nCuriosity & delight —\nnaïve\none\ntwo"
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, len(PAGE)])
+def test_text_is_the_same_however_the_page_is_chunked(chunk_size):
+    chunks = [PAGE[i:i + chunk_size] for i in range(0, len(PAGE), chunk_size)]
+    assert extract_text(chunks) == PAGE_TEXT
+
+
+@pytest.fixture
+def site():
+    """Local server for /page (with an ETag, no charset) that can be switched to failing."""
+    state = {"gets": 0, "not_modified": 0, "fail": False}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            state["gets"] += 1
+            if state["fail"]:
+                self.send_error(500)
+                return
+            if self.headers.get("If-None-Match") == '"v1"':
+                state["not_modified"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            body = PAGE.encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("ETag", '"v1"')
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/page", state
+    server.shutdown()
+    server.server_close()
+
+
+def test_fetch_defaults_to_utf8_and_stores_the_validators(site, tmp_path):
+    url, state = site
+    document = DocumentLoader(tmp_path).load(url)
+    assert document.text == PAGE_TEXT  # not mojibake from requests' ISO-8859-1 default
+    assert document.etag == '"v1"'
+    assert DocumentLoader(tmp_path).cached(url) == document
+
+
+def test_fresh_documents_skip_the_network_and_stale_ones_revalidate(site, tmp_path):
+    url, state = site
+    DocumentLoader(tmp_path).load(url)
+    DocumentLoader(tmp_path).load(url)
+    assert state["gets"] == 1
+
+    stale_loader = DocumentLoader(tmp_path, max_age_s=0)
+    fetched_at = stale_loader.cached(url).fetched_at
+    document = stale_loader.load(url)
+    assert state["not_modified"] == 1
+    assert document.text == PAGE_TEXT and document.fetched_at > fetched_at
+
+
+def test_failures_fall_back_to_the_stale_copy(site, tmp_path):
+    url, state = site
+    DocumentLoader(tmp_path).load(url)
+    state["fail"] = True
+    assert DocumentLoader(tmp_path).load(url, revalidate=True).text == PAGE_TEXT
+    with pytest.raises(requests.HTTPError):
+        DocumentLoader(tmp_path / "empty").load(url)
+    assert DocumentLoader(tmp_path / "empty").load_many([url]) == {url: None}
@@ -0,0 +1,62 @@
+import math
+
+import pytest
+
+from experiment_store import ExperimentStore, aggregate
+
+
+def row(call, **fields):
+    return {"model": "m", "call": call, "input_tokens": 10, "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0, "output_tokens": 5, "total_cost": 0.01, "latency_s": 1.0,
+            "ttft_s": 0.5, **fields}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ExperimentStore(tmp_path / "runs.sqlite")
+    yield store
+    store.close()
+
+
+def test_insert_ignores_unknown_keys(store):
+    assert store.insert_rows("run-1", [row("write", usage={"nested": 1}, response="text")]) == 1
+    results = store.rows_since(0)
+    assert "usage" not in results and "response" not in results
+    assert results.loc[0, "run_id"] == "run-1" and results.loc[0, "input_tokens"] == 10
+    assert results.loc[0, "created_at"]
+
+
+def test_rows_since_returns_only_the_new_rows(store, tmp_path):
+    store.insert_rows("run-1", [row("write"), row("read")])
+    first = store.rows_since(0)
+    assert list(first["call"]) == ["write", "read"]
+
+    store.insert_rows("run-2", [row("read", total_cost=0.002)])
+    new = store.rows_since(int(first["id"].max()))
+    assert list(new["run_id"]) == ["run-2"]
+    assert store.rows_since(int(new["id"].max())).empty
+
+    reopened = ExperimentStore(tmp_path / "runs.sqlite")  # results survive across sessions
+    assert len(reopened.rows_since(0)) == 3
+    reopened.close()
+
+
+def test_aggregate_skips_errors_and_computes_the_cached_share(store):
+    store.insert_rows("run-1", [
+        row("write", cache_creation_input_tokens=90),
+        row("read", cache_read_input_tokens=90, total_cost=0.002),
+        row("read", cache_read_input_tokens=90, total_cost=0.004),
+        row("read", error="rate limited", total_cost=None, latency_s=None),
+        row("empty", input_tokens=0),
+    ])
+    summary = aggregate(store.rows_since(0))
+    assert summary.loc[("m", "read"), "calls"] == 2
+    assert summary.loc[("m", "read"), "mean_cost"] == pytest.approx(0.003)
+    assert summary.loc[("m", "read"), "cached_share"] == pytest.approx(0.9)
+    assert summary.loc[("m", "write"), "cached_share"] == 0
+    assert math.isnan(summary.loc[("m", "empty"), "cached_share"])  # no input at all: no share, not a 0/0 error
+
+
+def test_aggregate_of_only_failures_is_empty(store):
+    store.insert_rows("run-1", [row("read", error="boom")])
+    assert aggregate(store.rows_since(0)).empty
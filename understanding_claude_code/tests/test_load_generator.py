@@ -0,0 +1,46 @@
+import asyncio
+import math
+import socket
+
+import anthropic
+
+from document_loader import offline_document
+from load_generator import LoadConfig, load_report, run_load
+
+SYSTEM_PROMPT = f"<file_contents> {offline_document()} </file_contents>"
+CONFIG = LoadConfig(conversations=4, arrival_rate_per_s=50, turns=3, think_time_median_s=0.01,
+                    concurrency=2, max_tokens=20)
+
+
+def unused_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_mock_run_reports_every_turn_and_reads_the_shared_prefix(mock_server):
+    client = anthropic.AsyncAnthropic(base_url=mock_server, api_key="mock", max_retries=0)
+    requests = asyncio.run(run_load(client, CONFIG, SYSTEM_PROMPT))
+    assert len(requests) == 12
+    assert "error" not in requests
+    assert sorted(requests.groupby("conversation")["turn"].apply(list)) == [[0, 1, 2]] * 4
+    assert (requests["queue_s"] >= 0).all() and (requests["ttft_s"] <= requests["latency_s"]).all()
+
+    report = load_report(requests)
+    assert report["requests"] == 12 and report["errors"] == 0 and report["conversations"] == 4
+    assert report["cache_hit_ratio"] > 0.5  # only the first request writes the system prompt
+    assert report["ttft_p50_s"] <= report["ttft_p90_s"] <= report["ttft_p99_s"]
+    assert report["total_cost"] > 0
+
+
+def test_a_run_where_every_request_fails_still_reports():
+    client = anthropic.AsyncAnthropic(base_url=f"http://127.0.0.1:{unused_port()}", api_key="mock",
+                                      max_retries=0)
+    requests = asyncio.run(run_load(client, CONFIG, SYSTEM_PROMPT))
+    assert len(requests) == 4  # each conversation stops at its first failed turn
+    assert requests["error"].notna().all()
+
+    report = load_report(requests)
+    assert report["errors"] == report["requests"] == 4
+    assert math.isnan(report["ttft_p50_s"]) and math.isnan(report["cache_hit_ratio"])
+    assert report["total_cost"] == 0.0
@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+from log_analytics import extract_usage, latency_summary, load_request_log, parse_sse_events
+
+SSE_BODY = "\n".join([
+    "event: message_start",
+    'data: {"type": "message_start", "message": {"usage": {"input_tokens": 12, "cache_read_input_tokens": 3}}}',
+    "event: ping",
+    'data: {"type": "ping"}',
+    "data: not json",
+    "event: message_delta",
+    'data: {"type": "message_delta", "usage": {"output_tokens": 40}}',
+])
+
+
+def capture(request_id, request_ts, response_ts, completed_ts, body, streaming=True, model="claude-3-5-haiku-20241022"):
+    return {
+        "requestId": request_id,
+        "timestamp": completed_ts,
+        "request": {"timestamp": request_ts, "url": "https://api.anthropic.com/v1/messages", "method": "POST",
+                    "body": {"model": model, "messages": [{"role": "user", "content": "hi"}]}},
+        "response": {"timestamp": response_ts, "statusCode": 200, "streaming": streaming,
+                     "headers": {"content-type": "text/event-stream" if streaming else "application/json"},
+                     "body": body},
+    }
+
+
+def test_parse_sse_events_skips_non_json_data():
+    events = parse_sse_events(SSE_BODY)
+    assert [event["type"] for event in events] == ["message_start", "ping", "message_delta"]
+
+
+def test_extract_usage_merges_start_and_delta():
+    assert extract_usage(SSE_BODY) == {"input_tokens": 12, "cache_read_input_tokens": 3, "output_tokens": 40}
+    assert extract_usage({"usage": {"input_tokens": 5}}) == {"input_tokens": 5}
+    assert extract_usage("plain text") == {}
+
+
+def test_load_request_log_timings(tmp_path):
+    path = tmp_path / "session.jsonl"
+    records = [
+        capture("r1", "2025-07-26T08:00:00.000Z", "2025-07-26T08:00:00.500Z", "2025-07-26T08:00:02.500Z", SSE_BODY),
+        capture("r2", "2025-07-26T08:01:00.000Z", "2025-07-26T08:01:01.000Z", "2025-07-26T08:01:01.000Z",
+                {"usage": {"input_tokens": 7, "output_tokens": 9}}, streaming=False),
+    ]
+    path.write_text("\n".join(json.dumps(record) for record in records) + "\n\n")
+
+    df = load_request_log([path]).set_index("request_id")
+    assert df.loc["r1", "latency_s"] == pytest.approx(2.5)
+    assert df.loc["r1", "ttfb_s"] == pytest.approx(0.5)
+    assert df.loc["r1", "ttft_s"] == pytest.approx(0.5)
+    assert df.loc["r1", "tokens_per_s"] == pytest.approx(40 / 2.0)
+    assert df.loc["r2", "latency_s"] == pytest.approx(1.0)
+    assert df.loc["r2", "ttft_s"] != df.loc["r2", "ttft_s"]  # NaN: not a stream
+    assert df.loc["r2", "tokens_per_s"] != df.loc["r2", "tokens_per_s"]  # NaN: no generation time
+
+    summary = latency_summary(df.reset_index())
+    assert summary["requests"].sum() == 2
+    assert summary["wall_clock_s"].sum() == pytest.approx(3.5)
@@ -0,0 +1,84 @@
+import time
+
+import anthropic
+import pytest
+
+from conftest import FAST_MOCK
+from document_loader import offline_document
+from mock_messages_server import DEFAULT_RESPONSE, MockServerConfig, response_tokens, start_mock_server
+from provider_models import CLAUDE_HAIKU_35, CLAUDE_SONNET_4
+from token_estimator import TOKEN_ESTIMATOR
+
+DOCUMENT = offline_document()
+
+
+def cached_system(text=DOCUMENT):
+    return [{"type": "text", "text": text, "cache_control": {"type": "ephemeral"}}]
+
+
+def ask(client, system, question="q", model=CLAUDE_SONNET_4.name, max_tokens=100):
+    return client.messages.create(model=model, max_tokens=max_tokens, system=system,
+                                  messages=[{"role": "user", "content": question}])
+
+
+def test_response_tokens_are_capped_word_deltas():
+    assert response_tokens("a b c d", 3) == ["a", " b", " c"]
+    assert "".join(response_tokens(DEFAULT_RESPONSE, 10_000)) == DEFAULT_RESPONSE
+
+
+def test_first_call_writes_and_second_call_reads_the_prefix(mock_client):
+    first = ask(mock_client, cached_system()).usage
+    second = ask(mock_client, cached_system(), "another question").usage
+    assert first.cache_creation_input_tokens > 0 and first.cache_read_input_tokens == 0
+    assert second.cache_read_input_tokens == first.cache_creation_input_tokens
+    assert second.cache_creation_input_tokens == 0
+    total = first.input_tokens + first.cache_creation_input_tokens
+    assert total == TOKEN_ESTIMATOR.estimate(CLAUDE_SONNET_4.name, system=cached_system(),
+                                             messages=[{"role": "user", "content": "q"}])
+
+
+def test_short_or_unmarked_prompts_are_not_cached(mock_client):
+    short = ask(mock_client, cached_system("short system prompt")).usage
+    unmarked = ask(mock_client, [{"type": "text", "text": DOCUMENT}]).usage
+    for usage in (short, unmarked):
+        assert usage.cache_creation_input_tokens == 0 and usage.cache_read_input_tokens == 0
+
+
+def test_caches_are_per_model(mock_client):
+    ask(mock_client, cached_system(), model=CLAUDE_SONNET_4.name)
+    other = ask(mock_client, cached_system(), model=CLAUDE_HAIKU_35.name).usage
+    assert other.cache_read_input_tokens == 0
+
+
+def test_entries_expire_after_the_ttl():
+    server, base_url = start_mock_server(MockServerConfig(**{**FAST_MOCK, "cache_ttl_s": 0.2}))
+    try:
+        client = anthropic.Anthropic(base_url=base_url, api_key="mock", max_retries=0)
+        ask(client, cached_system())
+        time.sleep(0.3)
+        assert ask(client, cached_system()).usage.cache_read_input_tokens == 0
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_stream_matches_the_plain_response(mock_client):
+    with mock_client.messages.stream(model=CLAUDE_SONNET_4.name, max_tokens=5, system=cached_system(),
+                                     messages=[{"role": "user", "content": "q"}]) as stream:
+        text = "".join(stream.text_stream)
+        message = stream.get_final_message()
+    assert text == "".join(response_tokens(DEFAULT_RESPONSE, 5))
+    assert message.stop_reason == "max_tokens"
+    assert message.usage.output_tokens == 5
+    assert message.usage.cache_creation_input_tokens > 0
+
+
+def test_count_tokens_uses_the_estimator(mock_client):
+    messages = [{"role": "user", "content": "hello there"}]
+    counted = mock_client.messages.count_tokens(model=CLAUDE_SONNET_4.name, messages=messages).input_tokens
+    assert counted == TOKEN_ESTIMATOR.estimate(CLAUDE_SONNET_4.name, messages=messages)
+
+
+def test_unknown_paths_are_404(mock_client):
+    with pytest.raises(anthropic.NotFoundError):
+        mock_client.post("/v1/unknown", cast_to=object, body={})
@@ -0,0 +1,114 @@
+import math
+import time
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from caching_experiment import ProfilerStreaming
+from cost_engine import price_usage
+from token_estimator import TOKEN_ESTIMATOR
+
+
+def slow_stream(chunks, delay_s=0.0, first_delay_s=0.0):
+    time.sleep(first_delay_s)
+    for chunk in chunks:
+        yield chunk
+        time.sleep(delay_s)
+
+
+def test_wrap_passes_chunks_through_and_measures_ttft():
+    profiler = ProfilerStreaming()
+    profiler.begin()
+    chunks = [f"c{i} " for i in range(10)]
+    assert list(profiler.wrap(slow_stream(chunks, first_delay_s=0.02))) == chunks
+    assert profiler.count == 10
+    assert 0.02 <= profiler.ttft_s < 1.0
+    assert [point.chunk for point in profiler.data_points] == chunks
+
+
+def test_ttft_survives_the_ring_wrapping():
+    profiler = ProfilerStreaming(capacity=4)
+    assert profiler.capacity == 4
+    profiler.begin()
+    list(profiler.wrap(slow_stream(["a"] * 11, first_delay_s=0.02)))
+    assert profiler.ttft_s >= 0.02
+    timestamps, chunks = profiler._ordered()
+    assert len(chunks) == 4 and list(timestamps) == sorted(timestamps)
+
+
+def test_second_wrap_keeps_the_first_chunk_of_the_first_one():
+    profiler = ProfilerStreaming(capacity=4)
+    profiler.begin()
+    list(profiler.wrap(["a", "b", "c"]))
+    first = profiler.first_chunk_ns
+    time.sleep(0.01)
+    list(profiler.wrap(["d", "e", "f"]))  # wraps the ring: slot 0 now holds a later chunk
+    assert profiler.first_chunk_ns == first
+
+
+def test_empty_stream_has_no_ttft():
+    profiler = ProfilerStreaming()
+    profiler.begin()
+    assert list(profiler.wrap([])) == []
+    profiler.finish()
+    summary = profiler.summary()
+    assert summary["ttft_s"] is None and summary["chunks"] == 0
+    assert math.isnan(summary["inter_token_ms_p50"])
+
+
+def test_summary_uses_the_exact_output_tokens():
+    profiler = ProfilerStreaming()
+    profiler.begin()
+    list(profiler.wrap(slow_stream(["word "] * 20, delay_s=0.001)))
+    profiler.finish(SimpleNamespace(output_tokens=40, input_tokens=10))
+    summary = profiler.summary()
+    assert summary["output_tokens"] == 40
+    assert profiler.chunk_tokens().sum() == pytest.approx(40)
+    assert summary["inter_token_ms_p50"] >= 1.0
+    assert summary["tokens_per_s"] > 0
+
+
+def test_cost_curve_ends_at_the_priced_usage():
+    usage = SimpleNamespace(input_tokens=12, output_tokens=40, cache_creation_input_tokens=0,
+                            cache_read_input_tokens=3_000)
+    profiler = ProfilerStreaming(cache_used=True)
+    profiler.begin()
+    list(profiler.wrap(slow_stream(["word "] * 20)))
+    profiler.finish(usage)
+
+    elapsed, cost = profiler.cumulative_cost_per_second()
+    expected = price_usage(vars(usage), profiler.model.name)
+    assert len(elapsed) == len(cost) == 21 and elapsed[0] == 0.0
+    assert cost[0] == pytest.approx(expected["total_cost"] - expected["output_cost"])
+    assert cost[-1] == pytest.approx(expected["total_cost"])
+    assert (np.diff(cost) > 0).all()
+
+
+def test_estimated_input_cost_counts_the_system_prompt_as_read_when_cached():
+    profiler = ProfilerStreaming()
+    profiler.system_message = "A long system prompt. " * 200
+    profiler.messages = [{"role": "user", "content": "question"}]
+    model = profiler.model
+    system_tokens = TOKEN_ESTIMATOR.estimate(model.name, system=profiler.system_message)
+    saved = profiler.input_cost(cache_used=False) - profiler.input_cost(cache_used=True)
+    assert saved == pytest.approx(system_tokens * (model.input_price_per_mtok
+                                                   - model.prompt_caching_read_price_per_mtok) / 1e6)
+
+
+def test_recording_costs_less_than_a_microsecond_per_chunk():
+    chunks = ["x"] * 200_000
+
+    def per_chunk_s(wrapped):
+        start = time.perf_counter()
+        for _ in wrapped:
+            pass
+        return (time.perf_counter() - start) / len(chunks)
+
+    overheads = []
+    for _ in range(5):  # best of 5: the bound is on the work done, not on scheduler noise
+        profiler = ProfilerStreaming(capacity=len(chunks))
+        profiler.begin()
+        overheads.append(per_chunk_s(profiler.wrap(chunks)) - per_chunk_s(iter(chunks)))
+        assert profiler.count == len(chunks)
+    assert min(overheads) < 1e-6
@@ -0,0 +1,73 @@
+from types import SimpleNamespace
+
+from caching_experiment import ProfilerStreaming
+from document_loader import offline_document
+from prompt_caching_calls import (ClaudeModel, format_ttft, response_text, run_cache_pair, sweep_models,
+                                  timeline_chart)
+
+SYSTEM_PROMPT = offline_document()
+
+
+class FailingFor:
+    """Wraps a client so that streams for one model raise a non-API error."""
+
+    def __init__(self, client, model: ClaudeModel):
+        outer = self
+        self.model = model
+
+        class Messages:
+            def stream(self, **kwargs):
+                if kwargs["model"] == outer.model.value:
+                    raise RuntimeError("worker crashed")
+                return client.messages.stream(**kwargs)
+
+        self.messages = Messages()
+
+
+def test_cache_pair_writes_then_reads(mock_client):
+    creation, hit = run_cache_pair(mock_client, ClaudeModel.SONNET_4, SYSTEM_PROMPT, "q")
+    assert (creation["call"], hit["call"]) == ("cache creation", "cache hit")
+    assert creation["cache_creation_input_tokens"] > 0 and hit["cache_read_input_tokens"] > 0
+    assert hit["total_cost"] < creation["total_cost"]
+
+
+def test_sweep_yields_rows_for_every_model(mock_client):
+    rows = [row for model_rows in sweep_models(mock_client, list(ClaudeModel), SYSTEM_PROMPT, "q")
+            for row in model_rows]
+    assert sorted(row["model"] for row in rows) == sorted(model.name for model in ClaudeModel for _ in range(2))
+    assert not any("error" in row for row in rows)
+
+
+def test_one_failing_model_does_not_abort_the_sweep(mock_client):
+    client = FailingFor(mock_client, ClaudeModel.OPUS_3)
+    rows = [row for model_rows in sweep_models(client, list(ClaudeModel), SYSTEM_PROMPT, "q") for row in model_rows]
+    failed = [row for row in rows if "error" in row]
+    assert failed == [{"model": "OPUS_3", "call": "cache creation", "error": "RuntimeError: worker crashed"}]
+    assert len(rows) == 2 * (len(ClaudeModel) - 1) + 1
+
+
+def test_missing_ttft_is_shown_as_not_available():
+    assert format_ttft(None) == "n/a"
+    assert format_ttft(0.12345) == "0.123 s"
+    assert format_ttft(0.0) == "0.000 s"
+
+
+def test_response_text_joins_the_text_blocks_only():
+    text = SimpleNamespace(type="text", text="Hello ")
+    tool = SimpleNamespace(type="tool_use", id="t1", name="lookup", input={})
+    assert response_text(SimpleNamespace(content=[text, tool, SimpleNamespace(type="text", text="world")])) == "Hello world"
+    assert response_text(SimpleNamespace(content=[tool])) == ""
+    assert response_text(SimpleNamespace(content=[])) == ""
+
+
+def test_timeline_chart_handles_streams_without_text():
+    answered = ProfilerStreaming()
+    answered.begin()
+    list(answered.wrap(["a", "b"]))
+    tool_only = ProfilerStreaming()
+    tool_only.begin()
+    list(tool_only.wrap([]))
+    figure = timeline_chart({"answered": answered, "tool only": tool_only})
+    waiting, generating = figure.data
+    assert waiting.x[0] == answered.ttft_s and waiting.x[1] == 0.0
+    assert generating.base[1] == 0.0 and generating.x[1] >= 0
@@ -0,0 +1,92 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from document_loader import offline_document
+from provider_models import CLAUDE_SONNET_4
+from response_cache import CachingClient, ResponseCache
+
+SYSTEM = [{"type": "text", "text": offline_document(), "cache_control": {"type": "ephemeral"}}]
+REQUEST = dict(model=CLAUDE_SONNET_4.name, max_tokens=20, system=SYSTEM, messages=[{"role": "user", "content": "q"}])
+
+
+class CountingClient:
+    """Forwards to the mock client and counts the calls that reach it."""
+
+    def __init__(self, client):
+        self.calls = 0
+        outer = self
+
+        class Messages:
+            def stream(self, **kwargs):
+                outer.calls += 1
+                return client.messages.stream(**kwargs)
+
+            def create(self, **kwargs):
+                outer.calls += 1
+                return client.messages.create(**kwargs)
+
+        self.messages = Messages()
+
+
+def streamed_usage(client):
+    with client.messages.stream(**REQUEST) as stream:
+        text = "".join(stream.text_stream)
+        return text, stream.get_final_message().usage
+
+
+def test_repeated_run_is_served_from_disk_with_its_original_usage(mock_client, tmp_path):
+    live = CountingClient(mock_client)
+    first_run = CachingClient(live, ResponseCache(tmp_path))
+    write, read = streamed_usage(first_run), streamed_usage(first_run)
+    assert write[1].cache_creation_input_tokens > 0 and read[1].cache_read_input_tokens > 0
+
+    second_run = CachingClient(live, ResponseCache(tmp_path))
+    # the n-th identical request of a run replays the n-th response, not the first one
+    assert streamed_usage(second_run) == write
+    assert streamed_usage(second_run) == read
+    assert live.calls == 2
+    assert second_run.cache.hits == 2
+
+
+def test_create_is_cached_too(mock_client, tmp_path):
+    live = CountingClient(mock_client)
+    first = CachingClient(live, ResponseCache(tmp_path)).messages.create(**REQUEST)
+    again = CachingClient(live, ResponseCache(tmp_path)).messages.create(**REQUEST)
+    assert again.content[0].text == first.content[0].text
+    assert again.usage == first.usage
+    assert live.calls == 1
+
+
+def test_bypass_always_calls_the_api(mock_client, tmp_path):
+    live = CountingClient(mock_client)
+    streamed_usage(CachingClient(live, ResponseCache(tmp_path)))
+    streamed_usage(CachingClient(live, ResponseCache(tmp_path), bypass=True))
+    assert live.calls == 2
+
+
+def test_lru_eviction_keeps_the_cache_under_its_size(tmp_path):
+    cache = ResponseCache(tmp_path, max_bytes=2_500)
+    payload = {"chunks": [os.urandom(600).hex()]}
+    for i in range(4):
+        cache.put(f"{i:02d}key", payload)
+        time.sleep(0.01)
+    assert cache.size_bytes() <= 2_500
+    assert cache.get("00key") is None
+    assert cache.get("03key") == payload
+
+
+def test_counters_are_exact_under_threads(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put("aakey", {"x": 1})
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda i: cache.get("aakey" if i % 2 else "bbkey"), range(400)))
+    assert (cache.hits, cache.misses) == (200, 200)
+
+
+def test_clear(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put("aakey", {"x": 1})
+    assert len(cache) == 1
+    cache.clear()
+    assert len(cache) == 0 and cache.get("aakey") is None
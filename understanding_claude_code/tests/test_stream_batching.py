@@ -0,0 +1,48 @@
+import time
+
+import pytest
+
+from stream_batching import batched_text
+
+
+def timed(chunks):
+    """(delay before the chunk, chunk) pairs as a text stream."""
+    for delay_s, chunk in chunks:
+        time.sleep(delay_s)
+        yield chunk
+
+
+def test_batches_flush_by_size_and_the_last_partial_batch_is_kept():
+    chunks = [f"{i:02d}," for i in range(10)]
+    batches = list(batched_text(iter(chunks), max_interval_s=60, max_chars=12))
+    assert batches == ["00,01,02,03,", "04,05,06,07,", "08,09,"]
+
+
+def test_batches_flush_by_interval():
+    source = timed([(0, "a")] + [(0.01, "b")] * 20)
+    batches = list(batched_text(source, max_interval_s=0.05, max_chars=10_000))
+    assert "".join(batches) == "a" + "b" * 20
+    assert 2 <= len(batches) <= 10
+
+
+def test_buffered_text_is_shown_during_a_stall():
+    batches = batched_text(timed([(0, "before the stall"), (0.5, "after")]), max_interval_s=0.05)
+    start = time.perf_counter()
+    assert next(batches) == "before the stall"
+    assert time.perf_counter() - start < 0.3  # not held back until the next chunk arrives
+    assert list(batches) == ["after"]
+
+
+def test_errors_are_raised_after_the_text_received_before_them():
+    def failing():
+        yield "partial"
+        raise ConnectionError("stream dropped")
+
+    batches = batched_text(failing(), max_interval_s=60)
+    assert next(batches) == "partial"
+    with pytest.raises(ConnectionError):
+        next(batches)
+
+
+def test_empty_stream():
+    assert list(batched_text(iter([]))) == []
@@ -0,0 +1,82 @@
+import time
+
+import pytest
+
+from provider_models import CLAUDE_SONNET_4
+from stream_recording import (RecordingClient, ReplayClient, ReplayStream, client_from_argv, load_records,
+                              request_key)
+
+
+def request(question="q", **extra):
+    return dict(model=CLAUDE_SONNET_4.name, max_tokens=20,
+                messages=[{"role": "user", "content": question}], **extra)
+
+
+def record(client, path, *questions):
+    recorder = RecordingClient(path, client)
+    texts = []
+    for question in questions:
+        with recorder.messages.stream(**request(question)) as stream:
+            texts.append("".join(stream.text_stream))
+    return texts
+
+
+def test_request_key_ignores_transport_options():
+    assert request_key(request()) == request_key(request(extra_headers={"x": "1"}, timeout=3))
+    assert request_key(request()) != request_key(request("other"))
+
+
+@pytest.mark.parametrize("name", ["streams.jsonl", "streams.jsonl.gz"])
+def test_recording_round_trips(mock_client, tmp_path, name):
+    path = tmp_path / name
+    texts = record(mock_client, path, "a", "b")
+    records = load_records(path)
+    assert ["".join(r["chunks"]) for r in records] == texts
+    assert all(r["offsets_us"] == sorted(r["offsets_us"]) and r["end_us"] >= r["offsets_us"][-1]
+               for r in records)
+
+    replay = ReplayClient(path, speed=None)
+    with replay.messages.stream(**request("b")) as stream:
+        assert "".join(stream.text_stream) == texts[1]
+        message = stream.get_final_message()
+    assert message.usage.output_tokens == records[1]["message"]["usage"]["output_tokens"]
+    assert message.content[0].text == texts[1]
+
+
+def test_replay_prefers_matching_unused_recordings(mock_client, tmp_path, capsys):
+    path = tmp_path / "streams.jsonl"
+    record(mock_client, path, "a", "a", "b")
+    replay = ReplayClient(path, speed=None)
+    records = replay.records
+    assert replay.next_record(request("a")) is records[0]
+    assert replay.next_record(request("a")) is records[1]
+    assert replay.next_record(request("a")) is records[0]  # all "a" used: start over
+    with pytest.raises(KeyError):
+        replay.next_record(request("unknown"))  # strict by default: never another request's answer
+
+    lenient = ReplayClient(path, strict=False)
+    assert lenient.next_record(request("unknown")) is lenient.records[0]  # falls back to the next unused one
+    assert "No recording of request" in capsys.readouterr().out
+
+
+def test_replay_from_the_command_line_is_strict_unless_asked(tmp_path, mock_client):
+    path = tmp_path / "streams.jsonl"
+    record(mock_client, path, "a")
+    assert client_from_argv(["--replay", str(path)]).strict
+    assert not client_from_argv(["--replay", str(path), "--lenient-replay"]).strict
+
+
+def test_replay_keeps_the_recorded_timing():
+    recorded = {"chunks": ["a", "b", "c"], "offsets_us": [50_000, 100_000, 150_000], "end_us": 160_000,
+                "message": {"id": "m", "type": "message", "role": "assistant", "model": "x",
+                            "usage": {"input_tokens": 1, "output_tokens": 3}}}
+    start = time.perf_counter()
+    with ReplayStream(recorded, speed=1.0) as stream:
+        assert "".join(stream.text_stream) == "abc"
+        assert stream.get_final_text() == "abc"
+    assert 0.15 <= time.perf_counter() - start < 0.5
+
+    start = time.perf_counter()
+    with ReplayStream(recorded, speed=None) as stream:
+        "".join(stream.text_stream)
+    assert time.perf_counter() - start < 0.05
@@ -0,0 +1,65 @@
+import io
+import threading
+import time
+
+from terminal_renderer import TerminalRenderer
+
+
+class CountingOut(io.StringIO):
+    def __init__(self):
+        super().__init__()
+        self.writes = 0
+
+    def write(self, text):
+        self.writes += 1
+        return super().write(text)
+
+
+def test_everything_written_is_rendered_in_order():
+    out = CountingOut()
+    chunks = [f"{i} " for i in range(2_000)]
+    with TerminalRenderer(fps=100, out=out) as renderer:
+        for chunk in chunks:
+            renderer.write(chunk)
+    assert out.getvalue() == "".join(chunks)
+
+
+def test_chunks_are_coalesced_into_frames():
+    out = CountingOut()
+    with TerminalRenderer(fps=20, out=out) as renderer:
+        for i in range(500):
+            renderer.write("x")
+            if i % 100 == 0:
+                time.sleep(0.01)
+    assert out.getvalue() == "x" * 500
+    assert out.writes == renderer.frames < 50
+
+
+def test_write_never_blocks_on_a_slow_terminal():
+    release = threading.Event()
+
+    class SlowOut(io.StringIO):
+        def write(self, text):
+            release.wait(2)
+            return super().write(text)
+
+    out = SlowOut()
+    renderer = TerminalRenderer(fps=200, out=out).start()
+    renderer.write("first")
+    time.sleep(0.02)  # the render thread is now stuck in write
+    start = time.perf_counter()
+    for _ in range(1_000):
+        renderer.write("y")
+    assert time.perf_counter() - start < 0.5
+    release.set()
+    renderer.close()
+    assert out.getvalue() == "first" + "y" * 1_000
+
+
+def test_close_without_start_flushes():
+    out = io.StringIO()
+    renderer = TerminalRenderer(out=out)
+    renderer.write("a")
+    renderer.write("b")
+    renderer.close()
+    assert out.getvalue() == "ab"
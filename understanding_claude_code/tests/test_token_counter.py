@@ -0,0 +1,92 @@
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+import provider_models
+from provider_models import CLAUDE_SONNET_4, TokenCounter, price_anthropic_call_with_input_caching
+
+
+class FakeCountClient:
+    """count_tokens stand-in: 1 token per character of text, with a call log."""
+
+    def __init__(self, delay_s: float = 0.0):
+        self.calls = []
+        self.delay_s = delay_s
+        self._lock = threading.Lock()
+        self.messages = SimpleNamespace(count_tokens=self.count_tokens)
+
+    def count_tokens(self, model, messages, system=None):
+        with self._lock:
+            self.calls.append((model, system, messages))
+        time.sleep(self.delay_s)
+        blocks = list(system or [])
+        for message in messages:
+            content = message["content"]
+            blocks += [{"text": content}] if isinstance(content, str) else content
+        return SimpleNamespace(input_tokens=sum(len(block["text"]) for block in blocks))
+
+
+def user(text):
+    return [{"role": "user", "content": text}]
+
+
+def test_pool_is_created_on_first_miss_only():
+    counter = TokenCounter(FakeCountClient())
+    assert counter._executor is None
+    assert counter.count("m", messages=user("hello")) == 5
+    assert counter._executor is not None
+
+
+def test_repeated_counts_are_served_from_the_cache():
+    client = FakeCountClient()
+    counter = TokenCounter(client)
+    assert counter.count("m", messages=user("abc")) == 3
+    assert counter.count("m", messages=user("abc")) == 3
+    assert len(client.calls) == 1
+
+
+def test_bookkeeping_keys_do_not_change_the_count_or_the_key():
+    client = FakeCountClient()
+    counter = TokenCounter(client)
+    turn = {"role": "user", "content": "abc", "id": "x", "timestamp": "t"}
+    assert counter.count("m", messages=[turn]) == counter.count("m", messages=user("abc"))
+    assert len(client.calls) == 1
+    assert "id" not in client.calls[0][2][0]
+
+
+def test_count_many_deduplicates_concurrent_requests():
+    client = FakeCountClient(delay_s=0.05)
+    counter = TokenCounter(client)
+    requests = [{"model_name": "m", "messages": user("aa")}, {"model_name": "m", "messages": user("bbb")}] * 4
+    assert counter.count_many(requests) == [2, 3] * 4
+    assert len(client.calls) == 2
+
+
+def test_lru_evicts_the_oldest_entry():
+    client = FakeCountClient()
+    counter = TokenCounter(client, max_cache_entries=2)
+    for text in ("a", "bb", "ccc"):
+        counter.count("m", messages=user(text))
+    counter.count("m", messages=user("a"))
+    assert len(client.calls) == 4
+
+
+def test_failed_counts_are_not_cached():
+    client = FakeCountClient()
+    counter = TokenCounter(client)
+    client.messages.count_tokens = lambda **kwargs: (_ for _ in ()).throw(RuntimeError("down"))
+    with pytest.raises(RuntimeError):
+        counter.count("m", messages=user("x"))
+    assert not counter._in_flight and not counter._cache
+
+
+def test_cached_prefix_price_counts_the_system_prompt_with_the_messages(monkeypatch):
+    monkeypatch.setattr(provider_models, "TOKEN_COUNTER", TokenCounter(FakeCountClient()))
+    system, messages = "s" * 1_000, user("q" * 100)
+    price = price_anthropic_call_with_input_caching(CLAUDE_SONNET_4, 10, system, messages)
+    expected = (1_000 * CLAUDE_SONNET_4.prompt_caching_read_price_per_mtok
+                + 100 * CLAUDE_SONNET_4.input_price_per_mtok
+                + 10 * CLAUDE_SONNET_4.output_price_per_mtok) / 1_000_000
+    assert price == pytest.approx(expected)
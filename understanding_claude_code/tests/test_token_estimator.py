@@ -0,0 +1,75 @@
+import pytest
+
+import provider_models
+from provider_models import CLAUDE_HAIKU_35, EstimatedPrice, price_anthropic_call_no_caching
+from token_estimator import (
+    FALLBACK_ENTRY, MIN_CALIBRATION_SAMPLES, CalibrationEntry, TokenEstimator, prompt_text,
+)
+
+
+@pytest.fixture
+def estimator(tmp_path):
+    return TokenEstimator(tmp_path / "calibration.json")
+
+
+def test_prompt_text_covers_tools_system_and_blocks():
+    text = prompt_text(
+        system=[{"type": "text", "text": "S"}],
+        messages=[{"role": "user", "content": "a"},
+                  {"role": "user", "content": [{"type": "text", "text": "b"}, {"type": "image", "x": 1}]}],
+        tools=[{"name": "t"}],
+    )
+    assert text == '{"name": "t"}Sab{"type": "image", "x": 1}'
+
+
+def test_fit_recovers_a_linear_tokenizer(estimator):
+    chars = [100, 400, 1_600, 6_400, 25_600]
+    entry = estimator.fit("claude-sonnet-4-20250514", chars, [c / 4 + 7 for c in chars])
+    assert entry.tokens_per_char == pytest.approx(0.25)
+    assert entry.overhead_tokens == pytest.approx(7)
+    assert entry.rel_error_max == pytest.approx(0, abs=1e-9)
+    assert estimator.estimate_chars("claude-sonnet-4-20250514", 4_000) == 1_007
+
+
+def test_fit_goes_through_the_origin_instead_of_a_negative_overhead(estimator):
+    entry = estimator.fit("claude-sonnet-4-20250514", [100, 1_000], [10, 250])
+    assert entry.overhead_tokens == 0.0
+
+
+def test_unknown_family_uses_the_fallback(estimator):
+    assert estimator.entry("some-other-model") is FALLBACK_ENTRY
+
+
+def test_saved_table_round_trips(estimator):
+    estimator.fit("claude-3-5-haiku-20241022", [100, 1_000], [30, 290])
+    estimator.save()
+    reloaded = TokenEstimator(estimator.table_path)
+    assert reloaded.entry("claude-3-5-haiku-latest") == estimator.entry("claude-3-5-haiku-20241022")
+
+
+def test_vectorized_estimate_matches_the_scalar_one(estimator):
+    estimator.fit("claude-sonnet-4-20250514", [100, 10_000], [30, 2_600])
+    names = ["claude-sonnet-4-20250514", "claude-3-5-haiku-20241022", "claude-sonnet-4-20250514"]
+    chars = [0, 1_234, 99_999]
+    expected = [estimator.estimate_chars(name, c) for name, c in zip(names, chars)]
+    assert estimator.estimate_chars_array(names, chars).tolist() == expected
+
+
+def test_error_bound_is_widened_for_small_samples():
+    few = CalibrationEntry(0.25, 0.0, samples=5, rel_error_p50=0.05, rel_error_max=0.2)
+    enough = CalibrationEntry(0.25, 0.0, samples=MIN_CALIBRATION_SAMPLES, rel_error_p50=0.05, rel_error_max=0.2)
+    assert few.error_bound == pytest.approx(0.4)
+    assert enough.error_bound == 0.2
+
+
+def test_bounds_bracket_the_estimate(estimator):
+    estimate, low, high = estimator.estimate_with_bounds("x", system="s" * 3_500)
+    assert low < estimate < high
+
+
+def test_estimated_price_carries_its_range():
+    price = price_anthropic_call_no_caching(CLAUDE_HAIKU_35, 100, "s" * 10_000,
+                                            [{"role": "user", "content": "q"}], estimate=True)
+    assert isinstance(price, EstimatedPrice)
+    assert price.low < float(price) < price.high
+    assert provider_models.TOKEN_COUNTER._executor is None  # no network path taken
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+Offline token estimator calibrated per model family.
+
+Estimates input tokens from character counts with a per-family linear model
+(tokens = tokens_per_char * chars + overhead) instead of a `count_tokens`
+network round-trip. The coefficients live in token_calibration.json and are
+fitted once against exact counts, either from live `count_tokens` calls or
+from the `usage` blocks of the logged requests. Each entry carries the
+relative error observed during calibration, so callers know how far an
+estimate can be off.
+
+Usage:
+    python token_estimator.py            # recalibrate from logs/*.jsonl
+    python token_estimator.py --live     # recalibrate against count_tokens
+"""
+
+import json
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from provider_models import model_family
+
+CALIBRATION_PATH = Path(__file__).resolve().parent / "token_calibration.json"
+DEFAULT_FAMILY = "default"
+MIN_CALIBRATION_SAMPLES = 20  # below this, the observed max error is widened (see CalibrationEntry.error_bound)
+
+
+@dataclass
+class CalibrationEntry:
+    """Linear chars -> tokens fit for one model family, with its observed error."""
+    tokens_per_char: float
+    overhead_tokens: float
+    samples: int
+    rel_error_p50: float  # median |estimate - exact| / exact
+    rel_error_max: float  # worst relative error seen during calibration
+
+    @property
+    def error_bound(self) -> float:
+        """
+        Relative error to assume for an estimate: the worst calibration error,
+        widened by sqrt(MIN_CALIBRATION_SAMPLES / samples) when the fit saw fewer
+        samples than that (a handful of log samples under-states the spread).
+        """
+        if self.samples >= MIN_CALIBRATION_SAMPLES:
+            return self.rel_error_max
+        return self.rel_error_max * (MIN_CALIBRATION_SAMPLES / max(self.samples, 1)) ** 0.5
+
+
+FALLBACK_ENTRY = CalibrationEntry(
+    tokens_per_char=1 / 3.5, overhead_tokens=0.0, samples=0, rel_error_p50=0.25, rel_error_max=0.5
+)
+
+
+def prompt_text(system=None, messages: Optional[Sequence[dict]] = None,
+                tools: Optional[Sequence[dict]] = None) -> str:
+    """Concatenate the tokenized text of a request: tool schemas, system blocks and message blocks."""
+    parts = [json.dumps(tool) for tool in tools or []]
+    if isinstance(system, str):
+        parts.append(system)
+    else:
+        parts.extend(block.get("text", "") for block in system or [])
+    for message in messages or []:
+        content = message.get("content")
+        if isinstance(content, str):
+            parts.append(content)
+            continue
+        for block in content or []:
+            parts.append(block["text"] if block.get("type") == "text" else json.dumps(block))
+    return "".join(parts)
+
+
+class TokenEstimator:
+    """Estimates token counts from the calibration table, with no network access."""
+
+    def __init__(self, table_path: Path = CALIBRATION_PATH):
+        self.table_path = Path(table_path)
+        self.table: Dict[str, CalibrationEntry] = {}
+        if self.table_path.exists():
+            with open(self.table_path, "r") as f:
+                self.table = {family: CalibrationEntry(**entry) for family, entry in json.load(f).items()}
+
+    def entry(self, model_name: str) -> CalibrationEntry:
+        return self.table.get(model_family(model_name)) or self.table.get(DEFAULT_FAMILY) or FALLBACK_ENTRY
+
+    def estimate_chars(self, model_name: str, chars: int) -> int:
+        entry = self.entry(model_name)
+        return max(1, round(entry.tokens_per_char * chars + entry.overhead_tokens)) if chars else 0
+
+    def estimate_text(self, text: str, model_name: str) -> int:
+        """Estimated tokens of a bare piece of text (e.g. one streamed chunk), without request overhead."""
+        return max(1, round(self.entry(model_name).tokens_per_char * len(text))) if text else 0
+
+    def estimate(self, model_name: str, system=None, messages: Optional[Sequence[dict]] = None,
+                 tools: Optional[Sequence[dict]] = None) -> int:
+        """Estimated input tokens of a full request, the offline counterpart of `count_tokens`."""
+        return self.estimate_chars(model_name, len(prompt_text(system, messages, tools)))
+
+    def estimate_with_bounds(self, model_name: str, **request) -> Tuple[int, int, int]:
+        """(estimate, low, high) where low/high apply the entry's `error_bound`."""
+        estimate = self.estimate(model_name, **request)
+        error = self.entry(model_name).error_bound
+        return estimate, int(estimate / (1 + error)), int(np.ceil(estimate / max(1 - error, 1e-6)))
+
+    def estimate_chars_array(self, model_names: Sequence[str], chars: Sequence[float]) -> np.ndarray:
+        """Vectorized estimate over parallel arrays of model ids and character counts."""
+        entries = {name: self.entry(name) for name in set(model_names)}
+        slope = np.array([entries[name].tokens_per_char for name in model_names], dtype=float)
+        overhead = np.array([entries[name].overhead_tokens for name in model_names], dtype=float)
+        chars = np.asarray(chars, dtype=float)
+        return np.where(chars > 0, np.maximum(1, np.rint(slope * chars + overhead)), 0)
+
+    def fit(self, model_name: str, chars: Sequence[int], exact_tokens: Sequence[int]) -> CalibrationEntry:
+        """Fit and store the entry for `model_name`'s family from (chars, exact tokens) samples."""
+        x = np.asarray(chars, dtype=float)
+        y = np.asarray(exact_tokens, dtype=float)
+        # Weighted by 1/tokens so short and long texts count equally in relative terms
+        weights = 1 / np.maximum(y, 1)
+        slope, overhead = 0.0, -1.0
+        if len(x) >= 2 and np.ptp(x) > 0:
+            slope, overhead = np.polyfit(x, y, 1, w=weights)
+        if overhead < 0:
+            # A negative overhead only fits a narrow range of sizes; go through the origin instead
+            slope, overhead = float(np.sum(weights**2 * x * y) / max(np.sum(weights**2 * x * x), 1e-12)), 0.0
+        rel_error = np.abs(slope * x + overhead - y) / np.maximum(y, 1)
+        entry = CalibrationEntry(
+            tokens_per_char=float(slope),
+            overhead_tokens=float(overhead),
+            samples=int(len(x)),
+            rel_error_p50=float(np.median(rel_error)),
+            rel_error_max=float(rel_error.max()),
+        )
+        self.table[model_family(model_name)] = entry
+        return entry
+
+    def save(self):
+        with open(self.table_path, "w") as f:
+            json.dump({family: asdict(entry) for family, entry in sorted(self.table.items())}, f, indent=2)
+            f.write("\n")
+
+
+def calibrate_from_logs(estimator: TokenEstimator, paths: Optional[Iterable[Path]] = None) -> Dict[str, CalibrationEntry]:
+    """Calibrate every family seen in the logs against the exact input totals of their `usage` blocks."""
+    from log_analytics import iter_message_exchanges
+
+    samples: Dict[str, set] = {}
+    for exchange in iter_message_exchanges(paths):
+        usage, body = exchange["usage"], exchange["body"]
+        if not usage:
+            continue
+        exact = sum(usage.get(k) or 0 for k in
+                    ("input_tokens", "cache_creation_input_tokens", "cache_read_input_tokens"))
+        chars = len(prompt_text(body.get("system"), body.get("messages"), body.get("tools")))
+        samples.setdefault(body["model"], set()).add((chars, exact))
+
+    return {model: estimator.fit(model, *zip(*sorted(points))) for model, points in samples.items()}
+
+
+def calibrate_live(estimator: TokenEstimator, model_names: Sequence[str], texts: Sequence[str]) -> Dict[str, CalibrationEntry]:
+    """Calibrate against real `count_tokens` results for each model over sample texts."""
+    from provider_models import TOKEN_COUNTER
+
+    entries = {}
+    for model_name in model_names:
+        requests = [{"model_name": model_name, "messages": [{"role": "user", "content": text}]} for text in texts]
+        exact = TOKEN_COUNTER.count_many(requests)
+        entries[model_name] = estimator.fit(model_name, [len(text) for text in texts], exact)
+    return entries
+
+
+def live_corpus() -> List[str]:
+    """
+    Texts for live calibration: prose (the essay, cut at several sizes and
+    offsets), markdown prompts and Python source, so the fit covers the kinds
+    of content that end up in prompts rather than one document.
+    """
+    from document_loader import fetch_essay
+
+    here = Path(__file__).resolve().parent
+    essay = fetch_essay()
+    texts = [essay[start:start + n] for n in (200, 1_000, 5_000, 20_000) for start in (0, len(essay) // 3)]
+    texts.append(essay)
+    texts += [path.read_text(encoding="utf-8") for path in sorted((here / "prompts").glob("*.md"))]
+    texts += [path.read_text(encoding="utf-8")[:20_000] for path in sorted(here.glob("*.py"))[:12]]
+    return [text for text in texts if text.strip()]
+
+
+# Shared estimator, loaded once from token_calibration.json
+TOKEN_ESTIMATOR = TokenEstimator()
+
+
+def main():
+    """Recalibrate the table from the logs (default) or from live count_tokens calls."""
+    estimator = TokenEstimator()
+    if "--live" in sys.argv[1:]:
+        from provider_models import ALL_MODELS
+
+        entries = calibrate_live(estimator, [model.name for model in ALL_MODELS], live_corpus())
+    else:
+        entries = calibrate_from_logs(estimator)
+
+    if not entries:
+        print("Error: no calibration samples found", file=sys.stderr)
+        sys.exit(1)
+    estimator.save()
+    for model_name, entry in entries.items():
+        print(f"{model_family(model_name)}: {1 / entry.tokens_per_char:.2f} chars/token, "
+              f"+{entry.overhead_tokens:.1f} tokens, error p50 {entry.rel_error_p50:.1%} "
+              f"max {entry.rel_error_max:.1%} ({entry.samples} samples)")
+        if entry.samples < MIN_CALIBRATION_SAMPLES:
+            print(f"⚠️  only {entry.samples} samples: estimates assume ±{entry.error_bound:.1%}; "
+                  f"recalibrate with --live for a tighter bound")
+    print(f"Saved calibration table to {estimator.table_path}")
+
+
+if __name__ == "__main__":
+    main()